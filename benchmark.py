@@ -0,0 +1,316 @@
+"""로컬 가짜 Notion 서버를 상대로 한 성능 벤치마크
+
+fake_notion.py 서버를 같은 프로세스에서 띄우고, 봇이 그 서버를 바라보도록 설정한 뒤
+주요 경로의 처리량과 지연 분위수(p50/p95/p99)를 측정한다.
+
+- get_db_properties (cold): 스키마 캐시를 비우고 Notion에서 다시 조회
+- get_db_properties (warm): 캐시 적중
+- save_to_notion: 동시 저장 (월 관계 설정 + 미러 write-through 포함)
+- mirror full sync: Transaction DB 전체 재동기화
+- monthly_stats_command (warm / stale): 미러가 최신일 때 / 매번 증분 동기화가 필요할 때
+- yearly_stats_command (warm): 12개월 연간 통계
+
+결과는 bench_results/에 JSON으로 저장하고, 직전 실행(또는 --baseline 파일)과 비교해 변화율을 출력한다.
+
+사용 예:
+    python benchmark.py
+    python benchmark.py --rows 20000 --latency 80 --jitter 30 --error-rate 0.02
+    python benchmark.py --baseline bench_results/20260101-120000.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# UTF-8 출력 설정
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+
+from fake_notion import FakeNotion, MONTHLY_DB_ID, TRANSACTION_DB_ID, start_server
+
+
+def percentile(sorted_values, q):
+    """nearest-rank 분위수"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_per_s': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+async def measure(func, iterations, concurrency=1):
+    """func()를 iterations번, 최대 concurrency개씩 동시에 실행하며 호출별 지연 측정"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await func()
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"벤치마크 호출 실패: {e}")
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if ok is False:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(iterations)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+class _Message:
+    async def reply_text(self, text, **kwargs):
+        return self
+
+    async def reply_photo(self, photo, **kwargs):
+        return self
+
+
+class _Chat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class _Update:
+    """핸들러 호출용 최소 업데이트 객체 (응답은 버림)"""
+
+    def __init__(self, chat_id=1):
+        self.message = _Message()
+        self.effective_message = self.message
+        self.effective_chat = _Chat(chat_id)
+        self.effective_user = None
+
+
+class _Context:
+    def __init__(self, args):
+        self.args = args
+
+
+async def run_benchmarks(args):
+    # 가짜 서버 주소를 정한 뒤 봇 모듈을 불러와야 게이트웨이가 그 주소를 사용한다
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    data_dir = tempfile.mkdtemp(prefix='bench-')
+    os.environ.update({
+        'NOTION_API_KEY': 'fake-key',
+        'NOTION_DATABASE_ID': TRANSACTION_DB_ID,
+        'MONTHLY_DB_ID': MONTHLY_DB_ID,
+        'NOTION_BASE_URL': f"http://127.0.0.1:{port}",
+        'NOTION_RATE_LIMIT': str(args.notion_rate),
+        'NOTION_MAX_CONCURRENCY': str(args.concurrency),
+        'DATA_DIR': data_dir,
+        # .env에 테넌트 파일이 있어도 기본 테넌트 하나로만 측정
+        'TENANTS_FILE': '',
+        # 차트 그리기는 Notion 호출과 무관하고 지연 시간만 부풀리므로 끔
+        'CHARTS': 'off',
+    })
+
+    fake = FakeNotion(
+        rows=args.rows,
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.server_rate,
+        seed=args.seed,
+    )
+    server = start_server(fake, port)
+
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+    tenant = bot.tenants.default
+    results = {}
+
+    try:
+        print(f"가짜 Notion 서버: 127.0.0.1:{port}, 거래 {args.rows:,}건")
+
+        async def schema_cold():
+            tenant.schema_cache._fetched_at = 0.0
+            return await tenant.schema_cache.refresh() is not None
+
+        results['get_db_properties.cold'] = await measure(schema_cold, args.iterations)
+        results['get_db_properties.warm'] = await measure(
+            lambda: bot.get_db_properties(tenant), args.iterations * 10
+        )
+
+        db_props = await bot.get_db_properties(tenant)
+        if tenant.monthly_index:
+            await tenant.monthly_index.load()
+
+        started = time.perf_counter()
+        count = await bot.sync_mirror(tenant, db_props, full=True)
+        elapsed = time.perf_counter() - started
+        results['mirror.full_sync'] = summarize([elapsed], elapsed)
+        results['mirror.full_sync']['rows_per_s'] = round(count / elapsed, 1) if elapsed > 0 else None
+
+        counter = iter(range(10 ** 9))
+
+        async def save():
+            i = next(counter)
+            success, _ = await bot.save_to_notion(tenant, {
+                'title': f"벤치마크 {i}",
+                'amount': 1000 + i,
+                'type': '지출',
+                'category': '2-1. 식비',
+                'date': datetime.now().isoformat(),
+            })
+            return success
+
+        results['save_to_notion'] = await measure(save, args.saves, args.concurrency)
+
+        year_month = datetime.now().strftime('%Y-%m')
+        results['monthly_stats_command.warm'] = await measure(
+            lambda: bot.monthly_stats_command(_Update(), _Context([year_month])), args.iterations * 10
+        )
+
+        results['yearly_stats_command.warm'] = await measure(
+            lambda: bot.yearly_stats_command(_Update(), _Context([year_month[:4]])), args.iterations * 10
+        )
+
+        # staleness 0: 매 호출마다 증분 동기화를 거치는 경로
+        tenant.mirror.max_staleness = 0
+        results['monthly_stats_command.stale'] = await measure(
+            lambda: bot.monthly_stats_command(_Update(), _Context([year_month])), args.iterations
+        )
+    finally:
+        server.stop()
+        await bot.tenants.aclose()
+        bot.outbox.close()
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'config': {
+            'rows': args.rows,
+            'latency_ms': args.latency,
+            'jitter_ms': args.jitter,
+            'error_rate': args.error_rate,
+            'server_rate': args.server_rate,
+            'notion_rate': args.notion_rate,
+            'concurrency': args.concurrency,
+            'iterations': args.iterations,
+            'saves': args.saves,
+            'seed': args.seed,
+        },
+        'server_stats': fake.stats,
+        'results': results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_results(report, baseline=None, threshold=20.0):
+    """결과 표 출력, 기준 대비 threshold% 넘게 나빠진 항목 목록 반환"""
+    regressions = []
+    base_results = baseline['results'] if baseline else {}
+    print()
+    print(f"{'항목':<30} {'건수':>6} {'처리량/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in report['results'].items():
+        print(f"{name:<30} {result['count']:>6} {result['throughput_per_s'] or 0:>10.1f} "
+              f"{result['p50_ms'] or 0:>9.2f} {result['p95_ms'] or 0:>9.2f} {result['p99_ms'] or 0:>9.2f}"
+              + (f"  (오류 {result['errors']})" if result['errors'] else ''))
+
+        base = base_results.get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'throughput_per_s'):
+            if not base.get(key) or result.get(key) is None:
+                continue
+            change = (result[key] - base[key]) / base[key] * 100
+            # 처리량은 줄어들 때, 지연은 늘어날 때가 나빠진 것
+            worse = -change if key == 'throughput_per_s' else change
+            marker = ' ⚠️' if worse > threshold else ''
+            print(f"{'':<30}   {key}: {base[key]} -> {result[key]} ({change:+.1f}%){marker}")
+            if worse > threshold:
+                regressions.append(f"{name} {key} {change:+.1f}%")
+    return regressions
+
+
+def latest_result(results_dir):
+    files = sorted(glob.glob(os.path.join(results_dir, '*.json')))
+    return files[-1] if files else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 Notion 서버 대상 벤치마크")
+    parser.add_argument('--rows', type=int, default=5000, help="가짜 Transaction DB 거래 건수")
+    parser.add_argument('--latency', type=float, default=20.0, help="가짜 서버 응답 지연 (ms)")
+    parser.add_argument('--jitter', type=float, default=5.0, help="응답 지연 편차 (ms)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="무작위 429 응답 비율 (0~1)")
+    parser.add_argument('--server-rate', type=float, default=None, help="가짜 서버 초당 요청 한도")
+    parser.add_argument('--notion-rate', type=float, default=100.0, help="봇 게이트웨이 초당 요청 수 (NOTION_RATE_LIMIT)")
+    parser.add_argument('--concurrency', type=int, default=3, help="동시 저장 수 / NOTION_MAX_CONCURRENCY")
+    parser.add_argument('--iterations', type=int, default=20, help="항목별 반복 횟수")
+    parser.add_argument('--saves', type=int, default=200, help="save_to_notion 호출 횟수")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--results-dir', default='bench_results')
+    parser.add_argument('--baseline', help="비교할 결과 파일 (기본값: 결과 폴더의 가장 최근 파일)")
+    parser.add_argument('--threshold', type=float, default=20.0, help="회귀로 볼 변화율 (%%)")
+    parser.add_argument('--fail-on-regression', action='store_true', help="회귀가 있으면 종료 코드 1")
+    parser.add_argument('--no-save', action='store_true', help="결과 파일을 저장하지 않음")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or latest_result(args.results_dir)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"기준 결과: {baseline_path}")
+
+    report = asyncio.run(run_benchmarks(args))
+
+    if baseline and baseline.get('config') != report['config']:
+        print("⚠️ 기준 결과와 설정이 달라 비교가 정확하지 않을 수 있습니다.")
+    regressions = print_results(report, baseline, args.threshold)
+
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        path = os.path.join(args.results_dir, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {path}")
+
+    if regressions:
+        print("\n회귀 의심 항목:")
+        for item in regressions:
+            print(f"  - {item}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
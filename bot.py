@@ -1,10 +1,31 @@
 import os
+import asyncio
+import functools
 import logging
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from notion_client import Client
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import (
+    Application, CallbackQueryHandler, CommandHandler, MessageHandler, PrefixHandler, filters, ContextTypes
+)
+
+from notion_client.errors import APIErrorCode, APIResponseError
+
+from notion_gateway import NotionGateway
+from rate_limit import NotionUnavailableError, not_applied
+from tenants import TenantRegistry
+from webhook_server import run_webhook
+from update_processor import ChatOrderedUpdateProcessor
+from outbox import Outbox, OutboxFlusher
+from idempotency import IdempotencyStore, UnconfirmedSaveError, message_key
+from recurring import RecurringStore, following_occurrence, occurrence_key
+from recent_pages import RecentPages
+from importer import ImportResult, TableReader, run_import
+from exporter import FORMATS as EXPORT_FORMATS, export_transactions
+import metrics
+import charts
 
 # 환경 변수 로드
 load_dotenv()
@@ -21,55 +42,201 @@ TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 NOTION_API_KEY = os.getenv('NOTION_API_KEY')
 NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
 MONTHLY_DB_ID = os.getenv('MONTHLY_DB_ID')
+NOTION_MAX_CONCURRENCY = int(os.getenv('NOTION_MAX_CONCURRENCY', '3'))
+
+# Notion 속도 제한 / 재시도 / 서킷 브레이커 설정
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', '3'))
+NOTION_MAX_RETRIES = int(os.getenv('NOTION_MAX_RETRIES', '4'))
+NOTION_BREAKER_THRESHOLD = int(os.getenv('NOTION_BREAKER_THRESHOLD', '5'))
+NOTION_BREAKER_COOLDOWN = float(os.getenv('NOTION_BREAKER_COOLDOWN', '30'))
+
+# (선택) Notion API 주소 (로컬 가짜 서버 fake_notion.py로 테스트할 때만 변경)
+NOTION_BASE_URL = os.getenv('NOTION_BASE_URL')
+
+# 로컬 데이터 저장 위치 및 미러 설정
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+MIRROR_MAX_STALENESS = int(os.getenv('MIRROR_MAX_STALENESS', '300'))
+
+# 실행 모드: polling (기본) 또는 webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+
+# 동시에 처리할 업데이트 수 (서로 다른 채팅끼리만 동시에 처리, 같은 채팅은 순서대로)
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '16'))
+# 채팅별로 처리를 기다릴 수 있는 최대 업데이트 수
+# (넘으면 명령어만 버리고 안내, ! 기록 메시지는 버리지 않음)
+UPDATE_CHAT_MAX_PENDING = int(os.getenv('UPDATE_CHAT_MAX_PENDING', '200'))
+
+# 봇이 처리하는 업데이트 종류만 수신 (폴링/웹훅 공통)
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# 월별 집계 보정 주기 (초, Notion에서 직접 수정/삭제한 내용을 전체 동기화로 반영)
+ROLLUP_RECONCILE_INTERVAL = int(os.getenv('ROLLUP_RECONCILE_INTERVAL', '21600'))
+
+# Notion 상태 확인 주기 (초, /status는 이 결과로 응답)
+HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', '60'))
+
+# 채팅별로 기억할 최근 저장 페이지 수 (/취소를 반복해 되돌릴 수 있는 최대 건수)
+RECENT_PAGES_PER_CHAT = int(os.getenv('RECENT_PAGES_PER_CHAT', '20'))
+
+# 정기 거래 확인 주기 (초, 봇이 꺼져 있던 동안 지난 회차는 다음 확인 때 모두 기록)
+RECURRING_CHECK_INTERVAL = int(os.getenv('RECURRING_CHECK_INTERVAL', '3600'))
+
+# 통계 차트 이미지 (matplotlib이 설치되어 있을 때만, CHARTS=off로 끔) / 차트를 그리는 프로세스 수
+CHARTS = os.getenv('CHARTS', 'on').lower() != 'off'
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '1'))
+
+# 스키마 캐시 TTL (초)
+SCHEMA_TTL = int(os.getenv('SCHEMA_TTL', '600'))
+
+# 저장 대기열 설정 (초당 저장 요청 수, 최대 시도 횟수, 종료 시 대기 시간)
+OUTBOX_RATE = float(os.getenv('OUTBOX_RATE', '2'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_DRAIN_TIMEOUT = float(os.getenv('OUTBOX_DRAIN_TIMEOUT', '30'))
+
+# 중복 저장 방지 기록 보관 기간 (초, 이 기간 안에 다시 받은 메시지는 저장하지 않음)
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '604800'))
+
+# /import 파일 가져오기 동시 저장 수 (테넌트 게이트웨이의 속도 제한은 그대로 적용)
+IMPORT_CONCURRENCY = int(os.getenv('IMPORT_CONCURRENCY', '3'))
+# Bot API로 내려받을 수 있는 최대 파일 크기
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024
+# Bot API로 보낼 수 있는 최대 파일 크기
+EXPORT_MAX_FILE_SIZE = 50 * 1024 * 1024
+# 한 메시지에 여러 줄로 보낼 수 있는 최대 ! 항목 수
+BATCH_MAX_LINES = 50
+# /기간통계로 한 번에 조회할 수 있는 최대 개월 수
+STATS_MAX_MONTHS = 60
+
+# (선택) 여러 가구를 한 프로세스에서 운영할 때 채팅별 Notion 설정 파일 (tenants.py 참고)
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+
+# (선택) Prometheus 메트릭 포트 (설정하면 별도 HTTP 서버로 /metrics 제공, 웹훅 모드는 웹훅 서버에서도 제공)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '0.0.0.0')
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# 채팅별 가계부(테넌트) 레지스트리
+# 테넌트마다 자체 Notion 게이트웨이(연결 풀/속도 제한/서킷 브레이커), 스키마 캐시,
+# Monthly DB 인덱스, 로컬 미러를 가진다. 환경 변수 설정은 'default' 테넌트가 된다.
+tenants = TenantRegistry.load(
+    DATA_DIR,
+    tenants_file=TENANTS_FILE,
+    default_api_key=NOTION_API_KEY,
+    default_database_id=NOTION_DATABASE_ID,
+    default_monthly_db_id=MONTHLY_DB_ID,
+    gateway_options={
+        'max_concurrency': NOTION_MAX_CONCURRENCY,
+        'rate_limit': NOTION_RATE_LIMIT,
+        'max_retries': NOTION_MAX_RETRIES,
+        'breaker_threshold': NOTION_BREAKER_THRESHOLD,
+        'breaker_cooldown': NOTION_BREAKER_COOLDOWN,
+        'base_url': NOTION_BASE_URL,
+    },
+    schema_ttl=SCHEMA_TTL,
+    mirror_max_staleness=MIRROR_MAX_STALENESS
+)
 
-# Notion 클라이언트 초기화
-notion = Client(auth=NOTION_API_KEY)
+# ! 메시지 저장 대기열 (디스크에 커밋 후 백그라운드에서 테넌트별로 Notion에 저장)
+outbox = Outbox(os.path.join(DATA_DIR, 'outbox.db'))
 
-# 데이터베이스 속성 이름 캐시
-_db_properties = None
+# 메시지별 중복 저장 방지 기록 (다시 받은 업데이트 / 재시도된 저장은 기존 페이지로 끝냄)
+idempotency = IdempotencyStore(os.path.join(DATA_DIR, 'idempotency.db'), ttl=IDEMPOTENCY_TTL)
 
-def get_db_properties():
-    """데이터베이스 속성 이름 가져오기"""
-    global _db_properties
-    if _db_properties is None:
-        try:
-            db = notion.databases.retrieve(database_id=NOTION_DATABASE_ID)
-            _db_properties = {'props': {}, 'categories': {}}
-
-            for prop_name, prop_data in db['properties'].items():
-                prop_type = prop_data.get('type')
-
-                if prop_type == 'title':
-                    _db_properties['props']['title'] = prop_name
-
-                elif prop_type == 'date':
-                    _db_properties['props']['date'] = prop_name
-
-                elif prop_type == 'number':
-                    # 수입 비용, 지출 비용 구분
-                    if '수입' in prop_name and '비용' in prop_name:
-                        _db_properties['props']['income_amount'] = prop_name
-                    elif '지출' in prop_name and '비용' in prop_name:
-                        _db_properties['props']['expense_amount'] = prop_name
-
-                elif prop_type == 'select':
-                    # 종류 (지출/수입)
-                    if '종류' in prop_name and ('지출' not in prop_name or '수입' not in prop_name):
-                        _db_properties['props']['type'] = prop_name
-                        _db_properties['categories']['type'] = [opt['name'] for opt in prop_data.get('select', {}).get('options', [])]
-                    # 지출 카테고리
-                    elif '지출' in prop_name and '카테고리' in prop_name:
-                        _db_properties['props']['expense_category'] = prop_name
-                        _db_properties['categories']['expense_category'] = [opt['name'] for opt in prop_data.get('select', {}).get('options', [])]
-                    # 수입 카테고리
-                    elif '수입' in prop_name and '카테고리' in prop_name:
-                        _db_properties['props']['income_category'] = prop_name
-                        _db_properties['categories']['income_category'] = [opt['name'] for opt in prop_data.get('select', {}).get('options', [])]
+# 채팅별 정기 거래 목록 (주기 작업이 회차마다 저장 대기열에 넣음)
+recurring = RecurringStore(os.path.join(DATA_DIR, 'recurring.db'))
 
-        except Exception as e:
-            logger.error(f"데이터베이스 속성 조회 오류: {e}")
-            return None
-    return _db_properties
+# 채팅별 최근 저장 페이지 (/취소, /수정이 Notion 조회 없이 대상 페이지를 찾음)
+recent_pages = RecentPages(os.path.join(DATA_DIR, 'recent_pages.db'), per_chat=RECENT_PAGES_PER_CHAT)
+
+# 진행 중인 /import, /export 작업 ((chat_id, 종류) -> asyncio.Task)
+running_tasks = {}
+
+# 수집 시점에 현재 상태를 읽는 게이지
+metrics.REGISTRY.register(metrics.Gauge(
+    'outbox_pending', "Notion 저장 대기열에 남은 항목 수", ['tenant'],
+    collect=lambda: {(tenant.name,): outbox.pending_count(tenant=tenant.name) for tenant in tenants.all()}
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    'notion_breaker_open', "Notion 서킷 브레이커가 열려 있으면 1", ['tenant'],
+    collect=lambda: {
+        (tenant.name,): int(tenant.gateway.breaker.state == 'open') for tenant in tenants.all()
+    }
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    'notion_probe_latency_seconds', "상태 확인(databases.retrieve) 마지막 응답 시간", ['tenant', 'database'],
+    collect=lambda: {
+        (tenant.name, name): stats.last_latency
+        for tenant in tenants.all() for name, stats in tenant.health.stats.items()
+        if stats.last_latency is not None
+    }
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    'bot_background_tasks', "진행 중인 /import, /export 작업 수", ['kind'],
+    collect=lambda: {
+        (kind,): sum(1 for _, task_kind in running_tasks if task_kind == kind) for kind in ('import', 'export')
+    }
+))
+
+# 통계 차트 렌더러 (별도 프로세스에서 그리고 DATA_DIR/charts에 캐시)
+chart_renderer = (
+    charts.ChartRenderer(os.path.join(DATA_DIR, 'charts'), max_workers=CHART_WORKERS)
+    if CHARTS and charts.available() else None
+)
+
+# 채팅별 순서를 지키는 동시 업데이트 처리기
+update_processor = ChatOrderedUpdateProcessor(UPDATE_CONCURRENCY, max_pending_per_chat=UPDATE_CHAT_MAX_PENDING)
+metrics.REGISTRY.register(metrics.Gauge(
+    'bot_updates_pending', "처리 중이거나 같은 채팅의 앞 업데이트를 기다리는 업데이트 수",
+    collect=lambda: {(): update_processor.pending_count()}
+))
+
+# 폴링 모드에서 띄우는 메트릭 HTTP 서버 (post_init에서 시작)
+metrics_server = None
+
+# /list 한 페이지 항목 수
+LIST_PAGE_SIZE = 10
+
+# 미러에 저장하는 속성 (동기화 쿼리의 filter_properties 프로젝션)
+MIRROR_PROPERTIES = ('title', 'date', 'type', 'expense_amount', 'income_amount', 'expense_category', 'income_category')
+
+
+async def get_tenant(update: Update):
+    """업데이트를 보낸 채팅의 테넌트 (등록되지 않은 채팅이면 안내 후 None)"""
+    tenant = tenants.for_chat(update.effective_chat.id)
+    if tenant is None:
+        logger.warning(f"등록되지 않은 채팅: {update.effective_chat.id}")
+        await update.message.reply_text(
+            "❌ 이 채팅에 연결된 가계부가 없습니다.\n"
+            f"관리자에게 채팅 ID({update.effective_chat.id}) 등록을 요청해주세요."
+        )
+    return tenant
+
+
+async def get_db_properties(tenant):
+    """데이터베이스 속성 이름 가져오기 (조회 실패 시 None)"""
+    return await tenant.schema_cache.get()
+
+
+async def sync_mirror(tenant, db_props, full=False):
+    """Transaction DB 미러 동기화 (full=True면 전체 재동기화)"""
+    projection = [db_props['ids'][key] for key in MIRROR_PROPERTIES if key in db_props['ids']]
+    return await tenant.mirror.sync(
+        tenant.gateway, tenant.database_id, db_props['props'], projection=projection, full=full
+    )
+
+
+async def ensure_mirror_fresh(tenant, db_props):
+    """미러가 staleness 한도를 넘었으면 증분 동기화"""
+    if tenant.mirror.is_stale():
+        projection = [db_props['ids'][key] for key in MIRROR_PROPERTIES if key in db_props['ids']]
+        await tenant.mirror.ensure_fresh(
+            tenant.gateway, tenant.database_id, db_props['props'], projection=projection
+        )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -81,8 +248,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/start - 환영 메시지 표시\n"
         "/help - 도움말 표시\n"
         "/list - 최근 저장된 항목 목록 보기\n"
+        "/취소 - 마지막으로 저장한 항목 삭제 (반복하면 그 이전 항목)\n"
+        "/수정 [항목] [값] ... - 마지막으로 저장한 항목 고치기\n"
         "/status - 현재 설정 상태 확인\n"
-        "/월별통계 [YYYY-MM] - 월별 지출/수입 통계 보기\n\n"
+        "/월별통계 [YYYY-MM] - 월별 지출/수입 통계 보기\n"
+        "/기간통계 [시작] [종료] - 기간 통계 보기\n"
+        "/연간통계 [YYYY] - 연간 통계 보기\n"
+        "/검색 [검색어] [기간] [금액 범위] - 거래 내용/카테고리 검색\n"
+        "/정기등록 [매월 며칠] [내용] [금액] [종류] [카테고리] - 매달 자동 기록\n"
+        "/정기목록, /정기삭제 [번호] - 정기 거래 보기/삭제\n"
+        "/동기화 - 노션 데이터 전체 다시 불러오기\n"
+        "/import - CSV/TSV 파일로 거래 내역 한 번에 가져오기\n"
+        "/export [YYYY-MM] - 기간 거래 내역 파일로 받기\n\n"
         "사용법: ! [내용] [금액] [종류] [카테고리] [날짜(선택)]\n\n"
         "예시:\n"
         "! 커피 4500 지출 교통비\n"
@@ -113,6 +290,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "! 커피 4500 지출 2-1.식비\n"
         "! 택시 8900 지출 1-3.교통비 2026/01/10\n"
         "! 월급 3000000 수입 급여\n\n"
+        "📋 여러 건 저장: 한 메시지에 ! 줄을 여러 개 적어 보내기 (최대 50줄)\n\n"
         "📅 날짜 형식:\n"
         "- 오늘 (기본값)\n"
         "- 1/9, 2026/01/10\n"
@@ -123,102 +301,351 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/list - 최근 저장된 항목 10개 조회\n"
         "/status - 현재 상태 확인\n"
         "/월별통계 [YYYY-MM] - 월별 지출/수입 통계 조회\n"
-        "   예: /월별통계 2026-01"
+        "   예: /월별통계 2026-01\n"
+        "/기간통계 [시작] [종료] - 기간 월별 추이와 카테고리 합계\n"
+        "   예: /기간통계 2026-01 2026-03, /기간통계 2026-01-15 2026-02-14\n"
+        "/연간통계 [YYYY] - 한 해 월별 추이와 카테고리 합계\n"
+        "/검색 [검색어] [기간] [금액 범위] - 거래 내용/카테고리 검색\n"
+        "   예: /검색 관리비, /검색 커피 2026-01~2026-03 ~10000\n"
+        "/정기등록 [매월 며칠] [내용] [금액] [종류] [카테고리] - 매달 자동 기록\n"
+        "   예: /정기등록 25 월세 500000 지출 1-1.월세\n"
+        "/정기목록, /정기삭제 [번호] - 정기 거래 보기/삭제\n"
+        "/취소 - 마지막으로 저장한 항목 삭제 (반복하면 그 이전 항목)\n"
+        "/수정 [항목] [값] ... - 마지막으로 저장한 항목 고치기\n"
+        "   항목: 내용, 금액, 종류, 카테고리, 날짜 (예: /수정 금액 5000 카테고리 2-2.쇼핑)\n"
+        "/동기화 - 노션에서 직접 수정한 내용 즉시 반영\n"
+        "/import - CSV/TSV 파일 가져오기 (파일 캡션에 /import 입력 또는 파일에 답장)\n"
+        "   열: 내용, 금액, 종류, 카테고리, 날짜\n"
+        "/export [YYYY-MM] [csv|jsonl] - 한 달 거래 내역 파일로 받기\n"
+        "/export [시작일] [종료일] [csv|jsonl] - 기간 거래 내역 파일로 받기\n"
+        "   예: /export 2026-01-01 2026-03-31 jsonl"
     )
     await update.message.reply_text(help_text)
 
 
+HEALTH_TARGET_NAMES = {'transactions': '거래 DB', 'monthly': '월별 DB'}
+
+
+def _ago(timestamp):
+    """'n초 전' 형식 (기록이 없으면 '없음')"""
+    if timestamp is None:
+        return "없음"
+    seconds = int(time.time() - timestamp)
+    if seconds < 60:
+        return f"{seconds}초 전"
+    if seconds < 3600:
+        return f"{seconds // 60}분 전"
+    return f"{seconds // 3600}시간 전"
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds is not None else "-"
+
+
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """상태 확인 명령어 처리"""
-    try:
-        # Notion 데이터베이스 접근 테스트
-        database = notion.databases.retrieve(database_id=NOTION_DATABASE_ID)
-        status_text = (
-            "✅ 연결 상태: 정상\n\n"
-            f"노션 데이터베이스: {database.get('title', [{}])[0].get('plain_text', 'Untitled')}\n"
-            "텔레그램 봇: 활성화됨"
+    """상태 확인 명령어 처리 (백그라운드 상태 확인 결과로 바로 응답)"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    health = tenant.health
+    transactions = health.stats['transactions']
+    if not health.checked:
+        status_text = "⏳ 연결 상태: 확인 중 (잠시 후 다시 시도해주세요)\n\n"
+    elif health.healthy:
+        status_text = "✅ 연결 상태: 정상\n\n"
+    elif any(stats.ok for stats in health.stats.values()):
+        status_text = "⚠️ 연결 상태: 일부 오류\n\n"
+    else:
+        status_text = f"❌ 연결 오류:\n{transactions.last_error}\n\n"
+
+    if transactions.title:
+        status_text += f"노션 데이터베이스: {transactions.title}\n"
+    status_text += "텔레그램 봇: 활성화됨\n\n"
+
+    status_text += f"📡 Notion 응답 ({HEALTH_CHECK_INTERVAL}초마다 확인)\n"
+    for name, stats in health.stats.items():
+        status_text += (
+            f"• {HEALTH_TARGET_NAMES.get(name, name)}: "
+            f"{_ms(stats.last_latency)} (중앙값 {_ms(stats.median_latency)}), "
+            f"오류율 {stats.error_rate * 100:.0f}%, 마지막 성공 {_ago(stats.last_success_at)}\n"
         )
-    except Exception as e:
-        status_text = f"❌ 연결 오류:\n{str(e)}"
+        if stats.last_error and stats is not transactions:
+            status_text += f"  └ {stats.last_error}\n"
+    status_text += f"• 서킷 브레이커: {tenant.gateway.breaker.state}\n\n"
+
+    status_text += f"📦 저장 대기열: {outbox.pending_count(tenant=tenant.name)}건\n"
+    status_text += f"⏱ 처리 대기 메시지: {update_processor.pending_count()}건"
 
     await update.message.reply_text(status_text)
 
 
-async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """최근 저장된 항목 목록 조회"""
-    try:
-        # 노션 데이터베이스에서 최근 10개 항목 조회
-        results = notion.databases.query(
-            database_id=NOTION_DATABASE_ID,
-            sorts=[
-                {
-                    "property": "날짜",
-                    "direction": "descending"
-                }
-            ],
-            page_size=10
-        )
+def _list_page(tenant, offset=0, before=None):
+    """/list 한 페이지 (메시지, 버튼) 생성
 
-        if not results.get('results'):
-            await update.message.reply_text("📭 저장된 항목이 없습니다.\n\n! 메시지를 보내서 노션에 저장해보세요!")
-            return
+    before는 이전 페이지 마지막 행의 (날짜, rowid) 키셋 커서로, 버튼의 callback_data에 담긴다.
+    """
+    rows = tenant.mirror.page(LIST_PAGE_SIZE + 1, before)
+    has_more = len(rows) > LIST_PAGE_SIZE
+    rows = rows[:LIST_PAGE_SIZE]
+
+    if not rows:
+        if offset:
+            return "📭 더 이전 항목이 없습니다.", _list_buttons(has_more=False, offset=offset)
+        return "📭 저장된 항목이 없습니다.\n\n! 메시지를 보내서 노션에 저장해보세요!", None
+
+    # 항목 목록 생성
+    if offset:
+        message_list = f"📋 이전 항목 ({offset + 1}~{offset + len(rows)}번째):\n\n"
+    else:
+        message_list = f"📋 최근 저장된 항목 (최대 {LIST_PAGE_SIZE}개):\n\n"
+
+    for idx, row in enumerate(rows, offset + 1):
+        # 금액 (지출/수입 열은 미러에 저장할 때 이미 구분됨)
+        amount = ""
+        if row['amount'] is not None:
+            amount = f" {int(row['amount']):,}원"
+
+        # 카테고리
+        category = ""
+        if row['category']:
+            category = f" [{row['category']}]"
+
+        # 날짜
+        date_str = ""
+        if row['date']:
+            # ISO 형식을 읽기 쉬운 형식으로 변환
+            date_obj = datetime.fromisoformat(row['date'].replace('Z', '+00:00'))
+            date_str = date_obj.strftime('%Y/%m/%d' if offset else '%m/%d')
 
-        # 항목 목록 생성
-        message_list = "📋 최근 저장된 항목 (최대 10개):\n\n"
+        message_list += f"{idx}. {row['title']}{amount}{category}\n   📅 {date_str}\n\n"
 
+    if not offset:
+        message_list += "💡 /help 명령어로 더 많은 기능을 확인하세요!"
+
+    last = rows[-1]
+    cursor = f"{offset + len(rows)}:{last['date'] or ''}|{last['rowid']}"
+    return message_list.rstrip(), _list_buttons(has_more, offset, cursor)
+
+
+def _list_buttons(has_more, offset, cursor=None):
+    """이전 항목 / 처음으로 버튼 (callback_data 'list:<표시한 개수>:<날짜>|<rowid>', 처음은 'list:')"""
+    buttons = []
+    if offset:
+        buttons.append(InlineKeyboardButton("⏮ 처음", callback_data="list:"))
+    if has_more:
+        buttons.append(InlineKeyboardButton("이전 항목 ▶", callback_data=f"list:{cursor}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """최근 저장된 항목 목록 조회 (로컬 미러에서 응답, 버튼으로 이전 항목 페이지 이동)"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    try:
         # 동적으로 속성 이름 가져오기
-        db_props = get_db_properties()
+        db_props = await get_db_properties(tenant)
         if not db_props or 'props' not in db_props:
             await update.message.reply_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
             return
 
-        props = db_props['props']
+        # 미러가 staleness 한도를 넘었을 때만 Notion 증분 동기화
+        await ensure_mirror_fresh(tenant, db_props)
 
-        for idx, page in enumerate(results['results'], 1):
-            properties = page['properties']
-
-            # 내용 추출 (title 타입)
-            title_property = properties.get(props.get('title'), {})
-            title = ""
-            if title_property.get('title'):
-                title = title_property['title'][0]['text']['content']
-
-            # 금액 추출
-            amount = ""
-            if 'amount' in props:
-                amount_property = properties.get(props['amount'], {})
-                if amount_property.get('number') is not None:
-                    amount = f" {int(amount_property['number']):,}원"
-
-            # 카테고리 추출
-            category = ""
-            if 'category' in props:
-                cat_property = properties.get(props['category'], {})
-                if cat_property.get('select'):
-                    category = f" [{cat_property['select']['name']}]"
-
-            # 날짜 추출
-            date_property = properties.get(props.get('date'), {})
-            date_str = ""
-            if date_property.get('date') and date_property['date'].get('start'):
-                date_iso = date_property['date']['start']
-                # ISO 형식을 읽기 쉬운 형식으로 변환
-                date_obj = datetime.fromisoformat(date_iso.replace('Z', '+00:00'))
-                date_str = date_obj.strftime('%m/%d')
-
-            message_list += f"{idx}. {title}{amount}{category}\n   📅 {date_str}\n\n"
+        text, buttons = _list_page(tenant)
+        await update.message.reply_text(text, reply_markup=buttons)
 
-        message_list += "💡 /help 명령어로 더 많은 기능을 확인하세요!"
+    except Exception as e:
+        logger.error(f"목록 조회 오류: {e}")
+        await update.message.reply_text(f"❌ 목록 조회 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
 
-        await update.message.reply_text(message_list)
 
+async def list_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/list 페이지 버튼 처리 (같은 메시지를 해당 페이지로 수정)"""
+    query = update.callback_query
+    tenant = tenants.for_chat(update.effective_chat.id) if update.effective_chat else None
+    if not tenant:
+        await query.answer("이 채팅에 연결된 가계부가 없습니다.", show_alert=True)
+        return
+
+    try:
+        payload = query.data[len("list:"):]
+        if payload:
+            offset, cursor = payload.split(':', 1)
+            date, rowid = cursor.rsplit('|', 1)
+            offset, before = int(offset), (date, int(rowid))
+        else:
+            offset, before = 0, None
+    except ValueError:
+        await query.answer("잘못된 요청입니다.")
+        return
+
+    try:
+        text, buttons = _list_page(tenant, offset, before)
     except Exception as e:
-        logger.error(f"목록 조회 오류: {e}")
-        await update.message.reply_text(f"❌ 목록 조회 중 오류가 발생했습니다:\n{str(e)}")
+        logger.error(f"목록 페이지 조회 오류: {e}")
+        await query.answer("목록을 불러오지 못했습니다.")
+        return
+
+    await query.answer()
+    try:
+        await query.edit_message_text(text, reply_markup=buttons)
+    except Exception as e:
+        # 같은 내용으로 수정하려 하거나 오래된 메시지인 경우
+        logger.warning(f"목록 페이지 메시지 수정 실패: {e}")
+
+
+# /검색 결과 최대 표시 수
+SEARCH_LIMIT = 20
+
+
+def _parse_amount(value):
+    """'10,000' / '10000원' -> 10000, 잘못되면 ValueError"""
+    return int(value.replace(',', '').replace('원', ''))
+
+
+def _parse_search_args(args):
+    """/검색 인자 -> (검색어, 필터 dict), 잘못된 범위는 ValueError
+
+    - 숫자~숫자, 숫자~, ~숫자: 금액 범위 (원 단위, 양 끝 포함)
+    - 시작~종료, YYYY-MM, 날짜: 기간 (종료일 포함)
+    - 지출 / 수입: 거래 종류
+    - 나머지: 검색어
+    """
+    words = []
+    filters = {}
+    for arg in args:
+        if arg in ('지출', '수입'):
+            filters['trans_type'] = arg
+        elif '~' in arg:
+            low, high = arg.split('~', 1)
+            try:
+                amounts = [_parse_amount(value) if value else None for value in (low, high)]
+            except ValueError:
+                start = _parse_period_bound(low) if low else None
+                end = _parse_period_bound(high, end=True) if high else None
+                if start:
+                    filters['start_date'] = start.isoformat()
+                if end:
+                    filters['end_date'] = (end + timedelta(days=1)).isoformat()
+                continue
+            filters['min_amount'], filters['max_amount'] = amounts
+        else:
+            try:
+                start, end = _parse_period_bound(arg), _parse_period_bound(arg, end=True)
+            except ValueError:
+                words.append(arg)
+                continue
+            filters['start_date'] = start.isoformat()
+            filters['end_date'] = (end + timedelta(days=1)).isoformat()
+    return " ".join(words), filters
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """거래 검색 명령어 처리: /검색 [검색어] [기간] [금액 범위] (로컬 검색 색인에서 응답)"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    try:
+        query, filters = _parse_search_args(context.args or [])
+        if not query and not filters:
+            raise ValueError("검색 조건 없음")
+    except ValueError:
+        await update.message.reply_text(
+            "❌ 잘못된 형식입니다.\n\n"
+            "사용법: /검색 [검색어] [기간] [금액 범위] [지출|수입]\n"
+            "기간: YYYY-MM, 날짜, 시작~종료\n"
+            "금액: 10000~50000, 10000~, ~5000\n\n"
+            "예시: /검색 관리비\n"
+            "예시: /검색 커피 2026-01~2026-03 ~10000"
+        )
+        return
+
+    try:
+        db_props = await get_db_properties(tenant)
+        if not db_props or 'props' not in db_props:
+            await update.message.reply_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
+            return
+
+        # 미러가 staleness 한도를 넘었을 때만 Notion 증분 동기화 (검색 자체는 Notion을 호출하지 않음)
+        await ensure_mirror_fresh(tenant, db_props)
+
+        total, rows = tenant.mirror.search(query, limit=SEARCH_LIMIT, **filters)
+    except Exception as e:
+        logger.error(f"검색 오류: {e}")
+        await update.message.reply_text(f"❌ 검색 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
+        return
+
+    label = " ".join(context.args)
+    if not rows:
+        await update.message.reply_text(f"🔍 '{label}' 검색 결과가 없습니다.")
+        return
+
+    text = f"🔍 '{label}' 검색 결과: {total}건"
+    if total > len(rows):
+        text += f" (상위 {len(rows)}건 표시)"
+    text += "\n\n"
+    for idx, row in enumerate(rows, 1):
+        amount = f" {int(row['amount']):,}원" if row['amount'] is not None else ""
+        category = f" [{row['category']}]" if row['category'] else ""
+        date_str = ""
+        if row['date']:
+            date_str = datetime.fromisoformat(row['date'].replace('Z', '+00:00')).strftime('%Y/%m/%d')
+        text += f"{idx}. {row['title']}{amount}{category}\n   📅 {date_str}\n"
+
+    await update.message.reply_text(text.rstrip())
+
+
+def _next_month(day):
+    """다음 달 1일"""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _aggregate(rows):
+    """종류/카테고리별 합계 행 -> (총 수입, 총 지출, 수입 카테고리별, 지출 카테고리별, 건수)"""
+    total_income = 0
+    total_expense = 0
+    income_by_category = {}
+    expense_by_category = {}
+    transaction_count = 0
+
+    for row in rows:
+        transaction_count += row['count']
+        amount = row['total']
+
+        if row['type'] == '지출':
+            total_expense += amount
+            # 카테고리별 집계
+            if row['category']:
+                expense_by_category[row['category']] = expense_by_category.get(row['category'], 0) + amount
+
+        elif row['type'] == '수입':
+            total_income += amount
+            # 카테고리별 집계
+            if row['category']:
+                income_by_category[row['category']] = income_by_category.get(row['category'], 0) + amount
+
+    return total_income, total_expense, income_by_category, expense_by_category, transaction_count
+
+
+def _category_lines(by_category, total):
+    """카테고리별 금액을 큰 순서로 '  • 카테고리: 금액 (비율)' 줄로"""
+    lines = ""
+    for category, amount in sorted(by_category.items(), key=lambda x: -x[1]):
+        percentage = (amount / total * 100) if total > 0 else 0
+        lines += f"  • {category}: {amount:,}원 ({percentage:.1f}%)\n"
+    return lines
 
 
 async def monthly_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """월별 통계 명령어 처리: /월별통계 [YYYY-MM]"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
     try:
         # 인자 파싱
         if not context.args or len(context.args) < 1:
@@ -228,7 +655,11 @@ async def monthly_stats_command(update: Update, context: ContextTypes.DEFAULT_TY
             year_month = context.args[0]
 
         # YYYY-MM 형식 검증
-        if len(year_month) != 7 or year_month[4] != '-':
+        try:
+            valid = len(year_month) == 7 and bool(datetime.strptime(year_month, '%Y-%m'))
+        except ValueError:
+            valid = False
+        if not valid:
             await update.message.reply_text(
                 "❌ 잘못된 형식입니다.\n\n"
                 "사용법: /월별통계 [YYYY-MM]\n"
@@ -239,86 +670,17 @@ async def monthly_stats_command(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text(f"📊 {year_month} 통계를 조회하는 중...")
 
         # 데이터베이스 속성 가져오기
-        db_props = get_db_properties()
+        db_props = await get_db_properties(tenant)
         if not db_props:
             await update.message.reply_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
             return
 
-        props = db_props['props']
+        # 미러가 staleness 한도를 넘었을 때만 Notion 증분 동기화
+        await ensure_mirror_fresh(tenant, db_props)
 
-        # 해당 월의 거래 내역 조회 (날짜 필터)
-        year, month = year_month.split('-')
-        start_date = f"{year}-{month}-01"
-
-        # 다음 달 계산
-        if month == '12':
-            next_month = f"{int(year)+1}-01-01"
-        else:
-            next_month = f"{year}-{int(month)+1:02d}-01"
-
-        # 날짜 필터로 조회
-        filter_query = {
-            "and": [
-                {
-                    "property": props.get('date', '날짜'),
-                    "date": {
-                        "on_or_after": start_date
-                    }
-                },
-                {
-                    "property": props.get('date', '날짜'),
-                    "date": {
-                        "before": next_month
-                    }
-                }
-            ]
-        }
-
-        results = notion.databases.query(
-            database_id=NOTION_DATABASE_ID,
-            filter=filter_query
-        )
-
-        # 통계 계산
-        total_income = 0
-        total_expense = 0
-        income_by_category = {}
-        expense_by_category = {}
-        transaction_count = len(results['results'])
-
-        for page in results['results']:
-            properties = page['properties']
-
-            # 종류 확인 (지출/수입)
-            type_prop = properties.get(props.get('type', '종류'), {})
-            trans_type = None
-            if type_prop.get('select'):
-                trans_type = type_prop['select'].get('name')
-
-            # 금액 추출
-            if trans_type == '지출':
-                expense_prop = properties.get(props.get('expense_amount', '지출 비용'), {})
-                if expense_prop.get('number') is not None:
-                    amount = expense_prop['number']
-                    total_expense += amount
-
-                    # 카테고리별 집계
-                    category_prop = properties.get(props.get('expense_category', '지출 종류'), {})
-                    if category_prop.get('select'):
-                        category = category_prop['select'].get('name', '기타')
-                        expense_by_category[category] = expense_by_category.get(category, 0) + amount
-
-            elif trans_type == '수입':
-                income_prop = properties.get(props.get('income_amount', '수입 비용'), {})
-                if income_prop.get('number') is not None:
-                    amount = income_prop['number']
-                    total_income += amount
-
-                    # 카테고리별 집계
-                    category_prop = properties.get(props.get('income_category', '수입 종류'), {})
-                    if category_prop.get('select'):
-                        category = category_prop['select'].get('name', '기타')
-                        income_by_category[category] = income_by_category.get(category, 0) + amount
+        # 통계 계산 (미리 집계된 월별 rollup에서 읽으므로 거래 건수와 무관)
+        total_income, total_expense, income_by_category, expense_by_category, transaction_count = \
+            _aggregate(tenant.mirror.rollups.month(year_month))
 
         # 결과 메시지 생성
         balance = total_income - total_expense
@@ -334,17 +696,13 @@ async def monthly_stats_command(update: Update, context: ContextTypes.DEFAULT_TY
         # 수입 카테고리별
         if income_by_category:
             message += "💵 수입 내역:\n"
-            for category, amount in sorted(income_by_category.items(), key=lambda x: -x[1]):
-                percentage = (amount / total_income * 100) if total_income > 0 else 0
-                message += f"  • {category}: {amount:,}원 ({percentage:.1f}%)\n"
+            message += _category_lines(income_by_category, total_income)
             message += "\n"
 
         # 지출 카테고리별
         if expense_by_category:
             message += "💳 지출 내역:\n"
-            for category, amount in sorted(expense_by_category.items(), key=lambda x: -x[1]):
-                percentage = (amount / total_expense * 100) if total_expense > 0 else 0
-                message += f"  • {category}: {amount:,}원 ({percentage:.1f}%)\n"
+            message += _category_lines(expense_by_category, total_expense)
             message += "\n"
 
         if transaction_count == 0:
@@ -352,15 +710,228 @@ async def monthly_stats_command(update: Update, context: ContextTypes.DEFAULT_TY
 
         await update.message.reply_text(message)
 
+        # 지출 카테고리 / 일별 지출 차트
+        if expense_by_category:
+            month_start = datetime.strptime(year_month, '%Y-%m').date()
+            month_end = _next_month(month_start)
+            daily = {
+                row['day']: row['total']
+                for row in tenant.mirror.daily_totals(month_start.isoformat(), month_end.isoformat(), '지출')
+            }
+            days = [month_start + timedelta(days=i) for i in range((month_end - month_start).days)]
+            await _send_chart(update, {
+                'title': f"{year_month} 월별 통계",
+                'expense_by_category': expense_by_category,
+                'bars': [[str(day.day), daily.get(day.isoformat(), 0), None] for day in days],
+                'bar_title': "일별 지출",
+            })
+
     except Exception as e:
         logger.error(f"월별 통계 조회 오류: {e}")
         import traceback
         traceback.print_exc()
-        await update.message.reply_text(f"❌ 통계 조회 중 오류가 발생했습니다:\n{str(e)}")
+        await update.message.reply_text(f"❌ 통계 조회 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
+
+
+def _parse_period_bound(value, end=False):
+    """YYYY-MM 또는 날짜 -> date (YYYY-MM은 시작이면 1일, 끝이면 말일), 잘못되면 ValueError"""
+    try:
+        month_start = datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        return datetime.fromisoformat(parse_date(value, strict=True)).date()
+    return _next_month(month_start) - timedelta(days=1) if end else month_start
+
+
+def summarize_period(tenant, start, end):
+    """[start, end) 기간의 월별 종류/카테고리 합계 {YYYY-MM: [행]}
+
+    온전히 포함된 달은 월별 집계(rollup)를 한 번의 범위 조회로 읽고,
+    기간 경계에 일부만 걸친 달만 미러의 거래 행에서 계산한다.
+    """
+    by_month = {}
+    full_months = []
+    month = start.replace(day=1)
+    while month < end:
+        next_month = _next_month(month)
+        key = month.strftime('%Y-%m')
+        if start <= month and next_month <= end:
+            full_months.append(key)
+            by_month[key] = []
+        else:
+            by_month[key] = tenant.mirror.summarize(max(start, month).isoformat(), min(end, next_month).isoformat())
+        month = next_month
+
+    if full_months:
+        for row in tenant.mirror.rollups.months(full_months[0], full_months[-1]):
+            by_month[row['month']].append(row)
+    return by_month
+
+
+def _format_period_stats(title, by_month):
+    """월별 추이와 기간 전체 카테고리 합계 메시지"""
+    all_rows = [row for rows in by_month.values() for row in rows]
+    total_income, total_expense, income_by_category, expense_by_category, transaction_count = _aggregate(all_rows)
+    balance = total_income - total_expense
 
+    message = f"📊 {title}\n"
+    message += "=" * 30 + "\n\n"
 
-def parse_date(date_str):
-    """날짜 문자열을 ISO 형식으로 변환"""
+    message += f"💰 총 수입: {total_income:,}원\n"
+    message += f"💸 총 지출: {total_expense:,}원\n"
+    message += f"📈 순자산 변화: {balance:+,}원\n"
+    message += f"📝 거래 건수: {transaction_count}건\n"
+    message += f"📆 월 평균 지출: {total_expense // max(1, len(by_month)):,}원\n\n"
+
+    if transaction_count == 0:
+        return message + "📭 해당 기간에 거래 내역이 없습니다."
+
+    # 월별 추이 (지출 막대는 기간 중 가장 많이 쓴 달 기준)
+    monthly = {month: _aggregate(rows) for month, rows in by_month.items()}
+    max_expense = max(totals[1] for totals in monthly.values())
+    message += "📅 월별 추이 (수입 / 지출):\n"
+    for month, (income, expense, _, _, _) in monthly.items():
+        bar = "▇" * round(expense / max_expense * 10) if max_expense > 0 else ""
+        message += f"  {month}  {income:,} / {expense:,} {bar}\n"
+    message += "\n"
+
+    if income_by_category:
+        message += "💵 수입 내역:\n"
+        message += _category_lines(income_by_category, total_income)
+        message += "\n"
+
+    if expense_by_category:
+        message += "💳 지출 내역:\n"
+        message += _category_lines(expense_by_category, total_expense)
+
+    return message
+
+
+async def _send_chart(update: Update, payload):
+    """차트 이미지 전송 (차트를 쓸 수 없거나 그리기에 실패하면 텍스트 통계만 보냄)"""
+    if not chart_renderer:
+        return
+    try:
+        path = await chart_renderer.render(payload)
+        with open(path, 'rb') as f:
+            await update.message.reply_photo(photo=f)
+    except Exception as e:
+        logger.warning(f"차트 생성/전송 실패: {e}")
+
+
+async def _reply_period_stats(update: Update, tenant, start, end, title):
+    """[start, end) 기간 통계 응답 (미러를 한 번만 최신으로 맞춘 뒤 로컬 집계로 계산)"""
+    try:
+        await update.message.reply_text(f"📊 {title}를 조회하는 중...")
+
+        db_props = await get_db_properties(tenant)
+        if not db_props:
+            await update.message.reply_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
+            return
+
+        # 달마다 Notion을 조회하지 않고, 미러 증분 동기화 한 번으로 기간 전체를 최신으로 맞춤
+        await ensure_mirror_fresh(tenant, db_props)
+
+        by_month = summarize_period(tenant, start, end)
+        message = _format_period_stats(title, by_month)
+        if len(message) > 4096:
+            message = message[:4090] + "\n..."
+        await update.message.reply_text(message)
+
+        # 지출 카테고리 / 월별 수입·지출 차트
+        _, _, _, expense_by_category, _ = _aggregate([row for rows in by_month.values() for row in rows])
+        if expense_by_category:
+            bars = []
+            for month, rows in by_month.items():
+                income, expense, _, _, _ = _aggregate(rows)
+                bars.append([month, expense, income])
+            await _send_chart(update, {
+                'title': title,
+                'expense_by_category': expense_by_category,
+                'bars': bars,
+                'bar_title': "월별 수입 / 지출",
+            })
+
+    except Exception as e:
+        logger.error(f"기간 통계 조회 오류: {e}")
+        await update.message.reply_text(f"❌ 통계 조회 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
+
+
+async def period_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """기간 통계 명령어 처리: /기간통계 [시작] [종료] (종료를 생략하면 시작 월/날짜 하나)"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    try:
+        if not context.args or len(context.args) > 2:
+            raise ValueError("인자 개수")
+        start = _parse_period_bound(context.args[0])
+        end = _parse_period_bound(context.args[-1], end=True)
+        if end < start:
+            raise ValueError("종료일이 시작일보다 빠릅니다")
+    except ValueError:
+        await update.message.reply_text(
+            "❌ 잘못된 형식입니다.\n\n"
+            "사용법: /기간통계 [시작] [종료]\n"
+            "시작/종료는 YYYY-MM 또는 날짜 (종료일 포함)\n\n"
+            "예시: /기간통계 2026-01 2026-03\n"
+            "예시: /기간통계 2026-01-15 2026-02-14"
+        )
+        return
+
+    month_count = (end.year - start.year) * 12 + end.month - start.month + 1
+    if month_count > STATS_MAX_MONTHS:
+        await update.message.reply_text(f"❌ 한 번에 최대 {STATS_MAX_MONTHS}개월까지 조회할 수 있습니다.")
+        return
+
+    await _reply_period_stats(update, tenant, start, end + timedelta(days=1), f"{start} ~ {end} 기간 통계")
+
+
+async def yearly_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """연간 통계 명령어 처리: /연간통계 [YYYY]"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    try:
+        year = int(context.args[0]) if context.args else datetime.now().year
+        if not 1900 <= year < 9999:
+            raise ValueError(year)
+        start = datetime(year, 1, 1).date()
+    except ValueError:
+        await update.message.reply_text(
+            "❌ 잘못된 형식입니다.\n\n"
+            "사용법: /연간통계 [YYYY]\n"
+            "예시: /연간통계 2026"
+        )
+        return
+
+    await _reply_period_stats(update, tenant, start, datetime(year + 1, 1, 1).date(), f"{year}년 연간 통계")
+
+
+async def resync_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """미러 전체 재동기화 명령어 처리: /동기화"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    try:
+        db_props = await get_db_properties(tenant)
+        if not db_props:
+            await update.message.reply_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
+            return
+
+        await update.message.reply_text("🔄 노션 데이터를 다시 불러오는 중...")
+        count = await sync_mirror(tenant, db_props, full=True)
+        await update.message.reply_text(f"✅ 동기화 완료: {count}건")
+
+    except Exception as e:
+        logger.error(f"동기화 오류: {e}")
+        await update.message.reply_text(f"❌ 동기화 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
+
+
+def parse_date(date_str, strict=False):
+    """날짜 문자열을 ISO 형식으로 변환 (strict=True면 파싱 실패 시 오늘 대신 ValueError)"""
     if not date_str or date_str == "오늘":
         return datetime.now().isoformat()
 
@@ -385,84 +956,571 @@ def parse_date(date_str):
     except:
         pass
 
+    if strict:
+        raise ValueError(date_str)
+
     # 파싱 실패시 오늘 날짜 반환
     return datetime.now().isoformat()
 
 
-async def save_to_notion(message_data: dict):
-    """노션 Transaction DB에 메시지 저장"""
+class EntryError(ValueError):
+    """거래 항목 검증 오류
+
+    field: 'missing' | 'amount' | 'type' | 'category' | 'date', value: 잘못된 값,
+    suggestions: 비슷한 카테고리 옵션, options: 선택 가능한 옵션 전체
+    """
+
+    MESSAGES = {
+        'missing': "필수 항목 부족 (내용, 금액, 종류, 카테고리)",
+        'amount': "금액이 올바르지 않음",
+        'type': "종류는 '지출' 또는 '수입'만 가능",
+        'category': "없는 카테고리",
+        'date': "날짜 형식이 올바르지 않음",
+    }
+
+    def __init__(self, field, value=None, suggestions=(), options=()):
+        self.field = field
+        self.value = value
+        self.suggestions = list(suggestions)
+        self.options = list(options)
+        message = self.MESSAGES[field]
+        if value is not None:
+            message = f"{message}: '{value}'"
+        if self.suggestions:
+            message += f" (추천: {', '.join(self.suggestions)})"
+        super().__init__(message)
+
+
+def parse_entry(parts, strict_date=False, categories=None):
+    """[내용, 금액, 종류, 카테고리, 날짜(선택)] 목록을 저장할 데이터로 변환
+
+    ! 메시지와 /import 파일 행이 같은 검증을 거친다. 잘못된 항목은 EntryError를 발생시킨다.
+    categories(CategoryIndex)를 주면 종류/카테고리를 Notion 선택 옵션 이름으로 바꾸고,
+    맞는 옵션이 없으면 비슷한 옵션을 추천과 함께 EntryError로 알린다.
+    """
+    # 최소 4개 항목 필요 (내용, 금액, 종류, 카테고리)
+    if len(parts) < 4 or not all(parts[:4]):
+        raise EntryError('missing')
+
+    # 1. 내용 파싱
+    title = parts[0]
+
+    # 2. 금액 파싱 (필수)
     try:
-        # 동적으로 속성 이름 가져오기
-        db_props = get_db_properties()
-        if not db_props or 'props' not in db_props:
-            logger.error("데이터베이스 속성을 가져올 수 없습니다")
-            return False, "데이터베이스 속성을 가져올 수 없습니다"
+        amount = int(parts[1].replace(',', '').replace('원', ''))
+    except ValueError:
+        raise EntryError('amount', parts[1])
 
-        props = db_props['props']
+    # 3. 종류 파싱 (필수: 지출 또는 수입)
+    trans_type = parts[2]
+    if trans_type not in ["지출", "수입"]:
+        raise EntryError('type', trans_type)
+    if categories:
+        option, _ = categories.resolve_type(trans_type)
+        if option is None:
+            raise EntryError('type', trans_type)
+        trans_type = option
+
+    # 4. 카테고리 파싱 (필수, 선택 옵션 이름으로 정규화)
+    category = parts[3]
+    if categories:
+        option, suggestions = categories.resolve_category(trans_type, category)
+        if option is None:
+            raise EntryError('category', category, suggestions, categories.options(trans_type))
+        category = option
 
-        # 기본 속성 구성
-        properties = {
-            props['title']: {
-                "title": [{"text": {"content": message_data['title']}}]
-            },
-            props['date']: {
-                "date": {"start": message_data['date']}
-            }
+    # 5. 날짜 파싱 (선택)
+    date_str = None
+    if len(parts) >= 5:
+        date_str = parts[4]
+    try:
+        date = parse_date(date_str, strict=strict_date)
+    except ValueError:
+        raise EntryError('date', date_str)
+
+    return {
+        'title': title,
+        'amount': amount,
+        'type': trans_type,
+        'category': category,
+        'date': date
+    }
+
+
+async def build_properties(tenant, props, message_data, clear_other_type=False):
+    """저장할 데이터를 Transaction DB 페이지 속성으로 변환
+
+    clear_other_type=True면 반대 종류의 금액/카테고리 속성을 비운다 (/수정으로 종류를 바꿀 때).
+    """
+    # 기본 속성 구성
+    properties = {
+        props['title']: {
+            "title": [{"text": {"content": message_data['title']}}]
+        },
+        props['date']: {
+            "date": {"start": message_data['date']}
+        }
+    }
+
+    # 종류 추가 (필수)
+    if 'type' in message_data and 'type' in props:
+        properties[props['type']] = {
+            "select": {"name": message_data['type']}
         }
 
-        # 종류 추가 (필수)
-        if 'type' in message_data and 'type' in props:
-            properties[props['type']] = {
-                "select": {"name": message_data['type']}
+    # 금액 및 카테고리 추가 (지출/수입에 따라 다름)
+    if message_data['type'] == '지출':
+        # 지출 비용
+        if 'amount' in message_data and 'expense_amount' in props:
+            properties[props['expense_amount']] = {
+                "number": message_data['amount']
+            }
+
+        # 지출 카테고리
+        if 'category' in message_data and 'expense_category' in props:
+            properties[props['expense_category']] = {
+                "select": {"name": message_data['category']}
+            }
+
+        if clear_other_type:
+            if 'income_amount' in props:
+                properties[props['income_amount']] = {"number": None}
+            if 'income_category' in props:
+                properties[props['income_category']] = {"select": None}
+
+    elif message_data['type'] == '수입':
+        # 수입 비용
+        if 'amount' in message_data and 'income_amount' in props:
+            properties[props['income_amount']] = {
+                "number": message_data['amount']
             }
 
-        # 금액 및 카테고리 추가 (지출/수입에 따라 다름)
-        if message_data['type'] == '지출':
-            # 지출 비용
-            if 'amount' in message_data and 'expense_amount' in props:
-                properties[props['expense_amount']] = {
-                    "number": message_data['amount']
-                }
-
-            # 지출 카테고리
-            if 'category' in message_data and 'expense_category' in props:
-                properties[props['expense_category']] = {
-                    "select": {"name": message_data['category']}
-                }
-
-        elif message_data['type'] == '수입':
-            # 수입 비용
-            if 'amount' in message_data and 'income_amount' in props:
-                properties[props['income_amount']] = {
-                    "number": message_data['amount']
-                }
-
-            # 수입 카테고리
-            if 'category' in message_data and 'income_category' in props:
-                properties[props['income_category']] = {
-                    "select": {"name": message_data['category']}
-                }
+        # 수입 카테고리
+        if 'category' in message_data and 'income_category' in props:
+            properties[props['income_category']] = {
+                "select": {"name": message_data['category']}
+            }
+
+        if clear_other_type:
+            if 'expense_amount' in props:
+                properties[props['expense_amount']] = {"number": None}
+            if 'expense_category' in props:
+                properties[props['expense_category']] = {"select": None}
+
+    # 월 관계형 속성 (Monthly DB의 YYYY-MM 페이지, 인덱스에 있으면 추가 조회 없음)
+    monthly_index = tenant.monthly_index
+    if monthly_index and 'month' in props:
+        year_month = message_data['date'][:7]
+        try:
+            month_page_id = await monthly_index.get_page_id(year_month)
+        except NotionUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"월 페이지 조회 오류 ({year_month}): {e}")
+            month_page_id = None
+        if month_page_id:
+            properties[props['month']] = {
+                "relation": [{"id": month_page_id}]
+            }
+
+    return properties
+
 
+async def _find_page_by_key(tenant, props, key):
+    """저장 키 속성으로 이미 만들어진 페이지 조회 (없으면 None)"""
+    response = await tenant.gateway.query_database(
+        tenant.database_id,
+        filter={"property": props['idempotency_key'], "rich_text": {"equals": key}},
+        page_size=1
+    )
+    results = response.get('results', [])
+    return results[0] if results else None
+
+
+def _remember_saved_page(tenant, props, message_data, page):
+    """저장된 페이지를 중복 방지 기록, 최근 페이지 색인, 미러에 반영"""
+    key = message_data.get('idempotency_key')
+    if key:
+        try:
+            idempotency.record(key, page['id'])
+        except Exception as e:
+            logger.error(f"중복 방지 기록 오류 (key={key}): {e}")
+
+    if message_data.get('chat_id') is not None:
+        try:
+            recent_pages.push(message_data['chat_id'], tenant.name, page['id'], message_data)
+        except Exception as e:
+            logger.error(f"최근 페이지 기록 오류: {e}")
+
+    # 미러에 바로 반영 (write-through)
+    try:
+        tenant.mirror.upsert_page(page, props)
+    except Exception as e:
+        logger.error(f"미러 반영 오류: {e}")
+
+
+async def save_to_notion(tenant, message_data: dict):
+    """테넌트의 노션 Transaction DB에 메시지 저장
+
+    (성공 여부, 메시지)를 반환하고, 서킷 브레이커가 열려 있으면 NotionUnavailableError를 발생시킨다.
+    message_data에 idempotency_key가 있으면:
+    - 이미 저장된 키면 Notion을 호출하지 않고 성공으로 끝낸다
+    - 페이지의 저장 키 속성에 키를 함께 적고, 이전 시도가 응답을 잃어버렸으면(sending)
+      다시 만들기 전에 그 키로 Notion을 조회해 이미 만들어진 페이지를 찾는다
+    - 저장 키 속성이 없어 만들어졌는지 확인할 수 없으면 UnconfirmedSaveError를 발생시킨다
+    message_data에 chat_id가 있으면 만든 페이지를 그 채팅의 최근 페이지 색인에 기록한다 (/취소, /수정).
+    """
+    monthly_index = tenant.monthly_index
+    key = message_data.get('idempotency_key')
+    record = idempotency.get(key) if key else None
+    if record and record['page_id']:
+        metrics.DUPLICATE_SAVES.inc(stage='save')
+        logger.info(f"이미 저장된 항목 건너뜀 (key={key}, page={record['page_id']})")
+        return True, "이미 저장됨"
+
+    try:
+        # 동적으로 속성 이름 가져오기
+        db_props = await get_db_properties(tenant)
+        if not db_props or 'props' not in db_props:
+            logger.error("데이터베이스 속성을 가져올 수 없습니다")
+            return False, "데이터베이스 속성을 가져올 수 없습니다"
+
+        props = db_props['props']
+        can_verify = 'idempotency_key' in props
+
+        if record and record['status'] == 'sending':
+            # 이전 시도의 결과를 모름: 저장 키로 이미 만들어진 페이지가 있는지 먼저 확인
+            if not can_verify:
+                raise UnconfirmedSaveError(f"이전 저장 요청의 결과를 확인할 수 없습니다 (key={key})")
+            existing = await _find_page_by_key(tenant, props, key)
+            if existing:
+                metrics.DUPLICATE_SAVES.inc(stage='save')
+                logger.info(f"응답을 잃어버린 저장이 이미 반영되어 있음 (key={key}, page={existing['id']})")
+                _remember_saved_page(tenant, props, message_data, existing)
+                return True, "이미 저장됨"
+
+        properties = await build_properties(tenant, props, message_data)
+        if key and can_verify:
+            properties[props['idempotency_key']] = {
+                "rich_text": [{"text": {"content": key}}]
+            }
         new_page = {
-            "parent": {"database_id": NOTION_DATABASE_ID},
+            "parent": {"database_id": tenant.database_id},
             "properties": properties
         }
 
-        notion.pages.create(**new_page)
+        if key:
+            idempotency.begin(key)
+        try:
+            created = await tenant.gateway.create_page(**new_page)
+        except Exception as e:
+            if not key:
+                raise
+            if not_applied(e):
+                idempotency.release(key, record['status'] if record else None)
+            elif not can_verify:
+                # 응답만 잃어버렸을 수 있는데 나중에 확인할 방법이 없으므로 다시 보내지 않음
+                logger.error(f"저장 결과 확인 불가 (key={key}): {e}")
+                raise UnconfirmedSaveError(NotionGateway.describe_error(e)) from e
+            raise
+
+        _remember_saved_page(tenant, props, message_data, created)
         return True, "저장 성공"
+    except (NotionUnavailableError, UnconfirmedSaveError):
+        # 장애 중에는 대기열이 재시도 횟수를 쓰지 않고 미루도록 그대로 전달
+        raise
+    except APIResponseError as e:
+        if e.code == APIErrorCode.ValidationError:
+            # 속성 이름/옵션이나 월 페이지가 바뀌었을 수 있으므로 새로 고쳐 재시도에 대비
+            tenant.schema_cache.invalidate()
+            if monthly_index:
+                monthly_index.invalidate()
+        error_msg = NotionGateway.describe_error(e)
+        logger.error(f"노션 저장 오류: {e}")
+        return False, error_msg
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"노션 저장 오류: {error_msg}")
+        error_msg = NotionGateway.describe_error(e)
+        logger.error(f"노션 저장 오류: {e}")
         return False, error_msg
 
 
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """거래 내역 파일 가져오기: 캡션이 /import인 파일, 또는 파일에 /import로 답장"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    message = update.message
+    document = message.document
+    if not document and message.reply_to_message:
+        document = message.reply_to_message.document
+
+    if not document:
+        await message.reply_text(
+            "📥 CSV/TSV 파일을 보내면서 캡션에 /import 를 입력하거나,\n"
+            "보낸 파일에 /import 로 답장해주세요.\n\n"
+            "열 순서 (또는 헤더 이름): 내용, 금액, 종류, 카테고리, 날짜\n"
+            "예: 커피,4500,지출,2-1. 식비,2026-01-09"
+        )
+        return
+
+    file_name = document.file_name or ''
+    if not file_name.lower().endswith(('.csv', '.tsv', '.txt')):
+        await message.reply_text("❌ CSV 또는 TSV 파일만 가져올 수 있습니다.")
+        return
+
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.reply_text("❌ 파일이 너무 큽니다. (최대 20MB, 나눠서 보내주세요)")
+        return
+
+    chat_id = update.effective_chat.id
+    task = running_tasks.get((chat_id, 'import'))
+    if task and not task.done():
+        await message.reply_text("⏳ 이미 진행 중인 가져오기가 있습니다. 끝난 뒤 다시 시도해주세요.")
+        return
+
+    status_message = await message.reply_text(f"📥 {file_name} 가져오기를 시작합니다...")
+
+    # 오래 걸리는 작업이므로 핸들러는 바로 끝내고 백그라운드에서 진행
+    # (Application.create_task는 종료 시 작업이 끝날 때까지 기다리므로 직접 관리)
+    running_tasks[(chat_id, 'import')] = asyncio.create_task(
+        _import_document(tenant, document, status_message, context.bot)
+    )
+
+
+def _import_progress_text(file_name, result, fraction):
+    return (
+        f"📥 {file_name} 가져오는 중... {fraction * 100:.0f}%\n\n"
+        f"읽은 행: {result.read:,}\n"
+        f"저장: {result.saved:,}건\n"
+        f"실패: {result.failed:,}건"
+    )
+
+
+async def _import_document(tenant, document, status_message, bot):
+    """파일을 내려받아 한 행씩 검증/저장하고 진행 상황을 상태 메시지에 표시"""
+    file_name = document.file_name or ''
+    result = ImportResult()
+    path = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(file_name)[1], delete=False) as f:
+            path = f.name
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_drive(path)
+        reader = TableReader(path, file_name)
+        # 카테고리 검증에 쓸 옵션 색인이 준비되도록 스키마를 먼저 읽어 둠
+        try:
+            await get_db_properties(tenant)
+        except NotionUnavailableError:
+            pass
+
+        async def on_progress(result, fraction):
+            await status_message.edit_text(_import_progress_text(file_name, result, fraction))
+
+        await run_import(
+            reader,
+            result,
+            # 과거 내역을 오늘 날짜로 잘못 저장하지 않도록 날짜 파싱 실패는 오류로 처리
+            lambda parts: parse_entry(
+                parts, strict_date=True, categories=tenant.schema_cache.category_index
+            ),
+            functools.partial(save_to_notion, tenant),
+            concurrency=IMPORT_CONCURRENCY,
+            on_progress=on_progress
+        )
+
+        summary = (
+            f"✅ {file_name} 가져오기 완료 ({result.elapsed:.0f}초)\n\n"
+            f"읽은 행: {result.read:,}\n"
+            f"저장: {result.saved:,}건\n"
+            f"실패: {result.failed:,}건"
+        )
+        if result.sample_errors:
+            summary += "\n\n⚠️ 실패한 행:\n" + "\n".join(result.sample_errors)
+            if result.failed > len(result.sample_errors):
+                summary += f"\n... 외 {result.failed - len(result.sample_errors):,}건 (첨부 파일 참고)"
+        await status_message.edit_text(summary)
+
+        if result.failed:
+            await bot.send_document(
+                chat_id=status_message.chat_id,
+                document=result.error_report(),
+                filename=f"import_errors_{os.path.splitext(file_name)[0]}.csv",
+                caption="가져오기 실패 행 목록"
+            )
+
+    except asyncio.CancelledError:
+        await status_message.edit_text(
+            f"⏹ 봇이 종료되어 {file_name} 가져오기가 중단되었습니다.\n\n"
+            f"저장: {result.saved:,}건, 실패: {result.failed:,}건\n"
+            "이미 저장된 행이 있으니 다시 가져오기 전에 노션을 확인해주세요."
+        )
+        raise
+    except Exception as e:
+        logger.error(f"가져오기 오류: {e}")
+        await status_message.edit_text(f"❌ 가져오기 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
+    finally:
+        result.close()
+        if path:
+            os.remove(path)
+
+
+def _parse_export_args(args):
+    """/export 인자 -> (시작일, 종료일(다음 날), 형식, 파일 이름용 기간), 잘못되면 ValueError"""
+    fmt = 'csv'
+    dates = []
+    for arg in args:
+        if arg.lower() in EXPORT_FORMATS:
+            fmt = arg.lower()
+        else:
+            dates.append(arg)
+
+    if not dates:
+        dates = [datetime.now().strftime('%Y-%m')]
+
+    if len(dates) == 1:
+        # YYYY-MM: 한 달
+        month_start = datetime.strptime(dates[0], '%Y-%m').date()
+        return month_start.isoformat(), _next_month(month_start).isoformat(), fmt, dates[0]
+
+    if len(dates) == 2:
+        # 시작일 종료일 (종료일 포함)
+        start = datetime.fromisoformat(parse_date(dates[0], strict=True)).date()
+        end = datetime.fromisoformat(parse_date(dates[1], strict=True)).date()
+        if end < start:
+            raise ValueError("종료일이 시작일보다 빠릅니다")
+        return start.isoformat(), (end + timedelta(days=1)).isoformat(), fmt, f"{start}_{end}"
+
+    raise ValueError("인자가 너무 많습니다")
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """기간 거래 내역 내보내기: /export [YYYY-MM | 시작일 종료일] [csv|jsonl]"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    try:
+        start_date, end_date, fmt, label = _parse_export_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(
+            "❌ 잘못된 형식입니다.\n\n"
+            "사용법:\n"
+            "/export [YYYY-MM] [csv|jsonl]\n"
+            "/export [시작일] [종료일] [csv|jsonl]\n\n"
+            "예시: /export 2026-01\n"
+            "예시: /export 2026-01-01 2026-03-31 jsonl"
+        )
+        return
+
+    chat_id = update.effective_chat.id
+    task = running_tasks.get((chat_id, 'export'))
+    if task and not task.done():
+        await update.message.reply_text("⏳ 이미 진행 중인 내보내기가 있습니다. 끝난 뒤 다시 시도해주세요.")
+        return
+
+    status_message = await update.message.reply_text(f"📤 {label} 거래 내역을 내보내는 중...")
+    running_tasks[(chat_id, 'export')] = asyncio.create_task(
+        _export_period(tenant, start_date, end_date, fmt, label, status_message, context.bot)
+    )
+
+
+async def _export_period(tenant, start_date, end_date, fmt, label, status_message, bot):
+    """Notion 쿼리 커서를 따라 기간 거래를 임시 파일에 쓰고 문서로 전송"""
+    try:
+        db_props = await get_db_properties(tenant)
+        if not db_props or 'date' not in db_props['props']:
+            await status_message.edit_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
+            return
+
+        projection = [db_props['ids'][key] for key in MIRROR_PROPERTIES if key in db_props['ids']]
+        export_file, count = await export_transactions(
+            tenant.gateway,
+            tenant.database_id,
+            db_props['props'],
+            start_date,
+            end_date,
+            fmt=fmt,
+            projection=projection
+        )
+        with export_file:
+            if count == 0:
+                await status_message.edit_text(f"📭 {label} 기간에 거래 내역이 없습니다.")
+                return
+
+            size = export_file.seek(0, os.SEEK_END)
+            export_file.seek(0)
+            if size > EXPORT_MAX_FILE_SIZE:
+                await status_message.edit_text("❌ 파일이 너무 큽니다. (최대 50MB, 기간을 나눠서 내보내주세요)")
+                return
+
+            await bot.send_document(
+                chat_id=status_message.chat_id,
+                document=export_file,
+                filename=f"transactions_{label}.{fmt}",
+                caption=f"📤 {label} 거래 내역 {count:,}건"
+            )
+        await status_message.edit_text(f"✅ {label} 거래 내역 {count:,}건을 내보냈습니다.")
+
+    except asyncio.CancelledError:
+        await status_message.edit_text("⏹ 봇이 종료되어 내보내기가 중단되었습니다.")
+        raise
+    except Exception as e:
+        logger.error(f"내보내기 오류: {e}")
+        await status_message.edit_text(f"❌ 내보내기 중 오류가 발생했습니다:\n{NotionGateway.describe_error(e)}")
+
+
+def _entry_error_reply(error):
+    """! 메시지 검증 오류 안내 문구"""
+    if error.field == 'amount':
+        return (
+            f"❌ 금액이 올바르지 않습니다: '{error.value}'\n\n"
+            "금액은 숫자만 입력해주세요.\n"
+            "예: 4500, 12000, 3000000"
+        )
+    if error.field == 'category':
+        reply = f"❌ 카테고리를 찾을 수 없습니다: '{error.value}'\n\n"
+        if error.suggestions:
+            reply += f"혹시 이 카테고리인가요? {', '.join(error.suggestions)}\n\n"
+        if error.options:
+            reply += f"사용 가능한 카테고리:\n{', '.join(error.options)}"
+        return reply.rstrip()
+    if error.field == 'type':
+        return (
+            f"❌ 종류가 올바르지 않습니다: '{error.value}'\n\n"
+            "종류는 '지출' 또는 '수입'만 가능합니다.\n"
+            "예: ! 커피 4500 지출 교통비"
+        )
+    return (
+        "❌ 필수 항목이 부족합니다.\n\n"
+        "형식: ! [내용] [금액] [종류] [카테고리] [날짜(선택)]\n\n"
+        "필수 항목:\n"
+        "1. 내용\n"
+        "2. 금액 (숫자)\n"
+        "3. 종류 (지출 또는 수입)\n"
+        "4. 카테고리\n\n"
+        "예시: ! 커피 4500 지출 교통비"
+    )
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """일반 메시지 처리"""
     user = update.effective_user
     message = update.message.text
 
+    # ! 로 시작하는 줄이 두 개 이상이면 여러 줄 항목으로 한꺼번에 처리 (다른 줄은 메모로 보고 무시)
+    entry_lines = [line.strip() for line in message.splitlines() if line.strip().startswith('!')]
+
     # ! 로 시작하는 메시지만 처리
-    if not message.startswith('!'):
+    if not message.startswith('!') and len(entry_lines) < 2:
+        return
+
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    if len(entry_lines) > 1:
+        await handle_batch(update, tenant, entry_lines)
         return
 
     # ! 를 제거한 실제 메시지 내용
@@ -477,105 +1535,610 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
+    # Telegram이 다시 보낸 메시지는 대기열에 다시 넣지 않음
+    key = message_key(update.effective_chat.id, update.message.message_id)
+    if idempotency.get(key):
+        metrics.DUPLICATE_SAVES.inc(stage='accept')
+        await update.message.reply_text("ℹ️ 이미 접수된 메시지입니다. (다시 저장하지 않습니다)")
+        return
+
     # 메시지 파싱: ! 내용 금액 종류 카테고리 [날짜]
     parts = actual_message.split()
 
-    # 최소 4개 항목 필요 (내용, 금액, 종류, 카테고리)
-    if len(parts) < 4:
+    # 카테고리는 캐시된 선택 옵션 색인으로 저장 전에 검증 (스키마를 못 읽으면 입력값 그대로 저장)
+    try:
+        await get_db_properties(tenant)
+    except NotionUnavailableError:
+        # 장애 중에도 대기열에는 접수
+        pass
+
+    try:
+        message_data = parse_entry(parts, categories=tenant.schema_cache.category_index)
+    except EntryError as e:
+        await update.message.reply_text(_entry_error_reply(e))
+        return
+    message_data['idempotency_key'] = key
+    message_data['chat_id'] = update.effective_chat.id
+
+    # 저장 대기열에 커밋 (Notion 저장은 백그라운드에서 진행, 실패 시 이 채팅으로 알림)
+    try:
+        outbox.enqueue(update.effective_chat.id, message_data, tenant=tenant.name)
+    except Exception as e:
+        logger.error(f"대기열 추가 오류: {e}")
+        await update.message.reply_text(f"❌ 저장에 실패했습니다.\n오류: {str(e)}")
+        return
+
+    # 대기열 커밋 후 기록 (그 사이에 죽어 같은 항목이 두 번 들어가도 저장은 키로 한 번만 됨)
+    try:
+        idempotency.accept(key)
+    except Exception as e:
+        logger.error(f"중복 방지 기록 오류 (key={key}): {e}")
+
+    if tenant.flusher:
+        tenant.flusher.wake()
+
+    summary = f"✅ 접수되었습니다! (노션에 곧 저장됩니다)\n\n"
+    summary += f"내용: {message_data['title']}\n"
+    summary += f"금액: {message_data['amount']:,}원\n"
+    summary += f"종류: {message_data['type']}\n"
+    summary += f"카테고리: {message_data['category']}\n"
+
+    # 날짜 표시
+    date_obj = datetime.fromisoformat(message_data['date'])
+    summary += f"날짜: {date_obj.strftime('%Y년 %m월 %d일')}"
+
+    await update.message.reply_text(summary)
+
+
+def _batch_entry_text(message_data):
+    """여러 줄 처리 결과에 표시할 항목 요약"""
+    date_obj = datetime.fromisoformat(message_data['date'])
+    return (
+        f"{message_data['title']} {message_data['amount']:,}원 "
+        f"({message_data['type']}, {message_data['category']}, {date_obj.strftime('%m/%d')})"
+    )
+
+
+async def handle_batch(update: Update, tenant, lines):
+    """여러 줄 ! 메시지: 모든 줄을 먼저 검증한 뒤 올바른 항목을 동시에 저장하고 결과를 한 번에 응답
+
+    저장은 테넌트 게이트웨이의 동시 요청 수/속도 제한 안에서 진행된다.
+    바로 저장하지 못한 항목(Notion 장애, 재시도 후에도 남은 타임아웃/5xx 등)은 한 줄 메시지와 같이
+    저장 대기열에 넣어 나중에 다시 시도하고, 최종 실패는 대기열이 이 채팅으로 알린다.
+    줄마다 중복 방지 키를 두어 다시 받은 메시지는 이미 저장/접수된 줄을 건너뛴다.
+    """
+    if len(lines) > BATCH_MAX_LINES:
         await update.message.reply_text(
-            "❌ 필수 항목이 부족합니다.\n\n"
-            "형식: ! [내용] [금액] [종류] [카테고리] [날짜(선택)]\n\n"
-            "필수 항목:\n"
-            "1. 내용\n"
-            "2. 금액 (숫자)\n"
-            "3. 종류 (지출 또는 수입)\n"
-            "4. 카테고리\n\n"
-            "예시: ! 커피 4500 지출 교통비"
+            f"❌ 한 번에 최대 {BATCH_MAX_LINES}줄까지 저장할 수 있습니다. (받은 줄: {len(lines)})\n"
+            "더 많은 내역은 /import로 파일을 보내주세요."
         )
         return
 
-    # 1. 내용 파싱
-    title = parts[0]
-
-    # 2. 금액 파싱 (필수)
     try:
-        amount = int(parts[1].replace(',', '').replace('원', ''))
-    except ValueError:
+        await get_db_properties(tenant)
+    except NotionUnavailableError:
+        pass
+    categories = tenant.schema_cache.category_index
+
+    # 줄 번호 -> 결과 문구
+    results = {}
+    entries = []
+    for line_no, line in enumerate(lines, start=1):
+        try:
+            message_data = parse_entry(line[1:].split(), categories=categories)
+        except EntryError as e:
+            results[line_no] = f"❌ {line[1:].strip()[:30]} - {e}"
+            continue
+        message_data['idempotency_key'] = message_key(update.effective_chat.id, update.message.message_id, line_no)
+        message_data['chat_id'] = update.effective_chat.id
+        entries.append((line_no, message_data))
+
+    status_message = await update.message.reply_text(f"⏳ {len(lines)}줄 중 {len(entries)}건 저장 중...")
+
+    queued = 0
+
+    def enqueue(line_no, message_data, note):
+        """바로 저장하지 못한 줄을 저장 대기열에 넣음 (한 줄 ! 메시지와 같은 재시도/실패 알림)"""
+        nonlocal queued
+        key = message_data['idempotency_key']
+        try:
+            outbox.enqueue(update.effective_chat.id, message_data, tenant=tenant.name)
+        except Exception as e:
+            logger.error(f"대기열 추가 오류: {e}")
+            results[line_no] = f"❌ {_batch_entry_text(message_data)} - {e}"
+            return
+        try:
+            idempotency.accept(key)
+        except Exception as e:
+            logger.error(f"중복 방지 기록 오류 (key={key}): {e}")
+        queued += 1
+        results[line_no] = f"⏳ {_batch_entry_text(message_data)} - {note}"
+
+    async def save(line_no, message_data):
+        nonlocal queued
+        key = message_data['idempotency_key']
+        record = idempotency.get(key)
+        if record and record['status'] == 'accepted':
+            # 이전에 받은 같은 메시지에서 대기열에 넣은 줄: 대기열이 저장
+            metrics.DUPLICATE_SAVES.inc(stage='accept')
+            queued += 1
+            results[line_no] = f"⏳ {_batch_entry_text(message_data)} - 이미 대기열에 접수됨"
+            return
+        try:
+            success, msg = await save_to_notion(tenant, message_data)
+        except NotionUnavailableError:
+            enqueue(line_no, message_data, "대기열 접수 (노션 복구 후 저장)")
+            return
+        except UnconfirmedSaveError:
+            results[line_no] = f"⚠️ {_batch_entry_text(message_data)} - 저장 여부 확인 불가 (노션에서 확인해주세요)"
+            return
+        if success:
+            note = f" - {msg}" if record else ""
+            results[line_no] = f"✅ {_batch_entry_text(message_data)}{note}"
+        else:
+            # 타임아웃/5xx나 응답을 잃어버린 저장도 대기열이 다시 시도 (응답 유실은 저장 키로 먼저 확인)
+            enqueue(line_no, message_data, f"대기열 접수 (다시 저장 예정: {msg})")
+
+    await asyncio.gather(*(save(line_no, message_data) for line_no, message_data in entries))
+    if queued and tenant.flusher:
+        tenant.flusher.wake()
+
+    saved = sum(1 for text in results.values() if text.startswith('✅'))
+    failed = len(lines) - saved - queued
+    report = f"📝 {len(lines)}줄 처리 결과: 저장 {saved}건"
+    if queued:
+        report += f", 대기 {queued}건"
+    if failed:
+        report += f", 실패 {failed}건"
+    report += "\n\n" + "\n".join(f"{line_no}. {results[line_no]}" for line_no in range(1, len(lines) + 1))
+    # Telegram 메시지 길이 제한 (4096자)
+    if len(report) > 4096:
+        report = report[:4090] + "\n..."
+    await status_message.edit_text(report)
+
+
+# /수정에서 고칠 수 있는 항목 -> parse_entry 인자 순서
+EDIT_FIELDS = {'내용': 0, '금액': 1, '종류': 2, '카테고리': 3, '날짜': 4}
+
+
+def _recent_entry_text(entry):
+    """최근 페이지 색인 항목 요약"""
+    return _batch_entry_text({field: entry[field] for field in ('title', 'amount', 'type', 'category', 'date')})
+
+
+async def _last_saved_page(update: Update, tenant):
+    """채팅에서 마지막으로 저장한 페이지 (없으면 안내 후 None)
+
+    저장 대기열에 이 채팅의 항목이 남아 있으면 가장 최근 항목이 아직 노션에 없으므로 잠시 후 다시 시도하도록 안내한다.
+    """
+    if outbox.pending_count(tenant=tenant.name, chat_id=update.effective_chat.id):
+        await update.message.reply_text("⏳ 아직 노션에 저장 중인 항목이 있습니다. 잠시 후 다시 시도해주세요.")
+        return None
+
+    entry = recent_pages.last(update.effective_chat.id, tenant.name)
+    if not entry:
         await update.message.reply_text(
-            f"❌ 금액이 올바르지 않습니다: '{parts[1]}'\n\n"
-            "금액은 숫자만 입력해주세요.\n"
-            "예: 4500, 12000, 3000000"
+            f"📭 되돌릴 수 있는 최근 항목이 없습니다. (채팅마다 최근 {RECENT_PAGES_PER_CHAT}건까지 기억)"
         )
+    return entry
+
+
+async def undo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """마지막으로 저장한 항목 취소: /취소 (Notion 페이지를 보관 처리, 찾기 위한 조회 없음)"""
+    tenant = await get_tenant(update)
+    if not tenant:
         return
 
-    # 3. 종류 파싱 (필수: 지출 또는 수입)
-    trans_type = parts[2]
-    if trans_type not in ["지출", "수입"]:
+    entry = await _last_saved_page(update, tenant)
+    if not entry:
+        return
+
+    try:
+        await tenant.gateway.update_page(entry['page_id'], archived=True)
+    except Exception as e:
+        logger.error(f"항목 취소 오류: {e}")
+        await update.message.reply_text(f"❌ 취소에 실패했습니다.\n오류: {NotionGateway.describe_error(e)}")
+        return
+
+    recent_pages.remove(entry['page_id'])
+    try:
+        tenant.mirror.remove_page(entry['page_id'])
+    except Exception as e:
+        logger.error(f"미러 반영 오류: {e}")
+
+    await update.message.reply_text(f"↩️ 취소했습니다: {_recent_entry_text(entry)}")
+
+
+async def edit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """마지막으로 저장한 항목 수정: /수정 [항목] [값] ... (한 번의 pages.update로 반영)"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    args = context.args or []
+    changes = dict(zip(args[::2], args[1::2]))
+    if not args or len(args) % 2 or not set(changes) <= set(EDIT_FIELDS):
         await update.message.reply_text(
-            f"❌ 종류가 올바르지 않습니다: '{trans_type}'\n\n"
-            "종류는 '지출' 또는 '수입'만 가능합니다.\n"
-            "예: ! 커피 4500 지출 교통비"
+            "❌ 잘못된 형식입니다.\n\n"
+            "사용법: /수정 [항목] [값] ...\n"
+            f"항목: {', '.join(EDIT_FIELDS)}\n\n"
+            "예시: /수정 금액 5000\n"
+            "예시: /수정 카테고리 2-2.쇼핑 날짜 1/9"
         )
         return
 
-    # 4. 카테고리 파싱 (필수)
-    category = parts[3]
+    entry = await _last_saved_page(update, tenant)
+    if not entry:
+        return
 
-    # 5. 날짜 파싱 (선택)
-    date_str = None
-    if len(parts) >= 5:
-        date_str = parts[4]
+    try:
+        db_props = await get_db_properties(tenant)
+        if not db_props or 'props' not in db_props:
+            await update.message.reply_text("❌ 데이터베이스 속성을 가져올 수 없습니다.")
+            return
 
-    # 데이터 구성
-    message_data = {
-        'title': title,
-        'amount': amount,
-        'type': trans_type,
-        'category': category,
-        'date': parse_date(date_str)
-    }
+        # 저장된 값에 바꾼 항목만 덮어써서 ! 메시지와 같은 검증을 거침
+        parts = [entry['title'], str(entry['amount']), entry['type'], entry['category'], entry['date']]
+        for field, value in changes.items():
+            parts[EDIT_FIELDS[field]] = value
+        try:
+            message_data = parse_entry(parts, strict_date=True, categories=tenant.schema_cache.category_index)
+        except EntryError as e:
+            await update.message.reply_text(_entry_error_reply(e))
+            return
+
+        properties = await build_properties(
+            tenant, db_props['props'], message_data, clear_other_type=message_data['type'] != entry['type']
+        )
+        updated = await tenant.gateway.update_page(entry['page_id'], properties=properties)
+    except Exception as e:
+        logger.error(f"항목 수정 오류: {e}")
+        await update.message.reply_text(f"❌ 수정에 실패했습니다.\n오류: {NotionGateway.describe_error(e)}")
+        return
+
+    recent_pages.update(entry['page_id'], message_data)
+    try:
+        tenant.mirror.upsert_page(updated, db_props['props'])
+    except Exception as e:
+        logger.error(f"미러 반영 오류: {e}")
+
+    await update.message.reply_text(
+        f"✏️ 수정했습니다.\n\n"
+        f"이전: {_recent_entry_text(entry)}\n"
+        f"변경: {_batch_entry_text(message_data)}"
+    )
+
+
+RECURRING_USAGE = (
+    "사용법: /정기등록 [매월 며칠] [내용] [금액] [종류] [카테고리]\n"
+    "예시: /정기등록 25 월세 500000 지출 1-1.월세\n\n"
+    "그 달에 없는 날(31일 등)은 말일에 기록됩니다.\n"
+    "/정기목록 - 등록된 정기 거래 보기\n"
+    "/정기삭제 [번호] - 정기 거래 삭제"
+)
+
+
+async def recurring_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """정기 거래 등록: /정기등록 [매월 며칠] [내용] [금액] [종류] [카테고리]"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    args = context.args or []
+    try:
+        day = int(args[0]) if args else 0
+    except ValueError:
+        day = 0
+    if not 1 <= day <= 31 or len(args) != 5:
+        await update.message.reply_text(f"❌ 잘못된 형식입니다.\n\n{RECURRING_USAGE}")
+        return
+
+    try:
+        await get_db_properties(tenant)
+    except NotionUnavailableError:
+        pass
+
+    try:
+        message_data = parse_entry(args[1:], categories=tenant.schema_cache.category_index)
+    except EntryError as e:
+        if e.field == 'missing':
+            await update.message.reply_text(f"❌ {e}\n\n{RECURRING_USAGE}")
+        else:
+            await update.message.reply_text(_entry_error_reply(e))
+        return
+
+    entry = recurring.get(recurring.add(update.effective_chat.id, tenant.name, day, message_data))
+    await update.message.reply_text(
+        f"🔁 정기 거래를 등록했습니다. (번호 {entry['id']})\n\n"
+        f"매월 {day}일: {message_data['title']} {message_data['amount']:,}원 "
+        f"({message_data['type']}, {message_data['category']})\n"
+        f"첫 기록일: {entry['next_date']}"
+    )
+
+
+async def recurring_list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """정기 거래 목록: /정기목록"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
+
+    entries = recurring.for_chat(update.effective_chat.id)
+    if not entries:
+        await update.message.reply_text(f"📭 등록된 정기 거래가 없습니다.\n\n{RECURRING_USAGE}")
+        return
+
+    text = f"🔁 정기 거래 ({len(entries)}건):\n\n"
+    for entry in entries:
+        text += (
+            f"{entry['id']}. 매월 {entry['day']}일 {entry['title']} {entry['amount']:,}원 "
+            f"[{entry['category']}]\n   다음 기록일: {entry['next_date']}\n"
+        )
+    await update.message.reply_text(text.rstrip())
 
-    # 노션에 저장
-    success, msg = await save_to_notion(message_data)
 
-    if success:
-        summary = f"✅ 저장되었습니다!\n\n"
-        summary += f"내용: {title}\n"
-        summary += f"금액: {amount:,}원\n"
-        summary += f"종류: {trans_type}\n"
-        summary += f"카테고리: {category}\n"
+async def recurring_remove_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """정기 거래 삭제: /정기삭제 [번호]"""
+    tenant = await get_tenant(update)
+    if not tenant:
+        return
 
-        # 날짜 표시
-        date_obj = datetime.fromisoformat(message_data['date'])
-        summary += f"날짜: {date_obj.strftime('%Y년 %m월 %d일')}"
+    try:
+        entry_id = int(context.args[0])
+    except (IndexError, TypeError, ValueError):
+        await update.message.reply_text("❌ 삭제할 번호를 입력해주세요.\n예시: /정기삭제 3 (번호는 /정기목록에서 확인)")
+        return
 
-        await update.message.reply_text(summary)
+    if recurring.remove(update.effective_chat.id, entry_id):
+        await update.message.reply_text(f"🗑️ 정기 거래 {entry_id}번을 삭제했습니다. (이미 기록된 거래는 그대로 남습니다)")
     else:
-        await update.message.reply_text(f"❌ 저장에 실패했습니다.\n오류: {msg}")
+        await update.message.reply_text(f"❌ {entry_id}번 정기 거래가 없습니다. /정기목록에서 번호를 확인해주세요.")
+
+
+def post_recurring(tenant, today=None):
+    """테넌트의 기록할 차례인 정기 거래 회차를 모두 저장 대기열에 넣고 {chat_id: [message_data]} 반환
+
+    밀린 달이 있으면 달마다 한 건씩 넣는다. 회차마다 중복 방지 키를 붙이므로
+    next_date를 넘기기 전에 죽어 같은 회차를 다시 넣어도 Notion에는 한 번만 저장된다.
+    """
+    today = today or datetime.now().date()
+    posted = {}
+    for entry in recurring.due(tenant.name, today):
+        occurrence = datetime.fromisoformat(entry['next_date']).date()
+        while occurrence <= today:
+            key = occurrence_key(entry['id'], occurrence)
+            message_data = {
+                'title': entry['title'],
+                'amount': entry['amount'],
+                'type': entry['type'],
+                'category': entry['category'],
+                'date': datetime.combine(occurrence, datetime.min.time()).isoformat(),
+                'idempotency_key': key,
+                'chat_id': entry['chat_id'],
+            }
+            if not idempotency.get(key):
+                outbox.enqueue(entry['chat_id'], message_data, tenant=tenant.name)
+                idempotency.accept(key)
+                posted.setdefault(entry['chat_id'], []).append(message_data)
+            occurrence = following_occurrence(entry['day'], occurrence)
+        recurring.advance(entry['id'], occurrence)
+
+    if posted and tenant.flusher:
+        tenant.flusher.wake()
+    return posted
+
+
+async def refresh_schema_job(context: ContextTypes.DEFAULT_TYPE):
+    """주기적으로 모든 테넌트의 스키마 캐시 갱신 (요청이 없을 때도 캐시를 따뜻하게 유지)"""
+    for tenant in tenants.all():
+        try:
+            await tenant.schema_cache.refresh()
+        except Exception as e:
+            logger.warning(f"스키마 주기 갱신 실패 ({tenant.name}): {e}")
+
+
+async def health_check_job(context: ContextTypes.DEFAULT_TYPE):
+    """주기적으로 모든 테넌트의 Notion 데이터베이스 상태 확인 (/status 스냅샷 갱신)"""
+    await asyncio.gather(*(tenant.health.probe() for tenant in tenants.all()))
+
+
+async def recurring_job(context: ContextTypes.DEFAULT_TYPE):
+    """주기적으로 기록할 차례인 정기 거래를 저장 대기열에 넣고 채팅마다 한 번 알림
+
+    대기열이 테넌트별 OUTBOX_RATE 속도로 저장하므로 회차가 많아도 한 번에 몰려 보내지 않는다.
+    """
+    for tenant in tenants.all():
+        try:
+            posted = post_recurring(tenant)
+        except Exception as e:
+            logger.error(f"정기 거래 기록 오류 ({tenant.name}): {e}")
+            continue
+
+        for chat_id, entries in posted.items():
+            text = f"🔁 정기 거래 {len(entries)}건을 접수했습니다. (노션에 곧 저장됩니다)\n\n"
+            text += "\n".join(f"• {_batch_entry_text(message_data)}" for message_data in entries)
+            try:
+                await context.bot.send_message(chat_id=chat_id, text=text[:4096])
+            except Exception as e:
+                logger.error(f"정기 거래 알림 전송 오류 (chat_id={chat_id}): {e}")
+
+
+async def reconcile_rollups_job(context: ContextTypes.DEFAULT_TYPE):
+    """주기적으로 미러를 전체 동기화하고 월별 집계를 다시 계산해 어긋난 값 보정"""
+    for tenant in tenants.all():
+        try:
+            db_props = await get_db_properties(tenant)
+            if not db_props:
+                continue
+            await sync_mirror(tenant, db_props, full=True)
+            tenant.mirror.rollups.rebuild()
+        except Exception as e:
+            logger.warning(f"월별 집계 보정 실패 ({tenant.name}): {e}")
+
+
+async def post_init(application: Application):
+    """봇 시작 시 테넌트별 스키마 캐시/월 인덱스 예열, 저장 대기열 처리 작업 및 메트릭 서버 시작"""
+    global metrics_server
+
+    async def notify(chat_id, text):
+        try:
+            await application.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as e:
+            logger.error(f"알림 전송 오류 (chat_id={chat_id}): {e}")
+
+    for tenant in tenants.all():
+        # 스냅샷이 없거나 오래됐으면 첫 메시지 전에 미리 조회
+        if tenant.schema_cache.is_expired():
+            try:
+                await tenant.schema_cache.refresh()
+            except Exception as e:
+                logger.warning(f"스키마 예열 실패 ({tenant.name}): {e}")
+
+        # 저장 응답을 잃어버렸을 때 페이지가 만들어졌는지 조회할 수 있도록 저장 키 속성 준비
+        try:
+            if not await tenant.schema_cache.ensure_key_property():
+                logger.warning(f"저장 키 속성을 확인하지 못했습니다 ({tenant.name})")
+        except Exception as e:
+            logger.warning(
+                f"저장 키 속성 추가 실패 ({tenant.name}): {e} - 응답을 잃어버린 저장은 다시 보내지 않고 확인 요청으로 알립니다"
+            )
+
+        # Monthly DB 인덱스 미리 로드 (이후 저장은 월 관계 설정에 추가 조회가 필요 없음)
+        if tenant.monthly_index:
+            try:
+                await tenant.monthly_index.load()
+            except Exception as e:
+                logger.warning(f"Monthly DB 인덱스 로드 실패 ({tenant.name}): {e}")
+
+        # 테넌트마다 대기열 처리 작업을 따로 두어 한 가구의 밀린 항목이 다른 가구를 막지 않도록 함
+        tenant.flusher = OutboxFlusher(
+            outbox,
+            functools.partial(save_to_notion, tenant),
+            notify,
+            rate=OUTBOX_RATE,
+            max_attempts=OUTBOX_MAX_ATTEMPTS,
+            tenant=tenant.name
+        )
+        tenant.flusher.start()
+
+    if METRICS_PORT:
+        metrics_server = metrics.start_http_server(METRICS_PORT, address=METRICS_LISTEN)
+
+    application.job_queue.run_repeating(refresh_schema_job, interval=SCHEMA_TTL, first=SCHEMA_TTL)
+    application.job_queue.run_repeating(health_check_job, interval=HEALTH_CHECK_INTERVAL, first=1)
+    # 시작 직후 한 번 실행해 꺼져 있던 동안 지난 회차를 바로 기록
+    application.job_queue.run_repeating(recurring_job, interval=RECURRING_CHECK_INTERVAL, first=5)
+    application.job_queue.run_repeating(
+        reconcile_rollups_job,
+        interval=ROLLUP_RECONCILE_INTERVAL,
+        first=ROLLUP_RECONCILE_INTERVAL
+    )
+
+
+async def post_stop(application: Application):
+    """봇 종료 시 대기열에 남은 항목 저장 (봇이 아직 메시지를 보낼 수 있는 시점)"""
+    # 진행 중인 가져오기/내보내기는 중단하고 사용자에게 알림
+    for task in running_tasks.values():
+        task.cancel()
+    await asyncio.gather(*running_tasks.values(), return_exceptions=True)
+
+    await asyncio.gather(*(
+        tenant.flusher.drain(timeout=OUTBOX_DRAIN_TIMEOUT)
+        for tenant in tenants.all() if tenant.flusher
+    ))
+
+
+async def post_shutdown(application: Application):
+    """봇 종료 시 메트릭 서버, 테넌트별 Notion 연결 풀 및 로컬 DB 정리"""
+    if metrics_server:
+        metrics_server.stop()
+    if chart_renderer:
+        chart_renderer.close()
+    await tenants.aclose()
+    outbox.close()
+    idempotency.close()
+    recurring.close()
+    recent_pages.close()
 
 
 def main():
     """봇 실행"""
-    if not all([TELEGRAM_TOKEN, NOTION_API_KEY, NOTION_DATABASE_ID]):
+    if not TELEGRAM_TOKEN or not len(tenants):
         logger.error("환경 변수가 설정되지 않았습니다. .env 파일을 확인해주세요.")
         return
 
     # Application 생성
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    # 모든 핸들러는 처리 시간/예외를 메트릭에 기록 (metrics.timed_handler)
+    timed = metrics.timed_handler
 
     # 명령어 핸들러 등록
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("list", list_command))
-    application.add_handler(CommandHandler("status", status_command))
-    application.add_handler(CommandHandler("월별통계", monthly_stats_command))
+    application.add_handler(CommandHandler("start", timed(start)))
+    application.add_handler(CommandHandler("help", timed(help_command)))
+    application.add_handler(CommandHandler("list", timed(list_command)))
+    application.add_handler(CallbackQueryHandler(timed(list_page_callback), pattern=r'^list:'))
+    application.add_handler(CommandHandler("status", timed(status_command)))
+    application.add_handler(CommandHandler("import", timed(import_command)))
+    application.add_handler(CommandHandler("export", timed(export_command)))
+    # 캡션에 /import를 적어 보낸 파일 (CommandHandler는 캡션을 보지 않음)
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r'^/import(@\w+)?(\s|$)'),
+        timed(import_command)
+    ))
+
+    # 한글 명령어는 Telegram이 bot_command로 인식하지 않고 CommandHandler도 허용하지 않으므로
+    # '/' 접두사 핸들러로 처리 (일반 메시지 핸들러보다 먼저 등록해야 함)
+    application.add_handler(PrefixHandler("/", "월별통계", timed(monthly_stats_command)))
+    application.add_handler(PrefixHandler("/", "기간통계", timed(period_stats_command)))
+    application.add_handler(PrefixHandler("/", "연간통계", timed(yearly_stats_command)))
+    application.add_handler(PrefixHandler("/", "검색", timed(search_command)))
+    application.add_handler(PrefixHandler("/", "정기등록", timed(recurring_add_command)))
+    application.add_handler(PrefixHandler("/", "정기목록", timed(recurring_list_command)))
+    application.add_handler(PrefixHandler("/", "정기삭제", timed(recurring_remove_command)))
+    application.add_handler(PrefixHandler("/", "취소", timed(undo_command)))
+    application.add_handler(PrefixHandler("/", "수정", timed(edit_command)))
+    application.add_handler(PrefixHandler("/", "동기화", timed(resync_command)))
 
     # 메시지 핸들러 등록
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, timed(handle_message)))
 
     # 봇 시작
-    logger.info("봇이 시작되었습니다...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            logger.error("웹훅 모드에는 WEBHOOK_URL 환경 변수가 필요합니다.")
+            return
+
+        def ready_check():
+            # 일부 테넌트의 Notion 장애는 다른 테넌트 처리에 영향이 없으므로 모두 막혔을 때만 준비 안 됨
+            states = {tenant.name: tenant.gateway.breaker.state for tenant in tenants.all()}
+            ready = application.running and any(state != 'open' for state in states.values())
+            return ready, {
+                'notion': states,
+                'outbox_pending': outbox.pending_count(),
+            }
+
+        logger.info("봇이 웹훅 모드로 시작되었습니다...")
+        asyncio.run(run_webhook(
+            application,
+            webhook_url=WEBHOOK_URL,
+            url_path=WEBHOOK_PATH,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+            ready_check=ready_check
+        ))
+    else:
+        logger.info("봇이 시작되었습니다...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == '__main__':
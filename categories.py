@@ -0,0 +1,108 @@
+"""종류/카테고리 입력값을 Notion 선택 옵션에 맞추는 색인
+
+스키마 캐시가 모아 둔 선택 옵션(db_properties['categories'])으로 미리 정규화 색인을 만들어
+네트워크 호출 없이 입력값을 실제 옵션 이름으로 바꾼다.
+
+- '2-1.식비', '2-1. 식비', '2-1식비', '식비', '2-1' -> '2-1. 식비' (공백/구두점/대소문자 무시, 번호나 이름만으로도 매칭)
+- 오타는 한글을 자모 단위로 나눈 유사도로 비교해 ('식삐' -> '식비')
+  충분히 가깝고 후보가 하나뿐이면 바로 매칭하고, 아니면 추천 목록을 돌려준다
+
+옵션이 하나도 없는 속성은 검증하지 않는다 (입력값 그대로 저장).
+"""
+import difflib
+import re
+import unicodedata
+
+# 카테고리 앞의 번호 ('2-1.', '1-3 ')
+_CODE_PATTERN = re.compile(r'^\s*(\d+(?:-\d+)*)\s*\.?\s*')
+_IGNORED_PATTERN = re.compile(r'[\s.,·_\-/]+')
+
+# 추천 후보 유사도 하한 / 묻지 않고 바로 매칭하는 유사도 하한
+SUGGEST_CUTOFF = 0.5
+ACCEPT_CUTOFF = 0.8
+
+TYPE_FIELDS = {'지출': 'expense_category', '수입': 'income_category'}
+
+
+def normalize(value):
+    """비교용 키: 자모 분해(NFD), 대소문자/공백/구두점 무시"""
+    return _IGNORED_PATTERN.sub('', unicodedata.normalize('NFD', value).casefold())
+
+
+def _keys(option):
+    """옵션 하나를 가리키는 키 (전체 이름, 번호를 뺀 이름, 번호)"""
+    keys = {normalize(option)}
+    match = _CODE_PATTERN.match(option)
+    if match:
+        keys.add(normalize(option[match.end():]))
+        keys.add(normalize(match.group(1)))
+    keys.discard('')
+    return keys
+
+
+class OptionIndex:
+    """선택 속성 하나의 옵션 색인"""
+
+    def __init__(self, options):
+        self.options = list(options)
+        self._exact = {}
+        for option in self.options:
+            for key in _keys(option):
+                # 같은 키가 여러 옵션을 가리키면 모호하므로 정확 매칭에서 제외
+                self._exact[key] = option if self._exact.get(key, option) == option else None
+
+    def __bool__(self):
+        return bool(self.options)
+
+    def resolve(self, value):
+        """(옵션 이름, 추천 목록) 반환, 매칭되지 않으면 옵션 이름은 None"""
+        if not self.options:
+            return value, []
+
+        key = normalize(value)
+        option = self._exact.get(key)
+        if option:
+            return option, []
+
+        # 입력값을 seq2로 고정하면 SequenceMatcher가 분석 결과를 재사용하고,
+        # 상한값(real_quick_ratio/quick_ratio)이 낮은 후보는 정밀 비교 없이 건너뛴다
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(key)
+        scored = {}
+        for candidate_key, candidate in self._exact.items():
+            if candidate is None:
+                continue
+            matcher.set_seq1(candidate_key)
+            if matcher.real_quick_ratio() < SUGGEST_CUTOFF or matcher.quick_ratio() < SUGGEST_CUTOFF:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= SUGGEST_CUTOFF and ratio > scored.get(candidate, 0):
+                scored[candidate] = ratio
+        ranked = sorted(scored.items(), key=lambda item: -item[1])
+
+        if ranked and ranked[0][1] >= ACCEPT_CUTOFF and (len(ranked) == 1 or ranked[1][1] < ranked[0][1]):
+            return ranked[0][0], []
+        return None, [candidate for candidate, _ in ranked[:3]]
+
+
+class CategoryIndex:
+    """종류 / 지출 카테고리 / 수입 카테고리 옵션 색인 (스키마 버전마다 한 번 생성)"""
+
+    def __init__(self, db_properties):
+        categories = (db_properties or {}).get('categories', {})
+        self.types = OptionIndex(categories.get('type', []))
+        self.fields = {field: OptionIndex(categories.get(field, [])) for field in TYPE_FIELDS.values()}
+
+    def resolve_type(self, value):
+        return self.types.resolve(value)
+
+    def resolve_category(self, trans_type, value):
+        """거래 종류('지출'/'수입')에 맞는 카테고리 옵션으로 변환"""
+        field = TYPE_FIELDS.get(trans_type)
+        if not field:
+            return value, []
+        return self.fields[field].resolve(value)
+
+    def options(self, trans_type):
+        field = TYPE_FIELDS.get(trans_type)
+        return self.fields[field].options if field else []
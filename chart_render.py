@@ -0,0 +1,131 @@
+"""통계 차트 그리기 작업 프로세스 (charts.ChartRenderer가 실행해 계속 띄워 두는 스크립트)
+
+시작할 때 matplotlib을 한 번 불러온 뒤 표준 입력으로 요청을 하나씩 받아 표준 출력으로 응답한다.
+- 요청: 4바이트 길이(big-endian) + payload JSON
+- 응답: 1바이트 결과(0 성공, 1 실패) + 4바이트 길이 + PNG 바이트 또는 오류 메시지
+표준 입력이 닫히면 종료한다.
+
+새 인터프리터에서 이 파일만 실행하므로 bot.py의 모듈 수준 초기화(Notion 클라이언트,
+SQLite 파일, 환경변수 확인 등)가 작업 프로세스에서 다시 실행되지 않는다.
+그래서 이 모듈은 표준 라이브러리와 matplotlib 외에는 아무것도 import하지 않는다.
+"""
+import json
+import struct
+import sys
+
+HEADER = struct.Struct('>I')
+RESULT_OK = 0
+RESULT_ERROR = 1
+
+# 한글 라벨용 글꼴 후보 (설치된 첫 번째 글꼴 사용, 없으면 기본 글꼴)
+FONT_CANDIDATES = ('Malgun Gothic', 'AppleGothic', 'NanumGothic', 'Noto Sans CJK KR', 'Noto Sans KR')
+
+# 원형 차트에 따로 표시할 최대 카테고리 수 (나머지는 '그 외')
+PIE_MAX_SLICES = 8
+
+
+def _pie_slices(by_category):
+    items = sorted(by_category.items(), key=lambda x: -x[1])
+    if len(items) > PIE_MAX_SLICES:
+        rest = sum(amount for _, amount in items[PIE_MAX_SLICES - 1:])
+        items = items[:PIE_MAX_SLICES - 1] + [('그 외', rest)]
+    return [label for label, _ in items], [amount for _, amount in items]
+
+
+def render(payload):
+    """차트 PNG 바이트 생성
+
+    payload: {'title', 'expense_by_category': {카테고리: 금액}, 'bars': [[라벨, 지출, 수입 또는 None], ...]}
+    """
+    import io
+    import warnings
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    for name in FONT_CANDIDATES:
+        if name in installed:
+            plt.rcParams['font.family'] = name
+            break
+    plt.rcParams['axes.unicode_minus'] = False
+    # 한글 글꼴이 없으면 글자마다 경고가 나오므로 무시 (라벨만 빈 칸으로 표시됨)
+    warnings.filterwarnings('ignore', message='Glyph .* missing from')
+
+    fig, (pie_ax, bar_ax) = plt.subplots(1, 2, figsize=(12, 5), gridspec_kw={'width_ratios': [1, 1.6]})
+    fig.suptitle(payload['title'])
+
+    labels, amounts = _pie_slices(payload['expense_by_category'])
+    if amounts:
+        pie_ax.pie(amounts, labels=labels, autopct='%1.0f%%', startangle=90, counterclock=False)
+        pie_ax.set_title("지출 카테고리")
+    else:
+        pie_ax.axis('off')
+
+    bars = payload['bars']
+    positions = range(len(bars))
+    bar_labels = [bar[0] for bar in bars]
+    expenses = [bar[1] for bar in bars]
+    incomes = [bar[2] for bar in bars]
+    if any(income is not None for income in incomes):
+        width = 0.4
+        bar_ax.bar([p - width / 2 for p in positions], [i or 0 for i in incomes], width, label="수입")
+        bar_ax.bar([p + width / 2 for p in positions], expenses, width, label="지출")
+        bar_ax.legend()
+    else:
+        bar_ax.bar(list(positions), expenses, label="지출")
+    bar_ax.set_xticks(list(positions))
+    bar_ax.set_xticklabels(bar_labels, rotation=90 if len(bars) > 12 else 0, fontsize=8)
+    bar_ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda value, _: f"{value:,.0f}"))
+    bar_ax.set_title(payload.get('bar_title', ''))
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def _read_exact(stream, size):
+    """size바이트를 모두 읽음 (입력이 닫혔으면 None)"""
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def serve(stdin, stdout):
+    """입력이 닫힐 때까지 요청마다 차트를 그려 응답"""
+    while True:
+        header = _read_exact(stdin, HEADER.size)
+        if header is None:
+            return
+        body = _read_exact(stdin, HEADER.unpack(header)[0])
+        if body is None:
+            return
+        try:
+            result, data = RESULT_OK, render(json.loads(body.decode('utf-8')))
+        except Exception as e:
+            result, data = RESULT_ERROR, f"{type(e).__name__}: {e}".encode('utf-8')
+        stdout.write(bytes([result]) + HEADER.pack(len(data)) + data)
+        stdout.flush()
+
+
+def main():
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    # 라이브러리가 표준 출력에 쓰는 내용이 응답과 섞이지 않도록 stderr로 돌림
+    sys.stdout = sys.stderr
+    # 첫 요청이 matplotlib 로딩 시간을 기다리지 않도록 미리 불러옴
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    serve(stdin, stdout)
+
+
+if __name__ == '__main__':
+    main()
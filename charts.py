@@ -0,0 +1,150 @@
+"""통계 차트 이미지 (선택 기능, matplotlib 필요)
+
+- 월별: 지출 카테고리 원형 차트 + 일별 지출 막대 차트
+- 기간/연간: 지출 카테고리 원형 차트 + 월별 수입/지출 막대 차트
+
+그리기는 계속 띄워 둔 chart_render.py 작업 프로세스(최대 max_workers개)에 맡겨 이벤트 루프를 막지 않는다.
+작업 프로세스는 처음 필요할 때 한 번 시작해 matplotlib을 미리 불러 두므로 차트마다 시작 비용을 내지 않고,
+multiprocessing을 쓰지 않으므로 spawn 방식 플랫폼(Windows, macOS)에서도
+bot.py를 다시 import해 초기화를 반복하지 않는다.
+결과 PNG는 집계 숫자의 digest를 이름으로 디스크에 캐시하므로
+데이터가 바뀌지 않은 기간을 다시 요청하면 그리지 않고 파일을 바로 보낸다.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+
+from chart_render import HEADER, RESULT_OK
+
+logger = logging.getLogger(__name__)
+
+# 작업 프로세스 스크립트 경로 (새 인터프리터에서 이 파일만 실행)
+RENDER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chart_render.py')
+
+
+def available():
+    """matplotlib이 설치되어 있는지"""
+    return importlib.util.find_spec('matplotlib') is not None
+
+
+def digest(payload):
+    """집계 숫자로 만든 캐시 키"""
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+
+
+class ChartRenderer:
+    """상주 작업 프로세스 렌더링 (최대 max_workers개) + 디스크 캐시"""
+
+    def __init__(self, cache_dir, max_workers=1, max_cached=200):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_cached = max_cached
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # 쉬고 있는 작업 프로세스 (아직 시작하지 않은 자리는 None, 이벤트 루프 안에서 처음 그릴 때 생성)
+        self._idle = None
+        # 실행 중인 작업 프로세스 (종료 시 정리)
+        self._processes = set()
+        # digest -> 진행 중인 렌더링 (같은 차트 동시 요청은 한 번만 그림)
+        self._pending = {}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key[:32]}.png")
+
+    async def render(self, payload):
+        """차트 파일 경로 반환 (캐시에 있으면 그리지 않음)"""
+        key = digest(payload)
+        path = self._path(key)
+        if os.path.exists(path):
+            return path
+
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._render(payload, path))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, payload, path):
+        image = await self._run(payload)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+        self._prune()
+        return path
+
+    async def _run(self, payload):
+        """쉬고 있는 작업 프로세스에 그리기를 맡기고 PNG 바이트 반환"""
+        if self._idle is None:
+            # 마지막에 돌려준 작업 프로세스부터 다시 써서 필요할 때만 새 프로세스를 시작
+            self._idle = asyncio.LifoQueue()
+            for _ in range(self.max_workers):
+                self._idle.put_nowait(None)
+
+        process = await self._idle.get()
+        try:
+            if process is None or process.returncode is not None:
+                process = await self._start()
+            result, data = await self._request(process, payload)
+        except BaseException:
+            # 응답 도중 끊기거나 취소되면 주고받던 내용을 알 수 없으므로 프로세스를 버리고 자리만 돌려줌
+            if process is not None:
+                self._kill(process)
+            self._idle.put_nowait(None)
+            raise
+        self._idle.put_nowait(process)
+
+        if result != RESULT_OK:
+            raise RuntimeError(f"차트 그리기 실패: {data.decode('utf-8', 'replace')}")
+        return data
+
+    async def _start(self):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, RENDER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+        self._processes.add(process)
+        logger.info(f"차트 작업 프로세스 시작 (pid={process.pid})")
+        return process
+
+    @staticmethod
+    async def _request(process, payload):
+        """요청 하나를 보내고 (결과, 데이터) 응답을 읽음"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        process.stdin.write(HEADER.pack(len(body)) + body)
+        await process.stdin.drain()
+        try:
+            result = (await process.stdout.readexactly(1))[0]
+            size = HEADER.unpack(await process.stdout.readexactly(HEADER.size))[0]
+            return result, await process.stdout.readexactly(size)
+        except asyncio.IncompleteReadError:
+            raise RuntimeError(f"차트 작업 프로세스가 종료됨 (pid={process.pid})")
+
+    def _kill(self, process):
+        self._processes.discard(process)
+        if process.returncode is None:
+            process.kill()
+
+    def _prune(self):
+        """오래된 캐시 파일 정리 (최대 max_cached개 유지)"""
+        try:
+            files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.png')]
+            if len(files) <= self.max_cached:
+                return
+            files.sort(key=os.path.getmtime)
+            for old in files[:len(files) - self.max_cached]:
+                os.remove(old)
+        except OSError as e:
+            logger.warning(f"차트 캐시 정리 실패: {e}")
+
+    def close(self):
+        for process in list(self._processes):
+            self._kill(process)
+        self._idle = None
@@ -0,0 +1,91 @@
+"""기간별 거래 내역 내보내기 (CSV / JSONL)
+
+Notion 쿼리 커서를 따라가며 받은 페이지를 바로 임시 파일에 기록한다.
+SpooledTemporaryFile은 작은 결과는 메모리에, 커지면 디스크에 두므로
+기간에 거래가 얼마나 많든 메모리 사용량은 한 페이지(최대 100건) 수준으로 유지된다.
+
+CSV 헤더는 /import가 그대로 읽을 수 있는 이름(날짜, 내용, 금액, 종류, 카테고리)을 쓴다.
+"""
+import csv
+import io
+import json
+import logging
+import tempfile
+
+from transaction_mirror import page_to_row
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+
+CSV_COLUMNS = (
+    ('날짜', 'date'),
+    ('내용', 'title'),
+    ('금액', 'amount'),
+    ('종류', 'type'),
+    ('카테고리', 'category'),
+    ('페이지 ID', 'page_id'),
+)
+
+
+def _amount(value):
+    """정수 금액은 소수점 없이 기록"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+async def export_transactions(gateway, database_id, props, start_date, end_date, fmt='csv',
+                              projection=None, spool_size=1024 * 1024):
+    """[start_date, end_date) 기간의 거래를 날짜순으로 임시 파일에 기록
+
+    (처음부터 읽을 수 있는 바이너리 파일 객체, 건수)를 반환한다. 파일은 호출 측에서 닫는다.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"지원하지 않는 형식: {fmt}")
+
+    query = {
+        'filter': {
+            'and': [
+                {'property': props['date'], 'date': {'on_or_after': start_date}},
+                {'property': props['date'], 'date': {'before': end_date}},
+            ]
+        },
+        'sorts': [{'property': props['date'], 'direction': 'ascending'}],
+    }
+    if projection:
+        query['filter_properties'] = projection
+
+    raw = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    # 엑셀에서 한글이 깨지지 않도록 CSV는 BOM 포함
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='')
+    count = 0
+    try:
+        writer = None
+        if fmt == 'csv':
+            writer = csv.writer(text)
+            writer.writerow([header for header, _ in CSV_COLUMNS])
+
+        async for batch in gateway.iter_query_pages(database_id, **query):
+            for page in batch:
+                if page.get('archived') or page.get('in_trash'):
+                    continue
+                row = page_to_row(page, props)
+                row['amount'] = _amount(row['amount'])
+                if writer:
+                    writer.writerow([row[key] if row[key] is not None else '' for _, key in CSV_COLUMNS])
+                else:
+                    row.pop('last_edited_time', None)
+                    text.write(json.dumps(row, ensure_ascii=False) + '\n')
+                count += 1
+
+        text.flush()
+    except BaseException:
+        text.close()
+        raise
+
+    # TextIOWrapper가 닫히면서 raw까지 닫지 않도록 분리
+    text.detach()
+    raw.seek(0)
+    logger.info(f"내보내기: {start_date} ~ {end_date} {count}건 ({fmt})")
+    return raw, count
@@ -0,0 +1,504 @@
+"""로컬 가짜 Notion API 서버 (벤치마크 / 테스트용)
+
+봇이 사용하는 Notion API 일부를 메모리 데이터로 흉내 낸다.
+
+- GET /v1/databases/{id}: 데이터베이스 스키마
+- PATCH /v1/databases/{id}: 속성 추가
+- POST /v1/databases/{id}/query: 페이지네이션(page_size/start_cursor), filter(and/or, date,
+  last_edited_time, select, number, title), sorts, filter_properties 지원
+- POST /v1/pages: 페이지 생성
+- PATCH /v1/pages/{id}: 속성 수정 / 보관
+
+응답 지연(latency ± jitter), 429 주입(무작위 비율 또는 초당 요청 한도), 데이터 건수를 설정할 수 있다.
+봇이나 벤치마크는 NOTION_BASE_URL=http://127.0.0.1:{port} 로 이 서버를 바라보게 한다.
+
+사용 예:
+    python fake_notion.py --port 8765 --rows 10000 --latency 80 --jitter 40 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import tornado.httpserver
+import tornado.web
+
+TRANSACTION_DB_ID = 'fake-transactions'
+MONTHLY_DB_ID = 'fake-monthly'
+
+EXPENSE_CATEGORIES = [
+    '1-1. 월세', '1-2. 보험', '1-3. 교통비', '1-4. 관리비', '1-5. 통신비', '1-6. 저축',
+    '2-1. 식비', '2-2. 쇼핑', '2-3. 여가', '2-4. 여행', '2-5. 기타',
+]
+INCOME_CATEGORIES = ['급여', '중고거래', '기타']
+
+
+def _select(prop_id, options):
+    return {
+        'id': prop_id,
+        'type': 'select',
+        'select': {'options': [{'id': f"{prop_id}-{i}", 'name': name, 'color': 'default'}
+                               for i, name in enumerate(options)]},
+    }
+
+
+def transaction_schema(database_id=TRANSACTION_DB_ID, monthly_db_id=MONTHLY_DB_ID):
+    """README의 Transaction DB와 같은 구성의 스키마"""
+    return {
+        'object': 'database',
+        'id': database_id,
+        'title': [{'type': 'text', 'plain_text': '가계부 (fake)', 'text': {'content': '가계부 (fake)'}}],
+        'properties': {
+            '내역': {'id': 'title', 'type': 'title', 'title': {}},
+            '날짜': {'id': 'dAtE', 'type': 'date', 'date': {}},
+            '종류': _select('tYpE', ['지출', '수입']),
+            '지출 비용': {'id': 'eXpA', 'type': 'number', 'number': {'format': 'won'}},
+            '수입 비용': {'id': 'iNcA', 'type': 'number', 'number': {'format': 'won'}},
+            '지출 종류': _select('eXpC', EXPENSE_CATEGORIES),
+            '수입 종류': _select('iNcC', INCOME_CATEGORIES),
+            '월': {'id': 'mOnT', 'type': 'relation', 'relation': {'database_id': monthly_db_id}},
+        },
+    }
+
+
+def monthly_schema(database_id=MONTHLY_DB_ID):
+    return {
+        'object': 'database',
+        'id': database_id,
+        'title': [{'type': 'text', 'plain_text': 'Monthly (fake)', 'text': {'content': 'Monthly (fake)'}}],
+        'properties': {
+            '이름': {'id': 'title', 'type': 'title', 'title': {}},
+        },
+    }
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _error(status, code, message):
+    return status, {'object': 'error', 'status': status, 'code': code, 'message': message}
+
+
+class FakeNotion:
+    """메모리 기반 Notion 데이터 + 장애/지연 설정"""
+
+    def __init__(self, rows=1000, months=12, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 rate_limit=None, retry_after=1, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+
+        # 초당 요청 한도 (토큰 버킷, 넘으면 429)
+        self._tokens = float(rate_limit or 0)
+        self._refilled_at = time.monotonic()
+
+        self.schemas = {
+            TRANSACTION_DB_ID: transaction_schema(),
+            MONTHLY_DB_ID: monthly_schema(),
+        }
+        self.pages = {TRANSACTION_DB_ID: [], MONTHLY_DB_ID: []}
+        self._by_id = {}
+        self.stats = {}
+
+        self._seed(rows, months)
+
+    # --- 데이터 ---
+
+    def _seed(self, rows, months):
+        """최근 months개월에 걸친 rows건의 거래와 월 페이지 생성"""
+        today = datetime.now().date().replace(day=1)
+        month_starts = []
+        for i in range(months):
+            month = (today.month - 1 - i) % 12 + 1
+            year = today.year + (today.month - 1 - i) // 12
+            month_starts.append(datetime(year, month, 1).date())
+
+        for month_start in month_starts:
+            self._add_page(MONTHLY_DB_ID, {
+                '이름': {'title': [{'text': {'content': month_start.strftime('%Y-%m')}}]},
+            })
+
+        for i in range(rows):
+            month_start = month_starts[i % len(month_starts)]
+            day = month_start + timedelta(days=self._random.randrange(28))
+            if self._random.random() < 0.1:
+                properties = {
+                    '종류': {'select': {'name': '수입'}},
+                    '수입 비용': {'number': self._random.randrange(10, 3000) * 1000},
+                    '수입 종류': {'select': {'name': self._random.choice(INCOME_CATEGORIES)}},
+                }
+            else:
+                properties = {
+                    '종류': {'select': {'name': '지출'}},
+                    '지출 비용': {'number': self._random.randrange(1, 500) * 100},
+                    '지출 종류': {'select': {'name': self._random.choice(EXPENSE_CATEGORIES)}},
+                }
+            properties['내역'] = {'title': [{'text': {'content': f"거래 {i}"}}]}
+            properties['날짜'] = {'date': {'start': day.isoformat()}}
+            self._add_page(TRANSACTION_DB_ID, properties)
+
+    def _property_value(self, schema_prop, value):
+        """요청 형식의 속성 값을 응답 형식으로 변환"""
+        prop_type = schema_prop['type']
+        result = {'id': schema_prop['id'], 'type': prop_type}
+        if prop_type in ('title', 'rich_text'):
+            result[prop_type] = [
+                {
+                    'type': 'text',
+                    'text': {'content': item.get('text', {}).get('content', '')},
+                    'plain_text': item.get('text', {}).get('content', ''),
+                }
+                for item in value.get(prop_type, [])
+            ]
+        elif prop_type == 'select':
+            select = value.get('select')
+            if select:
+                names = [opt['name'] for opt in schema_prop['select']['options']]
+                if select['name'] not in names:
+                    # 실제 Notion은 새 옵션을 만들지만, 스키마 변경 감지를 확인할 수 있도록 추가만 함
+                    schema_prop['select']['options'].append(
+                        {'id': str(uuid.uuid4()), 'name': select['name'], 'color': 'default'}
+                    )
+                result['select'] = {'id': None, 'name': select['name'], 'color': 'default'}
+            else:
+                result['select'] = None
+        elif prop_type == 'relation':
+            result['relation'] = [{'id': item['id']} for item in value.get('relation', [])]
+            result['has_more'] = False
+        else:
+            result[prop_type] = value.get(prop_type)
+        return result
+
+    def _empty_value(self, schema_prop):
+        prop_type = schema_prop['type']
+        empty = {'title': [], 'rich_text': [], 'relation': []}.get(prop_type)
+        return {'id': schema_prop['id'], 'type': prop_type, prop_type: empty}
+
+    def _validate(self, database_id, properties):
+        schema = self.schemas[database_id]['properties']
+        for name in properties:
+            if name not in schema:
+                return f"{name} is not a property that exists."
+        return None
+
+    def _add_page(self, database_id, properties):
+        schema = self.schemas[database_id]['properties']
+        now = _now_iso()
+        page = {
+            'object': 'page',
+            # 같은 seed면 같은 페이지 ID (실행 간 결과 비교용)
+            'id': str(uuid.UUID(int=self._random.getrandbits(128), version=4)),
+            'created_time': now,
+            'last_edited_time': now,
+            'archived': False,
+            'in_trash': False,
+            'parent': {'type': 'database_id', 'database_id': database_id},
+            'properties': {
+                name: self._property_value(prop, properties[name]) if name in properties else self._empty_value(prop)
+                for name, prop in schema.items()
+            },
+        }
+        page['url'] = f"https://www.notion.so/{page['id'].replace('-', '')}"
+        self.pages[database_id].append(page)
+        self._by_id[page['id']] = (database_id, page)
+        return page
+
+    # --- 쿼리 ---
+
+    def _resolve_property(self, database_id, key):
+        """속성 이름 또는 ID -> 속성 이름"""
+        schema = self.schemas[database_id]['properties']
+        if key in schema:
+            return key
+        for name, prop in schema.items():
+            if prop['id'] == key:
+                return name
+        return None
+
+    @staticmethod
+    def _compare(value, condition, is_date=False):
+        for op, target in condition.items():
+            if op == 'is_empty':
+                return value is None
+            if op == 'is_not_empty':
+                return value is not None
+            if value is None:
+                return False
+            # 날짜만 주어진 조건은 시간과 무관하게 날짜 단위로 비교
+            if is_date and isinstance(target, str) and len(target) == 10:
+                value = value[:10]
+            if op == 'equals' and not value == target:
+                return False
+            if op == 'does_not_equal' and not value != target:
+                return False
+            if op in ('before', 'less_than') and not value < target:
+                return False
+            if op in ('after', 'greater_than') and not value > target:
+                return False
+            if op in ('on_or_before', 'less_than_or_equal_to') and not value <= target:
+                return False
+            if op in ('on_or_after', 'greater_than_or_equal_to') and not value >= target:
+                return False
+            if op == 'contains' and target not in value:
+                return False
+        return True
+
+    def _matches(self, database_id, page, condition):
+        if 'and' in condition:
+            return all(self._matches(database_id, page, c) for c in condition['and'])
+        if 'or' in condition:
+            return any(self._matches(database_id, page, c) for c in condition['or'])
+
+        if condition.get('timestamp') in ('last_edited_time', 'created_time'):
+            timestamp = condition['timestamp']
+            return self._compare(page[timestamp], condition[timestamp])
+
+        name = self._resolve_property(database_id, condition.get('property'))
+        if name is None:
+            return False
+        prop = page['properties'][name]
+        if 'date' in condition:
+            value = (prop.get('date') or {}).get('start')
+            return self._compare(value, condition['date'], is_date=True)
+        if 'select' in condition:
+            value = (prop.get('select') or {}).get('name')
+            return self._compare(value, condition['select'])
+        if 'number' in condition:
+            return self._compare(prop.get('number'), condition['number'])
+        for text_type in ('title', 'rich_text'):
+            if text_type in condition:
+                value = ''.join(item['plain_text'] for item in prop.get(prop['type'], []))
+                return self._compare(value, condition[text_type])
+        return True
+
+    def _sort_key(self, database_id, sort):
+        if 'timestamp' in sort:
+            return lambda page: page[sort['timestamp']]
+        name = self._resolve_property(database_id, sort.get('property'))
+
+        def key(page):
+            prop = page['properties'].get(name, {})
+            value = prop.get(prop.get('type'))
+            if isinstance(value, dict):
+                value = value.get('start') or value.get('name')
+            elif isinstance(value, list):
+                value = ''.join(item.get('plain_text', '') for item in value)
+            # None은 항상 뒤로
+            return (value is None, value if value is not None else '')
+        return key
+
+    def query(self, database_id, body, filter_properties=None):
+        if database_id not in self.schemas:
+            return _error(404, 'object_not_found', f"Could not find database with ID: {database_id}.")
+
+        pages = [p for p in self.pages[database_id] if not p['archived']]
+        if body.get('filter'):
+            pages = [p for p in pages if self._matches(database_id, p, body['filter'])]
+        for sort in reversed(body.get('sorts') or []):
+            pages.sort(key=self._sort_key(database_id, sort), reverse=sort.get('direction') == 'descending')
+
+        page_size = min(int(body.get('page_size') or 100), 100)
+        start = int(body.get('start_cursor') or 0)
+        results = pages[start:start + page_size]
+        has_more = start + page_size < len(pages)
+
+        if filter_properties:
+            names = {self._resolve_property(database_id, key) for key in filter_properties}
+            results = [dict(p, properties={k: v for k, v in p['properties'].items() if k in names})
+                       for p in results]
+
+        return 200, {
+            'object': 'list',
+            'results': results,
+            'has_more': has_more,
+            'next_cursor': str(start + page_size) if has_more else None,
+            'type': 'page_or_database',
+        }
+
+    def update_database(self, database_id, body):
+        schema = self.schemas.get(database_id)
+        if schema is None:
+            return _error(404, 'object_not_found', f"Could not find database with ID: {database_id}.")
+        for name, prop in (body.get('properties') or {}).items():
+            if name in schema['properties']:
+                continue
+            prop_type = next(iter(prop))
+            schema['properties'][name] = {'id': uuid.uuid4().hex[:4], 'type': prop_type, prop_type: prop[prop_type]}
+            for page in self.pages[database_id]:
+                page['properties'][name] = self._empty_value(schema['properties'][name])
+        return 200, schema
+
+    def create_page(self, body):
+        database_id = (body.get('parent') or {}).get('database_id')
+        if database_id not in self.schemas:
+            return _error(404, 'object_not_found', f"Could not find database with ID: {database_id}.")
+        message = self._validate(database_id, body.get('properties', {}))
+        if message:
+            return _error(400, 'validation_error', message)
+        return 200, self._add_page(database_id, body.get('properties', {}))
+
+    def update_page(self, page_id, body):
+        if page_id not in self._by_id:
+            return _error(404, 'object_not_found', f"Could not find page with ID: {page_id}.")
+        database_id, page = self._by_id[page_id]
+        properties = body.get('properties') or {}
+        message = self._validate(database_id, properties)
+        if message:
+            return _error(400, 'validation_error', message)
+
+        schema = self.schemas[database_id]['properties']
+        for name, value in properties.items():
+            page['properties'][name] = self._property_value(schema[name], value)
+        for flag in ('archived', 'in_trash'):
+            if flag in body:
+                page['archived'] = page['in_trash'] = bool(body[flag])
+        page['last_edited_time'] = _now_iso()
+        return 200, page
+
+    # --- 지연 / 장애 주입 ---
+
+    def _rate_limited(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            return True
+        if self.rate_limit:
+            now = time.monotonic()
+            self._tokens = min(float(self.rate_limit), self._tokens + (now - self._refilled_at) * self.rate_limit)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+        return False
+
+    async def delay(self):
+        latency = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def record(self, endpoint, status):
+        key = f"{endpoint} {status}"
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+
+class _FakeHandler(tornado.web.RequestHandler):
+    endpoint = None
+
+    def initialize(self, fake):
+        self.fake = fake
+
+    async def prepare(self):
+        await self.fake.delay()
+        if self.fake._rate_limited():
+            self.set_header('Retry-After', str(self.fake.retry_after))
+            self.respond(*_error(429, 'rate_limited', 'You have been rate limited. Please try again later.'))
+            self.finish()
+
+    def body_json(self):
+        return json.loads(self.request.body or b'{}')
+
+    def respond(self, status, payload):
+        self.fake.record(self.endpoint, status)
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(payload, ensure_ascii=False))
+
+
+class DatabaseHandler(_FakeHandler):
+    endpoint = 'databases.retrieve'
+
+    def get(self, database_id):
+        schema = self.fake.schemas.get(database_id)
+        if schema is None:
+            self.respond(*_error(404, 'object_not_found', f"Could not find database with ID: {database_id}."))
+            return
+        self.respond(200, schema)
+
+    def patch(self, database_id):
+        self.respond(*self.fake.update_database(database_id, self.body_json()))
+
+
+class QueryHandler(_FakeHandler):
+    endpoint = 'databases.query'
+
+    def post(self, database_id):
+        filter_properties = self.get_query_arguments('filter_properties')
+        self.respond(*self.fake.query(database_id, self.body_json(), filter_properties))
+
+
+class PagesHandler(_FakeHandler):
+    endpoint = 'pages.create'
+
+    def post(self):
+        self.respond(*self.fake.create_page(self.body_json()))
+
+
+class PageHandler(_FakeHandler):
+    endpoint = 'pages.update'
+
+    def patch(self, page_id):
+        self.respond(*self.fake.update_page(page_id, self.body_json()))
+
+
+def make_app(fake):
+    return tornado.web.Application([
+        (r"/v1/databases/([^/]+)/query", QueryHandler, {'fake': fake}),
+        (r"/v1/databases/([^/]+)", DatabaseHandler, {'fake': fake}),
+        (r"/v1/pages", PagesHandler, {'fake': fake}),
+        (r"/v1/pages/([^/]+)", PageHandler, {'fake': fake}),
+    ])
+
+
+def start_server(fake, port, address='127.0.0.1'):
+    """실행 중인 이벤트 루프에서 가짜 서버 시작 (HTTPServer 반환, stop()으로 종료)"""
+    server = tornado.httpserver.HTTPServer(make_app(fake))
+    server.listen(port, address=address)
+    return server
+
+
+async def _serve(args):
+    fake = FakeNotion(
+        rows=args.rows,
+        months=args.months,
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    start_server(fake, args.port, args.address)
+    print(f"가짜 Notion 서버: http://{args.address}:{args.port}")
+    print(f"NOTION_BASE_URL=http://{args.address}:{args.port}")
+    print(f"NOTION_DATABASE_ID={TRANSACTION_DB_ID}")
+    print(f"MONTHLY_DB_ID={MONTHLY_DB_ID}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 가짜 Notion API 서버")
+    parser.add_argument('--address', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rows', type=int, default=1000, help="Transaction DB 거래 건수")
+    parser.add_argument('--months', type=int, default=12, help="거래를 나눠 담을 개월 수")
+    parser.add_argument('--latency', type=float, default=0.0, help="응답 지연 (ms)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="응답 지연 편차 (ms)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="무작위 429 응답 비율 (0~1)")
+    parser.add_argument('--rate-limit', type=float, default=None, help="초당 요청 한도 (넘으면 429)")
+    parser.add_argument('--retry-after', type=int, default=1, help="429 응답의 Retry-After (초)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Notion 연결 상태 모니터
+
+백그라운드 작업이 주기적으로 Transaction DB / Monthly DB를 조회(databases.retrieve)해
+응답 시간, 마지막 성공 시각, 최근 오류율을 기록한다.
+/status는 Notion을 직접 호출하지 않고 이 스냅샷으로 바로 응답한다.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from notion_gateway import NotionGateway
+
+logger = logging.getLogger(__name__)
+
+
+def _database_title(database):
+    title = database.get('title') or [{}]
+    return title[0].get('plain_text', 'Untitled')
+
+
+class ProbeStats:
+    """한 데이터베이스의 최근 window회 조회 결과"""
+
+    def __init__(self, window=20):
+        self.samples = deque(maxlen=window)
+        self.title = None
+        self.last_checked_at = None
+        self.last_success_at = None
+        self.last_latency = None
+        self.last_error = None
+
+    def record(self, latency, error=None, title=None):
+        now = time.time()
+        self.samples.append((error is None, latency))
+        self.last_checked_at = now
+        self.last_latency = latency
+        if error is None:
+            self.last_success_at = now
+            self.last_error = None
+            if title:
+                self.title = title
+        else:
+            self.last_error = error
+
+    @property
+    def ok(self):
+        return self.last_checked_at is not None and self.last_error is None
+
+    @property
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for ok, _ in self.samples if not ok) / len(self.samples)
+
+    @property
+    def median_latency(self):
+        """성공한 조회의 응답 시간 중앙값 (초)"""
+        latencies = sorted(latency for ok, latency in self.samples if ok)
+        return latencies[(len(latencies) - 1) // 2] if latencies else None
+
+
+class HealthMonitor:
+    """테넌트의 Notion 데이터베이스 상태 조회 기록
+
+    targets: {이름: 데이터베이스 ID}
+    """
+
+    def __init__(self, gateway, targets, window=20):
+        self.gateway = gateway
+        self.targets = {name: database_id for name, database_id in targets.items() if database_id}
+        self.stats = {name: ProbeStats(window) for name in self.targets}
+
+    async def _probe_one(self, name, database_id):
+        started = time.perf_counter()
+        try:
+            database = await self.gateway.retrieve_database(database_id)
+        except Exception as e:
+            self.stats[name].record(time.perf_counter() - started, error=NotionGateway.describe_error(e))
+            logger.warning(f"상태 확인 실패 ({self.gateway.name}/{name}): {e}")
+            return
+        self.stats[name].record(time.perf_counter() - started, title=_database_title(database))
+
+    async def probe(self):
+        """모든 데이터베이스를 동시에 한 번씩 조회"""
+        await asyncio.gather(*(
+            self._probe_one(name, database_id) for name, database_id in self.targets.items()
+        ))
+
+    @property
+    def checked(self):
+        return any(stats.last_checked_at is not None for stats in self.stats.values())
+
+    @property
+    def healthy(self):
+        return all(stats.ok for stats in self.stats.values())
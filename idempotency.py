@@ -0,0 +1,129 @@
+"""중복 저장 방지 기록 (채팅 ID + 메시지 ID -> Notion 페이지)
+
+봇이 죽거나 네트워크가 끊기면 Telegram은 확인받지 못한 업데이트를 다시 보내고,
+저장 대기열은 응답을 받지 못한 저장을 다시 시도한다. 같은 메시지가 두 번 처리되어도
+거래가 한 번만 만들어지도록 메시지마다 키를 정해 디스크에 기록한다.
+
+- accepted: 대기열에 접수됨 (다시 받은 메시지는 접수하지 않음)
+- sending: pages.create를 보냈지만 결과를 모름 (응답을 잃어버렸으면 페이지가 이미 있을 수 있으므로
+  다시 만들기 전에 페이지의 저장 키 속성으로 Notion을 조회한다)
+- saved: Notion에 저장됨 (같은 키의 저장은 네트워크 호출 없이 기존 페이지 ID로 끝남)
+
+기록은 ttl초가 지나면 만료되어 삭제된다.
+"""
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    page_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_updated ON idempotency (updated_at);
+"""
+
+# 만료된 기록 정리 간격 (초)
+PRUNE_INTERVAL = 3600
+
+
+class UnconfirmedSaveError(Exception):
+    """저장 요청의 응답을 잃어버렸고 페이지가 만들어졌는지 확인할 수도 없을 때 발생"""
+
+
+def message_key(chat_id, message_id, line_no=None):
+    """메시지(여러 줄 메시지는 줄 번호까지)의 중복 방지 키"""
+    key = f"{chat_id}:{message_id}"
+    return f"{key}:{line_no}" if line_no is not None else key
+
+
+class IdempotencyStore:
+    """SQLite 기반 중복 저장 방지 기록"""
+
+    def __init__(self, path, ttl=604800):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._last_pruned = None
+
+    def get(self, key):
+        """키의 기록 ({'status', 'page_id'}), 없거나 만료됐으면 None"""
+        row = self._conn.execute(
+            "SELECT status, page_id FROM idempotency WHERE key = ? AND updated_at > ?",
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        return {'status': row['status'], 'page_id': row['page_id']} if row else None
+
+    def page_id(self, key):
+        """이미 저장된 키의 Notion 페이지 ID (저장 전이면 None)"""
+        record = self.get(key)
+        return record['page_id'] if record else None
+
+    def accept(self, key):
+        """대기열 접수 기록 (이미 저장된 기록은 그대로 둠)"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO idempotency (key, status, updated_at) VALUES (?, 'accepted', ?) "
+                "ON CONFLICT(key) DO UPDATE SET updated_at = excluded.updated_at WHERE status = 'accepted'",
+                (key, time.time())
+            )
+        self._maybe_prune()
+
+    def begin(self, key):
+        """pages.create 직전 기록 (이후 결과를 확인하기 전까지 sending)"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO idempotency (key, status, updated_at) VALUES (?, 'sending', ?) "
+                "ON CONFLICT(key) DO UPDATE SET status = 'sending', updated_at = excluded.updated_at "
+                "WHERE status != 'saved'",
+                (key, time.time())
+            )
+
+    def release(self, key, previous=None):
+        """Notion이 처리하지 않았음이 확실한 저장 실패 후 sending을 이전 상태로 되돌림 (이전 기록이 없었으면 삭제)"""
+        with self._conn:
+            if previous is None:
+                self._conn.execute("DELETE FROM idempotency WHERE key = ? AND status = 'sending'", (key,))
+            else:
+                self._conn.execute(
+                    "UPDATE idempotency SET status = ?, updated_at = ? WHERE key = ? AND status = 'sending'",
+                    (previous, time.time(), key)
+                )
+
+    def record(self, key, page_id):
+        """저장 완료 기록"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO idempotency (key, status, page_id, updated_at) VALUES (?, 'saved', ?, ?)",
+                (key, page_id, time.time())
+            )
+        self._maybe_prune()
+
+    def prune(self):
+        """만료된 기록 삭제, 삭제한 수 반환"""
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM idempotency WHERE updated_at <= ?", (time.time() - self.ttl,)
+            )
+        self._last_pruned = time.monotonic()
+        return cursor.rowcount
+
+    def _maybe_prune(self):
+        if self._last_pruned is not None and time.monotonic() - self._last_pruned < PRUNE_INTERVAL:
+            return
+        try:
+            removed = self.prune()
+        except sqlite3.Error as e:
+            logger.warning(f"중복 방지 기록 정리 실패: {e}")
+            return
+        if removed:
+            logger.info(f"만료된 중복 방지 기록 {removed}건 삭제")
+
+    def close(self):
+        self._conn.close()
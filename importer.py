@@ -0,0 +1,234 @@
+"""거래 내역 파일(CSV/TSV) 일괄 가져오기
+
+/import로 받은 파일을 한 행씩 읽어(전체를 메모리에 올리지 않음) ! 메시지와 같은 규칙으로 검증하고,
+제한된 수의 작업자가 동시에 Notion에 저장한다. 저장 요청은 테넌트 게이트웨이의
+속도 제한/재시도/서킷 브레이커를 그대로 거친다.
+
+- 첫 행이 헤더(내용, 금액, 종류, 카테고리, 날짜)면 열 이름으로, 아니면 ! 메시지와 같은 순서로 읽는다
+- 인코딩은 UTF-8(BOM 포함)과 CP949(EUC-KR 은행 내보내기 파일)를 자동 판별한다
+- 구분자는 확장자(.tsv)나 내용(쉼표/탭/세미콜론)으로 판별한다
+- 행별 오류는 임시 CSV 파일에 기록해 마지막에 한 번에 보고한다
+"""
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import os
+import tempfile
+import time
+
+from rate_limit import NotionUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# 헤더 이름 -> ! 메시지의 항목 순서
+FIELDS = ('title', 'amount', 'type', 'category', 'date')
+HEADER_ALIASES = {
+    'title': ('내용', '내역', 'title'),
+    'amount': ('금액', 'amount'),
+    'type': ('종류', 'type'),
+    'category': ('카테고리', 'category'),
+    'date': ('날짜', 'date'),
+}
+
+SAMPLE_SIZE = 64 * 1024
+
+# 오류 보고 메시지에 바로 보여줄 오류 수
+SAMPLE_ERRORS = 10
+
+
+def _detect_encoding(sample):
+    """UTF-8로 읽을 수 있으면 utf-8-sig, 아니면 cp949"""
+    try:
+        # 샘플 끝에서 잘린 멀티바이트 문자는 오류로 보지 않음
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp949'
+
+
+def _detect_delimiter(text, filename):
+    if filename.lower().endswith('.tsv'):
+        return '\t'
+    try:
+        return csv.Sniffer().sniff(text, delimiters=',\t;').delimiter
+    except csv.Error:
+        return ','
+
+
+def _header_columns(row):
+    """헤더 행이면 항목 -> 열 번호 매핑, 아니면 None"""
+    names = [cell.strip().lower() for cell in row]
+    columns = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                columns[field] = index
+                break
+    return columns if 'title' in columns and 'amount' in columns else None
+
+
+class TableReader:
+    """CSV/TSV 파일을 한 행씩 [내용, 금액, 종류, 카테고리, 날짜] 목록으로 읽는 반복자"""
+
+    def __init__(self, path, filename=''):
+        self.path = path
+        self.size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            sample = f.read(SAMPLE_SIZE)
+        self.encoding = _detect_encoding(sample)
+        self.delimiter = _detect_delimiter(
+            sample.decode(self.encoding, errors='ignore'), filename
+        )
+        self._raw = None
+
+    def fraction_read(self):
+        """읽은 바이트 비율 (진행률 표시용)"""
+        if not self._raw or not self.size:
+            return 0.0
+        return min(1.0, self._raw.tell() / self.size)
+
+    def __iter__(self):
+        """(행 번호, 항목 목록, 원본 행) 생성 (빈 행은 건너뜀)"""
+        with open(self.path, 'rb') as raw:
+            self._raw = raw
+            text = io.TextIOWrapper(raw, encoding=self.encoding, errors='replace', newline='')
+            reader = csv.reader(text, delimiter=self.delimiter)
+            columns = None
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    continue
+                if columns is None:
+                    columns = _header_columns(row)
+                    if columns is not None:
+                        continue
+                    # 헤더가 없으면 ! 메시지와 같은 순서
+                    columns = {field: index for index, field in enumerate(FIELDS)}
+
+                parts = [
+                    row[columns[field]].strip() if field in columns and columns[field] < len(row) else ''
+                    for field in FIELDS
+                ]
+                # 날짜가 비어 있으면 생략한 것으로 처리
+                if not parts[4]:
+                    parts.pop()
+                yield reader.line_num, parts, row
+
+
+class ImportResult:
+    """가져오기 결과 집계 (행별 오류는 임시 CSV 파일에 기록)"""
+
+    def __init__(self):
+        self.read = 0
+        self.saved = 0
+        self.failed = 0
+        self.sample_errors = []
+        self.started_at = time.monotonic()
+        self._errors_raw = tempfile.TemporaryFile()
+        # 엑셀에서 한글이 깨지지 않도록 BOM 포함
+        self._errors_text = io.TextIOWrapper(self._errors_raw, encoding='utf-8-sig', newline='')
+        self._errors = csv.writer(self._errors_text)
+        self._errors.writerow(['행', '오류', '원본'])
+
+    def add_error(self, line_no, reason, row):
+        self.failed += 1
+        self._errors.writerow([line_no, reason, ','.join(row)])
+        if len(self.sample_errors) < SAMPLE_ERRORS:
+            self.sample_errors.append(f"{line_no}행: {reason}")
+
+    def error_report(self):
+        """행별 오류 CSV (처음부터 읽을 수 있는 바이너리 파일 객체)"""
+        self._errors_text.flush()
+        self._errors_raw.seek(0)
+        return self._errors_raw
+
+    @property
+    def done(self):
+        return self.saved + self.failed
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def close(self):
+        self._errors_text.close()
+
+
+async def run_import(reader, result, parse_func, save_func, concurrency=3, on_progress=None,
+                     progress_interval=3.0, unavailable_retries=10):
+    """파일의 모든 행을 검증하고 최대 concurrency개씩 동시에 저장 (집계는 result에 누적)
+
+    parse_func(parts) -> message_data (잘못된 행은 ValueError)
+    save_func(message_data) -> (success, msg), Notion 장애 중이면 NotionUnavailableError 발생
+    on_progress(result, fraction) -> progress_interval초마다 호출되는 코루틴
+
+    읽기와 저장 사이의 큐 크기를 제한하므로 파일 크기와 관계없이 메모리 사용량이 일정하다.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce():
+        for line_no, parts, row in reader:
+            result.read += 1
+            try:
+                message_data = parse_func(parts)
+            except ValueError as e:
+                result.add_error(line_no, str(e), row)
+                # 잘못된 행이 길게 이어져도 이벤트 루프를 독점하지 않도록 양보
+                if result.read % 500 == 0:
+                    await asyncio.sleep(0)
+                continue
+            await queue.put((line_no, message_data, row))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def save(message_data):
+        for _ in range(unavailable_retries):
+            try:
+                return await save_func(message_data)
+            except NotionUnavailableError as e:
+                # 장애 중에는 행을 실패로 넘기지 않고 브레이커가 다시 닫힐 때까지 대기
+                await asyncio.sleep(max(1.0, e.retry_in))
+        return False, "Notion 장애가 계속되어 저장하지 못했습니다"
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            line_no, message_data, row = item
+            try:
+                success, msg = await save(message_data)
+            except Exception as e:
+                success, msg = False, str(e)
+            if success:
+                result.saved += 1
+            else:
+                result.add_error(line_no, msg, row)
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(progress_interval)
+            try:
+                await on_progress(result, reader.fraction_read())
+            except Exception as e:
+                logger.warning(f"가져오기 진행 상황 표시 실패: {e}")
+
+    progress_task = asyncio.create_task(report_progress()) if on_progress else None
+    workers = [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        await produce()
+        await asyncio.gather(*workers)
+    except BaseException:
+        for worker in workers:
+            worker.cancel()
+        raise
+    finally:
+        if progress_task:
+            progress_task.cancel()
+
+    logger.info(
+        f"가져오기 완료: {result.read}행 중 {result.saved}건 저장, {result.failed}건 실패 "
+        f"({result.elapsed:.0f}초)"
+    )
+    return result
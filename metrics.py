@@ -0,0 +1,249 @@
+"""Prometheus 형식 메트릭
+
+외부 라이브러리 없이 카운터 / 게이지 / 히스토그램을 메모리에 모아
+Prometheus 텍스트 형식(/metrics)으로 내보낸다.
+
+- 핸들러별 처리 시간 히스토그램 (bot_handler_duration_seconds)
+- Notion 호출 수/지연 (엔드포인트, 상태 코드별), 429, 재시도, 서킷 브레이커 차단 수
+- 스키마 캐시 적중률 (hit / stale / miss)
+- 저장 대기열 길이, 서킷 브레이커 상태, 처리 대기 업데이트 수 (수집 시점에 콜백으로 읽는 게이지)
+
+폴링 모드에서는 METRICS_PORT에 별도 HTTP 서버를 띄우고, 웹훅 모드에서는 웹훅 서버의 /metrics로도 제공한다.
+"""
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+import tornado.httpserver
+import tornado.web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 레이블 불일치: {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Counter(_Metric):
+    """단조 증가 카운터"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """현재 값 게이지 (set으로 설정하거나, 수집 시점에 collect 콜백으로 읽음)
+
+    collect() -> {레이블 값 튜플: 값}
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.collect:
+            try:
+                self._values = {tuple(str(v) for v in key): value for key, value in self.collect().items()}
+            except Exception as e:
+                logger.warning(f"메트릭 수집 실패 ({self.name}): {e}")
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """누적 버킷 히스토그램"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state['buckets'][index] += 1
+        state['sum'] += value
+        state['count'] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state['count'] if state else 0
+
+    def _samples(self):
+        lines = []
+        for key, state in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state['buckets']):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(float(bound))))} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {state['count']}"
+            )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """메트릭 모음"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"메트릭 이름 중복: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Prometheus 텍스트 형식 (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- 봇 메트릭 ---
+
+HANDLER_DURATION = REGISTRY.register(Histogram(
+    'bot_handler_duration_seconds', "Telegram 업데이트 핸들러 처리 시간", ['handler']
+))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'bot_handler_errors_total', "처리되지 않은 예외로 끝난 핸들러 호출 수", ['handler']
+))
+UPDATES_DROPPED = REGISTRY.register(Counter(
+    'bot_updates_dropped_total', "채팅별 대기 한도를 넘어 처리하지 않은 업데이트 수"
+))
+DUPLICATE_SAVES = REGISTRY.register(Counter(
+    'bot_duplicate_saves_total', "중복 방지 기록으로 건너뛴 저장 수 (accept: 다시 받은 메시지, save: 이미 저장된 항목)",
+    ['stage']
+))
+
+NOTION_REQUESTS = REGISTRY.register(Counter(
+    'notion_requests_total', "Notion API 호출 수 (재시도 포함, 시도 단위)", ['tenant', 'endpoint', 'status']
+))
+NOTION_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'notion_request_duration_seconds', "Notion API 호출 한 번의 응답 시간", ['tenant', 'endpoint']
+))
+NOTION_RATE_LIMITED = REGISTRY.register(Counter(
+    'notion_rate_limited_total', "Notion 429 응답 수", ['tenant', 'endpoint']
+))
+NOTION_RETRIES = REGISTRY.register(Counter(
+    'notion_retries_total', "Notion 호출 재시도 수", ['tenant', 'endpoint']
+))
+NOTION_BREAKER_REJECTIONS = REGISTRY.register(Counter(
+    'notion_breaker_rejections_total', "서킷 브레이커가 열려 보내지 않은 호출 수", ['tenant', 'endpoint']
+))
+
+SCHEMA_CACHE_REQUESTS = REGISTRY.register(Counter(
+    'schema_cache_requests_total', "스키마 캐시 조회 수 (hit: 최신, stale: 만료된 캐시 반환, miss: 직접 조회)",
+    ['tenant', 'result']
+))
+
+
+def timed_handler(handler, name=None):
+    """핸들러 처리 시간과 처리되지 않은 예외를 기록하는 래퍼"""
+    label = name or handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=label)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, handler=label)
+
+    return wrapper
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Prometheus 수집 엔드포인트"""
+
+    def initialize(self, registry=REGISTRY):
+        self.registry = registry
+
+    def get(self):
+        self.set_header('Content-Type', CONTENT_TYPE)
+        self.write(self.registry.render())
+
+
+def start_http_server(port, address='0.0.0.0', registry=REGISTRY):
+    """실행 중인 이벤트 루프에서 /metrics 전용 HTTP 서버 시작 (HTTPServer 반환)"""
+    server = tornado.httpserver.HTTPServer(tornado.web.Application([
+        (r"/metrics", MetricsHandler, {'registry': registry}),
+    ]))
+    server.listen(port, address=address)
+    logger.info(f"메트릭 서버 시작: {address}:{port}/metrics")
+    return server
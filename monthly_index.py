@@ -0,0 +1,90 @@
+"""Monthly DB 인덱스 (YYYY-MM -> 페이지 ID)
+
+거래를 저장할 때마다 Monthly DB를 조회하지 않도록 월 페이지 ID를 메모리에 보관한다.
+
+- 처음 조회할 때 Monthly DB 전체를 커서를 따라 한 번 읽는다
+- 없는 월을 찾으면 (마지막 로드 후 reload_interval초가 지났을 때) 한 번 다시 읽고,
+  그래도 없으면 월 페이지를 새로 만든다
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _title_of(page):
+    """페이지의 title 속성 텍스트"""
+    for prop_data in page.get('properties', {}).values():
+        if prop_data.get('type') == 'title':
+            return ''.join(item.get('plain_text', '') for item in prop_data.get('title', [])).strip()
+    return None
+
+
+class MonthlyIndex:
+    """Monthly DB 월 페이지 ID 인덱스"""
+
+    def __init__(self, gateway, database_id, reload_interval=60):
+        self.gateway = gateway
+        self.database_id = database_id
+        self.reload_interval = reload_interval
+
+        self._pages = {}
+        self._title_prop = None
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """Monthly DB 전체를 읽어 인덱스 재구성"""
+        db = await self.gateway.retrieve_database(self.database_id)
+        for prop_name, prop_data in db['properties'].items():
+            if prop_data.get('type') == 'title':
+                self._title_prop = prop_name
+
+        pages = {}
+        async for batch in self.gateway.iter_query_pages(self.database_id):
+            for page in batch:
+                title = _title_of(page)
+                if title:
+                    pages[title] = page['id']
+
+        self._pages = pages
+        self._loaded_at = time.monotonic()
+        logger.info(f"Monthly DB 인덱스 로드: {len(pages)}개월")
+
+    async def get_page_id(self, year_month, create=True):
+        """YYYY-MM 월 페이지 ID 반환 (인덱스에 있으면 네트워크 호출 없음)"""
+        page_id = self._pages.get(year_month)
+        if page_id:
+            return page_id
+
+        async with self._lock:
+            # 잠금을 기다리는 동안 다른 호출이 이미 찾거나 만들었을 수 있다
+            page_id = self._pages.get(year_month)
+            if page_id:
+                return page_id
+
+            # Notion에서 직접 추가했을 수 있으므로 오래된 인덱스는 다시 읽는다
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval:
+                await self.load()
+                page_id = self._pages.get(year_month)
+                if page_id:
+                    return page_id
+
+            if not create or not self._title_prop:
+                return None
+
+            page = await self.gateway.create_page(
+                parent={"database_id": self.database_id},
+                properties={
+                    self._title_prop: {"title": [{"text": {"content": year_month}}]}
+                }
+            )
+            self._pages[year_month] = page['id']
+            logger.info(f"Monthly DB에 '{year_month}' 페이지 생성")
+            return page['id']
+
+    def invalidate(self):
+        """다음 조회 때 Monthly DB를 다시 읽도록 인덱스 비우기"""
+        self._pages = {}
+        self._loaded_at = None
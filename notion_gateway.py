@@ -0,0 +1,203 @@
+"""Notion API 비동기 게이트웨이
+
+봇의 모든 Notion 호출은 이 모듈의 NotionGateway를 거친다.
+keep-alive 연결 풀을 공유하는 AsyncClient 하나를 사용하고,
+동시에 진행되는 요청 수를 세마포어로 제한한다.
+모든 호출은 토큰 버킷 속도 제한, 429/5xx 재시도, 서킷 브레이커를 거친다.
+pages.create는 멱등이 아니므로 429와 연결 실패만 재시도한다 (rate_limit.RetryPolicy 참고).
+호출마다 엔드포인트/상태 코드별 횟수와 응답 시간을 metrics에 기록한다.
+"""
+import asyncio
+import logging
+import time
+
+import httpx
+from notion_client import AsyncClient
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+from rate_limit import CircuitBreaker, NotionUnavailableError, RetryPolicy, TokenBucket
+from metrics import (
+    NOTION_BREAKER_REJECTIONS, NOTION_RATE_LIMITED, NOTION_REQUEST_DURATION, NOTION_REQUESTS, NOTION_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+
+class NotionGateway:
+    """AsyncClient 래퍼: 연결 풀 공유 + 동시 요청 수 제한"""
+
+    # 다시 보내면 결과가 달라지는 엔드포인트 (응답을 잃어버리면 재시도하지 않음)
+    NON_IDEMPOTENT_ENDPOINTS = {'pages.create'}
+
+    def __init__(self, api_key, max_concurrency=3, timeout_ms=30_000, rate_limit=3.0,
+                 max_retries=4, breaker_threshold=5, breaker_cooldown=30.0, base_url=None, name='default'):
+        # 메트릭의 tenant 레이블
+        self.name = name
+
+        # 동시 요청 수만큼 keep-alive 연결을 유지해 매 요청마다 TLS 핸드셰이크를 하지 않도록 한다
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+                keepalive_expiry=60,
+            )
+        )
+        # base_url: 로컬 가짜 Notion 서버(fake_notion.py)로 벤치마크/테스트할 때 사용
+        options = {'base_url': base_url} if base_url else {}
+        self.client = AsyncClient(auth=api_key, client=self._http, timeout_ms=timeout_ms, **options)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.limiter = TokenBucket(rate=rate_limit, capacity=max(1, int(rate_limit)))
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.breaker = CircuitBreaker(threshold=breaker_threshold, cooldown=breaker_cooldown)
+
+    async def _call(self, endpoint, func, **kwargs):
+        """속도 제한, 재시도, 서킷 브레이커를 거쳐 Notion API 호출
+
+        브레이커가 열려 있으면 요청을 보내지 않고 NotionUnavailableError를 발생시킨다.
+        브레이커에는 재시도를 모두 마친 논리적 호출 하나당 한 번만 장애를 기록한다.
+        """
+        # 재시도는 이미 허가받은 호출의 일부이므로 첫 시도 전에만 확인
+        try:
+            trial = self.breaker.before_call()
+        except NotionUnavailableError:
+            NOTION_BREAKER_REJECTIONS.inc(tenant=self.name, endpoint=endpoint)
+            raise
+        try:
+            return await self._attempt(endpoint, func, kwargs)
+        except BaseException:
+            # 취소 등으로 성공/실패를 기록하지 못한 시험 호출이 브레이커를 계속 막지 않도록 자리 반환
+            if trial is not None:
+                self.breaker.release_trial(trial)
+            raise
+
+    async def _attempt(self, endpoint, func, kwargs):
+        """재시도를 포함한 호출 하나 (브레이커 확인은 _call에서)"""
+        idempotent = endpoint not in self.NON_IDEMPOTENT_ENDPOINTS
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                async with self._semaphore:
+                    logger.debug(f"Notion 호출: {endpoint}")
+                    started = time.perf_counter()
+                    try:
+                        result = await func(**kwargs)
+                    finally:
+                        NOTION_REQUEST_DURATION.observe(
+                            time.perf_counter() - started, tenant=self.name, endpoint=endpoint
+                        )
+            except Exception as e:
+                status = self._status_label(e)
+                NOTION_REQUESTS.inc(tenant=self.name, endpoint=endpoint, status=status)
+                if status == '429':
+                    NOTION_RATE_LIMITED.inc(tenant=self.name, endpoint=endpoint)
+
+                retryable, retry_after, outage = self.retry_policy.classify(e, idempotent=idempotent)
+                if not outage:
+                    # 4xx/429 응답은 Notion이 살아 있다는 뜻
+                    self.breaker.record_success()
+
+                if not retryable or attempt >= self.retry_policy.max_retries:
+                    if outage:
+                        self.breaker.record_failure()
+                    raise
+
+                attempt += 1
+                NOTION_RETRIES.inc(tenant=self.name, endpoint=endpoint)
+                delay = self.retry_policy.delay(attempt, retry_after)
+                if retry_after is not None:
+                    # 429: 이 프로세스의 모든 호출을 Retry-After 동안 멈춤
+                    self.limiter.pause(retry_after)
+                logger.warning(f"Notion {endpoint} 재시도 {attempt}/{self.retry_policy.max_retries} ({delay:.1f}초 후): {e}")
+                await asyncio.sleep(delay)
+                continue
+
+            NOTION_REQUESTS.inc(tenant=self.name, endpoint=endpoint, status='200')
+            self.breaker.record_success()
+            return result
+
+    @staticmethod
+    def _status_label(error):
+        """메트릭용 상태 레이블 (HTTP 상태 코드, timeout, error)"""
+        if isinstance(error, HTTPResponseError):
+            return str(error.status)
+        if isinstance(error, (RequestTimeoutError, httpx.TimeoutException)):
+            return 'timeout'
+        return 'error'
+
+    async def retrieve_database(self, database_id):
+        """데이터베이스 스키마 조회"""
+        return await self._call(
+            'databases.retrieve',
+            self.client.databases.retrieve,
+            database_id=database_id
+        )
+
+    async def update_database(self, database_id, **kwargs):
+        """데이터베이스 속성 추가/수정"""
+        return await self._call(
+            'databases.update',
+            self.client.databases.update,
+            database_id=database_id,
+            **kwargs
+        )
+
+    async def query_database(self, database_id, **kwargs):
+        """데이터베이스 페이지 조회 (filter, sorts, page_size, start_cursor 등)"""
+        return await self._call(
+            'databases.query',
+            self.client.databases.query,
+            database_id=database_id,
+            **kwargs
+        )
+
+    async def iter_query_pages(self, database_id, page_size=100, **kwargs):
+        """쿼리 커서(has_more/next_cursor)를 따라가며 결과를 한 페이지씩 반환하는 비동기 제너레이터
+
+        filter_properties에 속성 ID 목록을 넘기면 해당 속성만 응답에 포함된다.
+        """
+        start_cursor = kwargs.pop('start_cursor', None)
+        while True:
+            if start_cursor:
+                kwargs['start_cursor'] = start_cursor
+            response = await self.query_database(database_id, page_size=page_size, **kwargs)
+            yield response.get('results', [])
+
+            start_cursor = response.get('next_cursor')
+            if not response.get('has_more') or not start_cursor:
+                return
+
+    async def create_page(self, **kwargs):
+        """페이지 생성"""
+        return await self._call('pages.create', self.client.pages.create, **kwargs)
+
+    async def update_page(self, page_id, **kwargs):
+        """페이지 속성 수정 / 보관"""
+        return await self._call(
+            'pages.update',
+            self.client.pages.update,
+            page_id=page_id,
+            **kwargs
+        )
+
+    @staticmethod
+    def describe_error(error):
+        """사용자에게 보여줄 Notion 오류 메시지"""
+        if isinstance(error, NotionUnavailableError):
+            return f"노션 서비스가 일시적으로 응답하지 않습니다. {error.retry_in:.0f}초 후 다시 시도해주세요."
+        if isinstance(error, APIResponseError):
+            if error.status == 429:
+                return "노션 요청이 너무 많습니다. 잠시 후 다시 시도해주세요."
+            if error.status >= 500:
+                return "노션 서버 오류가 발생했습니다. 잠시 후 다시 시도해주세요."
+            return f"노션 요청 오류 ({error.code}): {error}"
+        if isinstance(error, HTTPResponseError):
+            return f"노션 응답 오류 (HTTP {error.status})"
+        if isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+            return "노션 연결이 원활하지 않습니다. 잠시 후 다시 시도해주세요."
+        return str(error)
+
+    async def aclose(self):
+        """연결 풀 종료"""
+        await self._http.aclose()
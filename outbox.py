@@ -0,0 +1,301 @@
+"""! 메시지 저장용 영속 대기열 (write-behind outbox)
+
+handle_message는 항목을 디스크의 SQLite 대기열에 커밋한 즉시 사용자에게 응답하고,
+OutboxFlusher가 백그라운드에서 정해진 속도로 Notion에 저장한다.
+
+- 실패한 항목은 지수 백오프로 재시도하고, 최대 횟수를 넘으면 원래 채팅에 실패를 알린다
+- 저장 응답을 잃어버렸고 페이지가 만들어졌는지 확인할 수도 없으면 다시 보내지 않고
+  unknown으로 남긴 뒤 원래 채팅에 노션에서 확인하도록 알린다
+- 대기열은 디스크에 있으므로 재시작해도 남은 항목을 이어서 저장한다
+- 정상 종료 시 남은 항목을 제한 시간 안에서 모두 저장 시도한다
+- 항목마다 테넌트를 기록하고 테넌트별 OutboxFlusher가 따로 처리해
+  한 가구의 밀린 항목이 다른 가구의 저장을 막지 않는다
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+
+from idempotency import UnconfirmedSaveError
+from rate_limit import NotionUnavailableError
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    tenant TEXT NOT NULL DEFAULT 'default',
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+# tenant 열이 생기기 전 대기열 파일에도 적용 (열 추가 후 생성)
+TENANT_INDEX = "CREATE INDEX IF NOT EXISTS idx_outbox_tenant_due ON outbox (tenant, status, next_attempt_at)"
+
+
+class Outbox:
+    """SQLite 기반 영속 저장 대기열"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        # 커밋이 끝나면 전원이 꺼져도 항목이 남도록 동기 쓰기
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if 'tenant' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        self._conn.execute(TENANT_INDEX)
+
+    def enqueue(self, chat_id, message_data, tenant='default'):
+        """항목을 대기열에 커밋하고 id 반환 (반환 시점에 디스크에 기록되어 있음)"""
+        now = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (chat_id, tenant, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (chat_id, tenant, json.dumps(message_data, ensure_ascii=False), now, now)
+            )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _tenant_filter(tenant):
+        """tenant가 주어지면 해당 테넌트 항목만 고르는 WHERE 조건과 인자"""
+        if tenant is None:
+            return "", ()
+        return " AND tenant = ?", (tenant,)
+
+    def _entry(self, row):
+        return {
+            'id': row['id'],
+            'chat_id': row['chat_id'],
+            'tenant': row['tenant'],
+            'message_data': json.loads(row['payload']),
+            'attempts': row['attempts'],
+        }
+
+    def next_due(self, now=None, tenant=None):
+        """지금 저장할 차례인 가장 오래된 항목 (없으면 None)"""
+        condition, params = self._tenant_filter(tenant)
+        row = self._conn.execute(
+            f"SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?{condition} "
+            "ORDER BY next_attempt_at, id LIMIT 1",
+            (now if now is not None else time.time(), *params)
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    def pending(self, tenant=None):
+        """재시도 대기 중인 것까지 포함한 모든 미저장 항목 (오래된 순)"""
+        condition, params = self._tenant_filter(tenant)
+        rows = self._conn.execute(
+            f"SELECT * FROM outbox WHERE status = 'pending'{condition} ORDER BY id",
+            params
+        ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def seconds_until_next(self, now=None, tenant=None):
+        """다음 재시도 예정까지 남은 초 (대기 항목이 없으면 None)"""
+        condition, params = self._tenant_filter(tenant)
+        row = self._conn.execute(
+            f"SELECT MIN(next_attempt_at) AS at FROM outbox WHERE status = 'pending'{condition}",
+            params
+        ).fetchone()
+        if row['at'] is None:
+            return None
+        return max(0.0, row['at'] - (now if now is not None else time.time()))
+
+    def pending_count(self, tenant=None, chat_id=None):
+        """미저장 항목 수 (chat_id가 주어지면 해당 채팅의 항목만)"""
+        condition, params = self._tenant_filter(tenant)
+        if chat_id is not None:
+            condition += " AND chat_id = ?"
+            params = (*params, chat_id)
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM outbox WHERE status = 'pending'{condition}",
+            params
+        ).fetchone()[0]
+
+    def complete(self, entry_id):
+        """저장 완료된 항목 삭제"""
+        with self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def retry_later(self, entry_id, error, delay):
+        """실패한 항목을 delay초 뒤에 다시 시도하도록 표시"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (error, time.time() + delay, entry_id)
+            )
+
+    def postpone(self, entry_id, delay):
+        """시도 횟수를 늘리지 않고 delay초 뒤로 미룸"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                (time.time() + delay, entry_id)
+            )
+
+    def fail(self, entry_id, error):
+        """재시도를 포기한 항목 표시 (확인용으로 남겨 둠)"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, entry_id)
+            )
+
+    def mark_unknown(self, entry_id, error):
+        """저장됐는지 확인할 수 없는 항목 표시 (다시 보내지 않고 확인용으로 남겨 둠)"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'unknown', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, entry_id)
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class OutboxFlusher:
+    """대기열 항목을 정해진 속도로 Notion에 저장하는 백그라운드 작업
+
+    save_func(message_data) -> (success, msg), Notion 장애 중이면 NotionUnavailableError,
+    저장됐는지 확인할 수 없으면 UnconfirmedSaveError 발생
+    notify_func(chat_id, text) -> 최종 실패를 원래 채팅에 알리는 코루틴
+    tenant가 주어지면 해당 테넌트의 항목만 처리한다.
+    """
+
+    def __init__(self, outbox, save_func, notify_func, rate=2.0, max_attempts=5,
+                 base_delay=2.0, max_delay=300.0, tenant=None):
+        self.outbox = outbox
+        self.tenant = tenant
+        self._save = save_func
+        self._notify = notify_func
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._last_sent_at = 0.0
+
+    def start(self):
+        """백그라운드 저장 작업 시작 (이전 실행에서 남은 항목도 이어서 저장)"""
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        remaining = self.outbox.pending_count(tenant=self.tenant)
+        if remaining:
+            logger.info(f"대기열에 남은 항목 {remaining}건 저장 재개 ({self.tenant or '전체'})")
+
+    def wake(self):
+        """새 항목이 들어왔음을 알림"""
+        self._wake.set()
+
+    async def _run(self):
+        while not self._stopping:
+            entry = self.outbox.next_due(tenant=self.tenant)
+            if entry is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(),
+                                           timeout=self.outbox.seconds_until_next(tenant=self.tenant))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._deliver(entry)
+            except Exception as e:
+                # 대기열 작업이 죽으면 이후 항목이 모두 멈추므로 로그만 남기고 계속 진행
+                logger.error(f"대기열 처리 오류 (id={entry['id']}): {e}")
+                await asyncio.sleep(1)
+
+    async def _pace(self):
+        """저장 요청 사이 최소 간격 유지"""
+        wait = self._last_sent_at + self._interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_sent_at = time.monotonic()
+
+    async def _deliver(self, entry):
+        """항목 하나 저장 시도 후 결과에 따라 삭제 / 재시도 예약 / 실패 처리"""
+        await self._pace()
+        try:
+            success, msg = await self._save(entry['message_data'])
+        except NotionUnavailableError as e:
+            # 장애 중에는 재시도 횟수를 쓰지 않고 브레이커가 다시 닫힐 때까지 미룸
+            self.outbox.postpone(entry['id'], max(1.0, e.retry_in))
+            return
+        except UnconfirmedSaveError as e:
+            logger.error(f"대기열 항목 저장 여부 확인 불가 (id={entry['id']}): {e}")
+            self.outbox.mark_unknown(entry['id'], str(e))
+            data = entry['message_data']
+            await self._notify(
+                entry['chat_id'],
+                f"⚠️ 노션에 저장됐는지 확인하지 못했습니다. 노션에서 확인하고 없으면 다시 입력해주세요.\n"
+                f"내용: {data.get('title')} {data.get('amount', 0):,}원\n"
+                f"오류: {e}"
+            )
+            return
+
+        if success:
+            self.outbox.complete(entry['id'])
+            return
+
+        attempts = entry['attempts'] + 1
+        if attempts < self.max_attempts:
+            delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+            logger.warning(f"대기열 저장 실패 (id={entry['id']}, {attempts}회), {delay:.0f}초 후 재시도: {msg}")
+            self.outbox.retry_later(entry['id'], msg, delay)
+            return
+
+        logger.error(f"대기열 저장 최종 실패 (id={entry['id']}): {msg}")
+        self.outbox.fail(entry['id'], msg)
+        data = entry['message_data']
+        await self._notify(
+            entry['chat_id'],
+            f"❌ 노션 저장에 실패했습니다.\n"
+            f"내용: {data.get('title')} {data.get('amount', 0):,}원\n"
+            f"오류: {msg}"
+        )
+
+    async def stop(self):
+        """백그라운드 작업 중지 (진행 중인 저장은 끝까지 기다림)"""
+        self._stopping = True
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def drain(self, timeout=30.0):
+        """종료 전 남은 항목을 재시도 대기와 무관하게 한 번씩 저장 시도
+
+        제한 시간 안에 저장하지 못한 항목은 디스크에 남아 다음 실행 때 저장된다.
+        """
+        await self.stop()
+        deadline = time.monotonic() + timeout
+        for entry in self.outbox.pending(tenant=self.tenant):
+            if time.monotonic() >= deadline:
+                break
+            try:
+                await asyncio.wait_for(self._deliver(entry), timeout=max(0.1, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                break
+            except Exception as e:
+                logger.error(f"대기열 처리 오류 (id={entry['id']}): {e}")
+
+        remaining = self.outbox.pending_count(tenant=self.tenant)
+        if remaining:
+            logger.warning(f"저장하지 못한 대기열 항목 {remaining}건은 다음 실행 때 저장됩니다")
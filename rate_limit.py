@@ -0,0 +1,183 @@
+"""Notion 호출 속도 제한, 재시도 정책, 서킷 브레이커
+
+Notion API는 통합(integration)당 초당 약 3회 요청만 허용한다.
+NotionGateway는 모든 호출 앞에서 TokenBucket으로 속도를 맞추고,
+429/5xx 응답은 RetryPolicy에 따라 재시도하며,
+장애가 이어지면 CircuitBreaker가 열려 요청을 쌓지 않고 바로 실패시킨다.
+
+pages.create처럼 멱등이 아닌 호출은 요청이 서버에 닿지 않았다고 확실한 경우(429, 연결 실패)만
+재시도한다. 응답만 잃어버린 경우 다시 보내면 같은 거래가 두 번 만들어지기 때문이다.
+"""
+import asyncio
+import random
+import time
+
+import httpx
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+
+class NotionUnavailableError(Exception):
+    """서킷 브레이커가 열려 있어 Notion 호출을 보내지 않았을 때 발생"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"노션 서비스가 응답하지 않아 잠시 요청을 중단했습니다 ({retry_in:.0f}초 후 재시도)")
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """비동기 토큰 버킷 (rate: 초당 토큰, capacity: 최대 버스트)
+
+    대기자는 잠금 순서대로(FIFO) 토큰을 받는다.
+    pause()로 Retry-After 동안 모든 호출자를 함께 멈출 수 있다.
+    """
+
+    def __init__(self, rate=3.0, capacity=3):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """토큰 하나를 받을 때까지 대기"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """seconds초 동안 토큰 발급 중지 (429 Retry-After 존중)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+# 요청이 서버에 전달되기 전에 실패한 오류 (멱등이 아닌 호출도 다시 보내도 안전)
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _not_sent(error):
+    """요청이 서버에 닿지 않았음이 확실한 오류인지 (notion-client는 httpx 타임아웃을 RequestTimeoutError로 감싼다)"""
+    if isinstance(error, RequestTimeoutError):
+        error = error.__context__
+    return isinstance(error, NOT_SENT_ERRORS)
+
+
+def not_applied(error):
+    """Notion이 요청을 처리하지 않았음이 확실한 오류인지 (아니면 응답만 잃어버렸을 수 있음)
+
+    4xx(409 제외) 응답과 서버에 닿지 않은 요청, 브레이커가 막은 호출이 해당한다.
+    """
+    if isinstance(error, NotionUnavailableError):
+        return True
+    if isinstance(error, HTTPResponseError):
+        return error.status < 500 and error.status != 409
+    return _not_sent(error)
+
+
+class RetryPolicy:
+    """재시도 가능 오류 판별과 지터가 들어간 지수 백오프 계산"""
+
+    RETRY_STATUSES = {409, 429, 500, 502, 503, 504}
+    # 멱등이 아닌 호출에서 재시도하는 상태 코드 (429는 처리하지 않고 거절한 응답)
+    NON_IDEMPOTENT_RETRY_STATUSES = {429}
+
+    def __init__(self, max_retries=4, base_delay=0.5, max_delay=20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def classify(self, error, idempotent=True):
+        """(재시도 가능 여부, Retry-After 초 또는 None, 장애로 볼지 여부) 반환
+
+        429는 Notion이 살아 있지만 속도를 줄이라는 뜻이므로 장애로 보지 않는다.
+        idempotent=False면 429와 연결 실패만 재시도한다 (읽기 타임아웃, 409, 5xx는 이미 처리됐을 수 있음).
+        """
+        if isinstance(error, HTTPResponseError):
+            statuses = self.RETRY_STATUSES if idempotent else self.NON_IDEMPOTENT_RETRY_STATUSES
+            retry_after = None
+            try:
+                retry_after = float(error.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                pass
+            return error.status in statuses, retry_after, error.status >= 500
+        if isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+            return idempotent or _not_sent(error), None, True
+        return False, None, False
+
+    def delay(self, attempt, retry_after=None):
+        """attempt번째 재시도 전 대기 시간 (Retry-After가 있으면 그 이상)"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return retry_after + backoff / 2
+        return backoff
+
+
+class CircuitBreaker:
+    """연속 장애가 threshold번 이어지면 cooldown초 동안 호출을 차단
+
+    cooldown이 지나면 한 번의 시험 호출(half-open)을 허용하고,
+    성공하면 닫히고 실패하면 다시 열린다.
+    시험 호출이 결과 없이 끝나면(취소) release_trial()로 시험 자리를 돌려줘 다음 호출이 다시 시험한다.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        # 진행 중인 시험 호출의 표식 (없으면 None)
+        self._trial = None
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        """호출 전 확인, 차단 중이면 NotionUnavailableError 발생
+
+        이 호출이 시험 호출이면 release_trial()에 넘길 표식을, 아니면 None을 반환한다.
+        """
+        state = self.state
+        if state == 'closed':
+            return None
+        if state == 'half-open' and self._trial is None:
+            self._trial = object()
+            return self._trial
+        retry_in = max(0.0, self._opened_at + self.cooldown - time.monotonic())
+        raise NotionUnavailableError(retry_in)
+
+    def release_trial(self, trial):
+        """성공/실패를 기록하지 못하고 끝난 시험 호출의 자리 반환 (열린 상태 유지)
+
+        그 사이 결과가 기록되어 다른 호출이 새 시험을 시작했으면 건드리지 않는다.
+        """
+        if self._trial is trial:
+            self._trial = None
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial is not None or self._failures >= self.threshold:
+            self._opened_at = time.monotonic()
+        self._trial = None
@@ -0,0 +1,74 @@
+"""채팅별 최근 저장 페이지 색인
+
+save_to_notion이 pages.create 응답의 페이지 ID를 저장한 항목 내용과 함께 채팅마다
+최근 per_chat건까지 기록한다. /취소와 /수정은 Notion을 조회하지 않고 이 색인에서
+대상 페이지를 바로 찾는다 (/취소를 반복하면 한 건씩 더 이전 항목을 취소).
+"""
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recent_pages (
+    page_id TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    tenant TEXT NOT NULL,
+    title TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recent_pages_chat ON recent_pages (chat_id, tenant, created_at);
+"""
+
+FIELDS = ('title', 'amount', 'type', 'category', 'date')
+
+
+class RecentPages:
+    """SQLite 기반 채팅별 최근 페이지 목록 (채팅마다 최대 per_chat건)"""
+
+    def __init__(self, path, per_chat=20):
+        self.per_chat = per_chat
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def push(self, chat_id, tenant, page_id, message_data):
+        """새로 만든 페이지 기록 후 채팅의 오래된 기록 정리"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recent_pages "
+                "(page_id, chat_id, tenant, title, amount, type, category, date, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (page_id, chat_id, tenant, *(message_data[field] for field in FIELDS), time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM recent_pages WHERE chat_id = ? AND tenant = ? AND page_id NOT IN ("
+                "SELECT page_id FROM recent_pages WHERE chat_id = ? AND tenant = ? "
+                "ORDER BY created_at DESC LIMIT ?)",
+                (chat_id, tenant, chat_id, tenant, self.per_chat)
+            )
+
+    def last(self, chat_id, tenant):
+        """채팅에서 가장 최근에 저장한 페이지 (없으면 None)"""
+        return self._conn.execute(
+            "SELECT * FROM recent_pages WHERE chat_id = ? AND tenant = ? ORDER BY created_at DESC LIMIT 1",
+            (chat_id, tenant)
+        ).fetchone()
+
+    def update(self, page_id, message_data):
+        """수정한 내용 반영"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE recent_pages SET title = ?, amount = ?, type = ?, category = ?, date = ? WHERE page_id = ?",
+                (*(message_data[field] for field in FIELDS), page_id)
+            )
+
+    def remove(self, page_id):
+        with self._conn:
+            self._conn.execute("DELETE FROM recent_pages WHERE page_id = ?", (page_id,))
+
+    def close(self):
+        self._conn.close()
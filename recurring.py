@@ -0,0 +1,112 @@
+"""정기 거래 (월세, 보험, 통신비처럼 매달 같은 날 나가는 항목)
+
+채팅마다 (매월 며칠, 내용, 금액, 종류, 카테고리)를 SQLite에 저장하고
+항목마다 다음에 기록할 날짜(next_date)를 둔다. 주기 작업은 next_date가 오늘 이전인
+모든 항목을 저장 대기열에 한꺼번에 넣고 next_date를 다음 달로 넘긴다.
+
+- 봇이 꺼져 있던 동안 지나간 날짜도 다음 실행에서 빠짐없이 기록한다 (밀린 달마다 한 건)
+- 회차마다 'recurring:<id>:<날짜>' 중복 방지 키를 붙이므로
+  대기열에 넣은 뒤 next_date를 넘기기 전에 죽어도 같은 회차가 두 번 저장되지 않는다
+- 그 달에 없는 날(31일 등)은 그 달 말일에 기록한다
+"""
+import calendar
+import sqlite3
+import time
+from datetime import date
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recurring (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    tenant TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    next_date TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recurring_due ON recurring (tenant, next_date);
+CREATE INDEX IF NOT EXISTS idx_recurring_chat ON recurring (chat_id);
+"""
+
+
+def occurrence(year, month, day):
+    """year-month의 day일 (그 달에 없는 날이면 말일)"""
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def first_occurrence(day, today):
+    """오늘 이후(오늘 포함) 첫 회차 날짜"""
+    this_month = occurrence(today.year, today.month, day)
+    if this_month >= today:
+        return this_month
+    return following_occurrence(day, this_month)
+
+
+def following_occurrence(day, previous):
+    """previous 회차 다음 달의 회차 날짜"""
+    year, month = (previous.year + 1, 1) if previous.month == 12 else (previous.year, previous.month + 1)
+    return occurrence(year, month, day)
+
+
+def occurrence_key(entry_id, occurrence_date):
+    """회차의 중복 방지 키"""
+    return f"recurring:{entry_id}:{occurrence_date.isoformat()}"
+
+
+class RecurringStore:
+    """SQLite 기반 정기 거래 목록"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def add(self, chat_id, tenant, day, message_data, today=None):
+        """정기 거래 추가 후 id 반환 (첫 회차는 오늘 이후 첫 day일)"""
+        next_date = first_occurrence(day, today or date.today())
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO recurring (chat_id, tenant, day, title, amount, type, category, next_date, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, tenant, day, message_data['title'], message_data['amount'],
+                 message_data['type'], message_data['category'], next_date.isoformat(), time.time())
+            )
+        return cursor.lastrowid
+
+    def get(self, entry_id):
+        return self._conn.execute("SELECT * FROM recurring WHERE id = ?", (entry_id,)).fetchone()
+
+    def for_chat(self, chat_id):
+        """채팅의 정기 거래 목록 (매월 날짜순)"""
+        return self._conn.execute(
+            "SELECT * FROM recurring WHERE chat_id = ? ORDER BY day, id", (chat_id,)
+        ).fetchall()
+
+    def remove(self, chat_id, entry_id):
+        """채팅의 정기 거래 삭제, 삭제했으면 True"""
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM recurring WHERE id = ? AND chat_id = ?", (entry_id, chat_id)
+            )
+        return cursor.rowcount > 0
+
+    def due(self, tenant, today=None):
+        """next_date가 오늘 이전인 테넌트의 정기 거래 (next_date순)"""
+        return self._conn.execute(
+            "SELECT * FROM recurring WHERE tenant = ? AND next_date <= ? ORDER BY next_date, id",
+            (tenant, (today or date.today()).isoformat())
+        ).fetchall()
+
+    def advance(self, entry_id, next_date):
+        """다음 회차 날짜 기록"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE recurring SET next_date = ? WHERE id = ?", (next_date.isoformat(), entry_id)
+            )
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,108 @@
+"""월별 집계(rollup) 저장소
+
+(월, 종류, 카테고리)별 합계와 건수를 미러 DB의 monthly_rollups 테이블에 유지한다.
+TransactionMirror가 행을 쓰거나 지울 때마다 apply()로 이전 값은 빼고 새 값은 더하므로
+/월별통계는 거래 건수와 관계없이 카테고리 수만큼의 행만 읽는다.
+rebuild()는 transactions 테이블에서 전부 다시 계산해 어긋난 값을 바로잡는다.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    month TEXT NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total NUMERIC NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, type, category)
+);
+"""
+
+
+def _key(row):
+    """행의 집계 키 (월, 종류, 카테고리), 날짜가 없으면 None"""
+    if not row or not row['date']:
+        return None
+    return row['date'][:7], row['type'] or '', row['category'] or ''
+
+
+class MonthlyRollups:
+    """월/종류/카테고리별 합계 (TransactionMirror와 같은 SQLite 연결 사용)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+
+        # 집계 테이블이 생기기 전에 쌓인 거래가 있으면 처음 한 번 계산
+        has_rollups = self._conn.execute("SELECT 1 FROM monthly_rollups LIMIT 1").fetchone()
+        has_transactions = self._conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone()
+        if has_transactions and not has_rollups:
+            self.rebuild()
+
+    def _add(self, key, amount, count):
+        month, trans_type, category = key
+        self._conn.execute(
+            "INSERT INTO monthly_rollups (month, type, category, total, count) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(month, type, category) DO UPDATE SET "
+            "total = total + excluded.total, count = count + excluded.count",
+            (month, trans_type, category, amount, count)
+        )
+        if count < 0:
+            self._conn.execute(
+                "DELETE FROM monthly_rollups WHERE month = ? AND type = ? AND category = ? AND count <= 0",
+                (month, trans_type, category)
+            )
+
+    def apply(self, old_row, new_row):
+        """거래 한 건의 변경 반영 (추가: old_row=None, 삭제: new_row=None)
+
+        호출 측의 트랜잭션 안에서 실행되어 transactions 테이블과 함께 커밋된다.
+        """
+        old_key = _key(old_row)
+        if old_key:
+            self._add(old_key, -(old_row['amount'] or 0), -1)
+        new_key = _key(new_row)
+        if new_key:
+            self._add(new_key, new_row['amount'] or 0, 1)
+
+    def month(self, year_month):
+        """해당 월의 종류/카테고리별 합계와 건수"""
+        return self._conn.execute(
+            "SELECT type, category, total, count FROM monthly_rollups WHERE month = ?",
+            (year_month,)
+        ).fetchall()
+
+    def months(self, start_month, end_month):
+        """[start_month, end_month] 월들의 월/종류/카테고리별 합계와 건수 (한 번의 범위 조회)"""
+        return self._conn.execute(
+            "SELECT month, type, category, total, count FROM monthly_rollups "
+            "WHERE month >= ? AND month <= ? ORDER BY month",
+            (start_month, end_month)
+        ).fetchall()
+
+    def rebuild(self):
+        """transactions 테이블에서 전체 재계산, 바로잡은 집계 키 수 반환"""
+        with self._conn:
+            before = {
+                (r['month'], r['type'], r['category']): (r['total'], r['count'])
+                for r in self._conn.execute("SELECT * FROM monthly_rollups")
+            }
+            self._conn.execute("DELETE FROM monthly_rollups")
+            self._conn.execute(
+                "INSERT INTO monthly_rollups (month, type, category, total, count) "
+                "SELECT substr(date, 1, 7), COALESCE(type, ''), COALESCE(category, ''), "
+                "COALESCE(SUM(amount), 0), COUNT(*) "
+                "FROM transactions WHERE date IS NOT NULL "
+                "GROUP BY substr(date, 1, 7), COALESCE(type, ''), COALESCE(category, '')"
+            )
+            after = {
+                (r['month'], r['type'], r['category']): (r['total'], r['count'])
+                for r in self._conn.execute("SELECT * FROM monthly_rollups")
+            }
+
+        drift = sum(1 for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+        if drift:
+            logger.warning(f"월별 집계 보정: {drift}개 항목")
+        return drift
@@ -0,0 +1,232 @@
+"""Transaction DB 스키마(속성 이름/옵션) 캐시
+
+- TTL이 지나면 캐시된 스키마를 그대로 반환하면서 백그라운드에서 새로 고친다
+- 조회 결과는 로컬 JSON 스냅샷에 저장해 재시작 직후에도 바로 사용한다
+- 속성 구성이 바뀔 때마다 version이 올라간다
+- 조회 실패 시 failure_backoff초 동안은 다시 요청하지 않는다
+- 저장이 속성/옵션 검증 오류로 실패하면 invalidate()로 즉시 새로 고친다
+- 스키마가 바뀔 때마다 선택 옵션 색인(categories.CategoryIndex)을 다시 만든다
+- 저장 키 속성(KEY_PROPERTY)이 없으면 ensure_key_property()로 만든다 (중복 저장 확인용)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+from categories import CategoryIndex
+from rate_limit import NotionUnavailableError
+from metrics import SCHEMA_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# 페이지마다 중복 방지 키를 적는 텍스트 속성 (응답을 잃어버린 저장이 실제로 만들어졌는지 조회할 때 사용)
+KEY_PROPERTY = '저장키'
+
+
+def _option_names(prop_data):
+    return [opt['name'] for opt in prop_data.get('select', {}).get('options', [])]
+
+
+def parse_db_properties(db):
+    """databases.retrieve 응답에서 역할별 속성 이름, 선택 옵션, 속성 ID 추출"""
+    db_properties = {'props': {}, 'categories': {}, 'ids': {}}
+
+    for prop_name, prop_data in db['properties'].items():
+        prop_type = prop_data.get('type')
+
+        if prop_type == 'title':
+            db_properties['props']['title'] = prop_name
+
+        elif prop_type == 'date':
+            db_properties['props']['date'] = prop_name
+
+        elif prop_type == 'number':
+            # 수입 비용, 지출 비용 구분
+            if '수입' in prop_name and '비용' in prop_name:
+                db_properties['props']['income_amount'] = prop_name
+            elif '지출' in prop_name and '비용' in prop_name:
+                db_properties['props']['expense_amount'] = prop_name
+
+        elif prop_type == 'select':
+            # 종류 (지출/수입)
+            if '종류' in prop_name and '지출' not in prop_name and '수입' not in prop_name:
+                db_properties['props']['type'] = prop_name
+                db_properties['categories']['type'] = _option_names(prop_data)
+            # 지출 카테고리
+            elif '지출' in prop_name and ('카테고리' in prop_name or '종류' in prop_name):
+                db_properties['props']['expense_category'] = prop_name
+                db_properties['categories']['expense_category'] = _option_names(prop_data)
+            # 수입 카테고리
+            elif '수입' in prop_name and ('카테고리' in prop_name or '종류' in prop_name):
+                db_properties['props']['income_category'] = prop_name
+                db_properties['categories']['income_category'] = _option_names(prop_data)
+
+        elif prop_type == 'relation':
+            # 월 (Monthly DB와 연결)
+            if '월' in prop_name:
+                db_properties['props']['month'] = prop_name
+
+        elif prop_type == 'rich_text':
+            # 중복 방지 키
+            if prop_name == KEY_PROPERTY:
+                db_properties['props']['idempotency_key'] = prop_name
+
+    # 속성 이름 -> 속성 ID (쿼리 시 filter_properties 프로젝션에 사용)
+    for key, prop_name in db_properties['props'].items():
+        db_properties['ids'][key] = db['properties'][prop_name]['id']
+
+    return db_properties
+
+
+def _digest(db_properties):
+    return hashlib.sha256(
+        json.dumps(db_properties, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+
+
+class SchemaCache:
+    """TTL + 백그라운드 갱신 + 디스크 스냅샷을 갖춘 스키마 캐시"""
+
+    def __init__(self, gateway, database_id, snapshot_path, ttl=600, failure_backoff=30):
+        self.gateway = gateway
+        self.database_id = database_id
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.failure_backoff = failure_backoff
+
+        self._schema = None
+        self._digest = None
+        # 입력값 검증용 선택 옵션 색인 (스키마가 없으면 None)
+        self.category_index = None
+        self.version = 0
+        self._fetched_at = 0.0
+        self._failed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+        self._load_snapshot()
+
+    # --- 스냅샷 ---
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"스키마 스냅샷을 읽지 못했습니다: {e}")
+            return
+
+        if snapshot.get('database_id') != self.database_id:
+            return
+        self._schema = snapshot['schema']
+        self._digest = snapshot['digest']
+        self.category_index = CategoryIndex(self._schema)
+        self.version = snapshot['version']
+        self._fetched_at = snapshot['fetched_at']
+        logger.info(f"스키마 스냅샷 로드 (v{self.version})")
+
+    def _save_snapshot(self):
+        snapshot = {
+            'database_id': self.database_id,
+            'version': self.version,
+            'digest': self._digest,
+            'fetched_at': self._fetched_at,
+            'schema': self._schema,
+        }
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.snapshot_path)
+
+    # --- 조회 / 갱신 ---
+
+    def is_expired(self):
+        return time.time() - self._fetched_at > self.ttl
+
+    async def get(self):
+        """스키마 반환 (TTL이 지났으면 캐시를 반환하고 백그라운드 갱신, 캐시가 없으면 조회)"""
+        tenant = self.gateway.name
+        if self._schema is not None:
+            if self.is_expired():
+                SCHEMA_CACHE_REQUESTS.inc(tenant=tenant, result='stale')
+                self.refresh_in_background()
+            else:
+                SCHEMA_CACHE_REQUESTS.inc(tenant=tenant, result='hit')
+            return self._schema
+
+        SCHEMA_CACHE_REQUESTS.inc(tenant=tenant, result='miss')
+        # 최근 조회에 실패했다면 매 메시지마다 다시 요청하지 않음
+        if time.time() - self._failed_at < self.failure_backoff:
+            return None
+        return await self.refresh()
+
+    async def refresh(self):
+        """Notion에서 스키마를 다시 읽어 캐시/스냅샷 갱신 (동시 호출은 한 번만 조회)"""
+        requested_at = time.time()
+        async with self._lock:
+            # 잠금을 기다리는 동안 다른 호출이 이미 갱신했다면 그 결과 사용
+            if self._schema is not None and self._fetched_at >= requested_at:
+                return self._schema
+
+            try:
+                db = await self.gateway.retrieve_database(self.database_id)
+                schema = parse_db_properties(db)
+            except NotionUnavailableError:
+                self._failed_at = time.time()
+                raise
+            except Exception as e:
+                logger.error(f"데이터베이스 속성 조회 오류: {e}")
+                self._failed_at = time.time()
+                return self._schema
+
+            digest = _digest(schema)
+            if digest != self._digest:
+                self.version += 1
+                self._digest = digest
+                self.category_index = CategoryIndex(schema)
+                logger.info(f"스키마 갱신: v{self.version}")
+            self._schema = schema
+            self._fetched_at = time.time()
+            self._failed_at = 0.0
+
+            try:
+                self._save_snapshot()
+            except Exception as e:
+                logger.warning(f"스키마 스냅샷 저장 실패: {e}")
+            return self._schema
+
+    def refresh_in_background(self):
+        """진행 중인 갱신이 없으면 백그라운드 갱신 시작"""
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_quietly())
+
+    async def _refresh_quietly(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"스키마 백그라운드 갱신 실패: {e}")
+
+    def invalidate(self):
+        """캐시를 만료시키고 바로 백그라운드 갱신 (검증 오류 등으로 스키마가 바뀐 것이 의심될 때)"""
+        self._fetched_at = 0.0
+        self._failed_at = 0.0
+        self.refresh_in_background()
+
+    async def ensure_key_property(self):
+        """저장 키 속성이 없으면 데이터베이스에 추가하고 스키마를 다시 읽음, 있으면(또는 추가했으면) True"""
+        schema = await self.get()
+        if schema is None:
+            return False
+        if 'idempotency_key' in schema['props']:
+            return True
+
+        await self.gateway.update_database(self.database_id, properties={KEY_PROPERTY: {'rich_text': {}}})
+        logger.info(f"저장 키 속성 추가: {KEY_PROPERTY}")
+        self._fetched_at = 0.0
+        schema = await self.refresh()
+        return bool(schema) and 'idempotency_key' in schema['props']
@@ -0,0 +1,188 @@
+"""거래 검색용 역색인 (inverted index)
+
+거래 내용(title)과 카테고리를 글자 단위(1글자) + 2글자(bigram) 토큰으로 나눠
+미러 DB의 search_terms 테이블에 (토큰 -> 페이지) 로 저장한다.
+한국어는 띄어쓰기 없이 붙여 쓰는 경우가 많아('아파트관리비') 단어 단위 대신
+2글자 토큰을 쓰므로 '관리비'로 검색해도 찾을 수 있다.
+
+- TransactionMirror가 행을 쓰거나 지울 때마다 apply()로 함께 갱신한다
+- 처음 만들 때나 rebuild()는 transactions 테이블 전체를 읽어 다시 만든다
+- search()는 검색어의 모든 토큰을 가진 페이지만 후보로 고른 뒤 실제 포함 여부를 확인해
+  2글자 토큰 조합으로 생기는 잘못된 후보를 걸러내고 점수순으로 정렬한다
+"""
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    PRIMARY KEY (term, page_id, field)
+) WITHOUT ROWID;
+"""
+
+# 색인하는 열과 점수 가중치 (내용이 카테고리보다 중요)
+FIELDS = {'title': 2, 'category': 1}
+
+_SPLIT_PATTERN = re.compile(r'[\W_]+')
+
+
+def words(text):
+    """비교용 단어 목록 (NFC 정규화, 대소문자 무시, 공백/구두점 기준 분리)"""
+    if not text:
+        return []
+    return [word for word in _SPLIT_PATTERN.split(unicodedata.normalize('NFC', text).casefold()) if word]
+
+
+def _word_terms(word):
+    """단어 하나의 토큰 (글자 + 연속 2글자)"""
+    terms = set(word)
+    terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def _query_terms(word):
+    """검색어 단어 하나로 찾을 토큰 (2글자 이상이면 bigram만)"""
+    if len(word) == 1:
+        return {word}
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def _score(query_words, row):
+    """검색어 단어가 모두 포함되면 점수, 하나라도 없으면 None
+
+    단어 전체 일치 > 단어 앞부분 일치 > 중간 포함 순이고, 열마다 FIELDS 가중치를 곱한다.
+    """
+    fields = {field: words(row[field]) for field in FIELDS}
+    score = 0
+    for query_word in query_words:
+        best = 0
+        for field, weight in FIELDS.items():
+            for word in fields[field]:
+                if word == query_word:
+                    best = max(best, 3 * weight)
+                elif word.startswith(query_word):
+                    best = max(best, 2 * weight)
+                elif query_word in word:
+                    best = max(best, weight)
+        if not best:
+            return None
+        score += best
+    return score
+
+
+class SearchIndex:
+    """거래 내용/카테고리 역색인 (TransactionMirror와 같은 SQLite 연결 사용)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+
+        # 색인 테이블이 생기기 전에 쌓인 거래가 있으면 처음 한 번 전체 색인
+        has_terms = self._conn.execute("SELECT 1 FROM search_terms LIMIT 1").fetchone()
+        has_transactions = self._conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone()
+        if has_transactions and not has_terms:
+            self.rebuild()
+
+    @staticmethod
+    def _entries(row):
+        """행의 (토큰, 페이지 ID, 열) 목록"""
+        return {
+            (term, row['page_id'], field)
+            for field in FIELDS
+            for word in words(row[field])
+            for term in _word_terms(word)
+        }
+
+    def apply(self, old_row, new_row):
+        """거래 한 건의 변경 반영 (추가: old_row=None, 삭제: new_row=None)
+
+        호출 측의 트랜잭션 안에서 실행되어 transactions 테이블과 함께 커밋된다.
+        """
+        if old_row:
+            if new_row and all(old_row[field] == new_row[field] for field in FIELDS):
+                return
+            # 이전 값의 토큰을 다시 계산해 기본 키로 지움 (page_id 보조 인덱스를 따로 유지하지 않음)
+            self._conn.executemany(
+                "DELETE FROM search_terms WHERE term = ? AND page_id = ? AND field = ?",
+                self._entries(old_row)
+            )
+        if new_row:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO search_terms (term, page_id, field) VALUES (?, ?, ?)",
+                self._entries(new_row)
+            )
+
+    def rebuild(self):
+        """transactions 테이블 전체를 읽어 다시 색인, 색인한 거래 수 반환"""
+        with self._conn:
+            self._conn.execute("DELETE FROM search_terms")
+            rows = self._conn.execute("SELECT page_id, title, category FROM transactions").fetchall()
+            # 정렬된 순서로 넣으면 B-tree 끝에 이어 붙여 전체 색인이 빠르다
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO search_terms (term, page_id, field) VALUES (?, ?, ?)",
+                sorted(entry for row in rows for entry in self._entries(row))
+            )
+            count = len(rows)
+        logger.info(f"검색 색인 생성: {count}건")
+        return count
+
+    def search(self, query, start_date=None, end_date=None, min_amount=None, max_amount=None,
+               trans_type=None, limit=20):
+        """(전체 일치 건수, 점수/날짜순 상위 limit개 행) 반환
+
+        기간은 [start_date, end_date), 금액은 [min_amount, max_amount] 범위이며 None이면 제한하지 않는다.
+        검색어가 비어 있으면 조건에 맞는 거래를 날짜 내림차순으로 돌려준다.
+        """
+        conditions = []
+        params = []
+        if start_date:
+            conditions.append("t.date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("t.date < ?")
+            params.append(end_date)
+        if min_amount is not None:
+            conditions.append("t.amount >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            conditions.append("t.amount <= ?")
+            params.append(max_amount)
+        if trans_type:
+            conditions.append("t.type = ?")
+            params.append(trans_type)
+
+        query_words = words(query)
+        terms = set()
+        for word in query_words:
+            terms |= _query_terms(word)
+
+        if terms:
+            placeholders = ", ".join("?" * len(terms))
+            sql = (
+                "SELECT t.rowid, t.* FROM transactions t JOIN ("
+                f"SELECT page_id FROM search_terms WHERE term IN ({placeholders}) "
+                "GROUP BY page_id HAVING COUNT(DISTINCT term) = ?"
+                ") m ON m.page_id = t.page_id"
+            )
+            params = [*terms, len(terms), *params]
+        else:
+            sql = "SELECT t.rowid, t.* FROM transactions t"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        rows = self._conn.execute(sql, params).fetchall()
+        scored = []
+        for row in rows:
+            score = _score(query_words, row) if query_words else 0
+            if score is not None:
+                scored.append((score, row))
+
+        # 점수 내림차순, 같은 점수는 최근 날짜 먼저
+        scored.sort(key=lambda item: (item[1]['date'] or '', item[1]['rowid']), reverse=True)
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return len(scored), [row for _, row in scored[:limit]]
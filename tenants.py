@@ -0,0 +1,179 @@
+"""채팅별 가계부(테넌트) 라우팅
+
+한 프로세스에서 여러 가구의 가계부를 운영할 때 채팅 ID를 테넌트로 연결한다.
+테넌트마다 자체 Notion 게이트웨이(연결 풀, 속도 제한, 서킷 브레이커),
+스키마 캐시, Monthly DB 인덱스, 로컬 미러, 상태 모니터를 가지므로
+한 가구의 요청이 몰려도 다른 가구의 요청 예산을 쓰지 않는다.
+
+테넌트 파일(JSON) 형식:
+
+    {
+      "tenants": [
+        {
+          "name": "kim",
+          "chat_ids": [123456789, -100987654321],
+          "notion_api_key": "secret_...",
+          "database_id": "...",
+          "monthly_db_id": "...",
+          "rate_limit": 3,
+          "max_concurrency": 3
+        }
+      ]
+    }
+
+rate_limit, max_concurrency 등 게이트웨이 설정을 생략하면 환경 변수 기본값을 쓴다.
+환경 변수의 NOTION_API_KEY / NOTION_DATABASE_ID는 'default' 테넌트가 되어
+테넌트 파일에 없는 채팅을 처리한다 (설정하지 않으면 등록되지 않은 채팅은 거부).
+"""
+import json
+import logging
+import os
+import re
+
+from health import HealthMonitor
+from notion_gateway import NotionGateway
+from schema_cache import SchemaCache
+from monthly_index import MonthlyIndex
+from transaction_mirror import TransactionMirror
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = 'default'
+
+# 테넌트 파일에서 덮어쓸 수 있는 NotionGateway 설정
+GATEWAY_OPTIONS = ('max_concurrency', 'rate_limit', 'max_retries', 'breaker_threshold', 'breaker_cooldown')
+
+# 테넌트 이름은 데이터 폴더 이름으로도 쓰인다
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class Tenant:
+    """한 가구의 Notion 연결과 로컬 캐시 묶음"""
+
+    def __init__(self, name, api_key, database_id, monthly_db_id, data_dir,
+                 gateway_options=None, schema_ttl=600, mirror_max_staleness=300):
+        self.name = name
+        self.database_id = database_id
+        self.monthly_db_id = monthly_db_id
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+
+        self.gateway = NotionGateway(api_key, name=name, **(gateway_options or {}))
+        self.schema_cache = SchemaCache(
+            self.gateway,
+            database_id,
+            os.path.join(data_dir, 'schema.json'),
+            ttl=schema_ttl
+        )
+        self.monthly_index = MonthlyIndex(self.gateway, monthly_db_id) if monthly_db_id else None
+        self.mirror = TransactionMirror(
+            os.path.join(data_dir, 'transactions.db'),
+            max_staleness=mirror_max_staleness
+        )
+        # /status가 응답할 Notion 상태 스냅샷 (주기 작업이 갱신)
+        self.health = HealthMonitor(self.gateway, {'transactions': database_id, 'monthly': monthly_db_id})
+
+        # post_init에서 테넌트별 저장 대기열 처리 작업을 연결
+        self.flusher = None
+
+    async def aclose(self):
+        """Notion 연결 풀 및 로컬 미러 정리"""
+        await self.gateway.aclose()
+        self.mirror.close()
+
+
+class TenantRegistry:
+    """채팅 ID -> 테넌트 매핑"""
+
+    def __init__(self):
+        self._tenants = {}
+        self._by_chat = {}
+        self.default = None
+
+    def add(self, tenant, chat_ids=(), default=False):
+        if tenant.name in self._tenants:
+            raise ValueError(f"테넌트 이름 중복: {tenant.name}")
+        for chat_id in chat_ids:
+            if chat_id in self._by_chat:
+                raise ValueError(f"채팅 {chat_id}가 여러 테넌트에 등록되어 있습니다")
+
+        self._tenants[tenant.name] = tenant
+        for chat_id in chat_ids:
+            self._by_chat[chat_id] = tenant
+        if default:
+            self.default = tenant
+
+    def for_chat(self, chat_id):
+        """채팅의 테넌트 (등록되지 않았으면 기본 테넌트, 그것도 없으면 None)"""
+        return self._by_chat.get(chat_id, self.default)
+
+    def get(self, name):
+        return self._tenants.get(name)
+
+    def all(self):
+        return list(self._tenants.values())
+
+    def __len__(self):
+        return len(self._tenants)
+
+    async def aclose(self):
+        for tenant in self._tenants.values():
+            try:
+                await tenant.aclose()
+            except Exception as e:
+                logger.error(f"테넌트 정리 오류 ({tenant.name}): {e}")
+
+    @classmethod
+    def load(cls, data_dir, tenants_file=None, default_api_key=None, default_database_id=None,
+             default_monthly_db_id=None, gateway_options=None, schema_ttl=600, mirror_max_staleness=300):
+        """환경 변수 기본 테넌트와 테넌트 파일로 레지스트리 구성
+
+        기본 테넌트는 기존 단일 가계부와 같은 DATA_DIR 바로 아래 파일을 그대로 쓰고,
+        파일의 테넌트는 DATA_DIR/tenants/<name>/ 아래에 각자 저장한다.
+        """
+        registry = cls()
+        gateway_options = dict(gateway_options or {})
+
+        if default_api_key and default_database_id:
+            registry.add(
+                Tenant(
+                    DEFAULT_TENANT,
+                    default_api_key,
+                    default_database_id,
+                    default_monthly_db_id,
+                    data_dir,
+                    gateway_options=gateway_options,
+                    schema_ttl=schema_ttl,
+                    mirror_max_staleness=mirror_max_staleness
+                ),
+                default=True
+            )
+
+        if tenants_file:
+            with open(tenants_file, encoding='utf-8') as f:
+                config = json.load(f)
+
+            for entry in config.get('tenants', []):
+                name = entry['name']
+                if not _NAME_PATTERN.match(name) or name == DEFAULT_TENANT:
+                    raise ValueError(f"사용할 수 없는 테넌트 이름: {name}")
+
+                options = dict(gateway_options)
+                options.update({key: entry[key] for key in GATEWAY_OPTIONS if key in entry})
+
+                registry.add(
+                    Tenant(
+                        name,
+                        entry['notion_api_key'],
+                        entry['database_id'],
+                        entry.get('monthly_db_id'),
+                        os.path.join(data_dir, 'tenants', name),
+                        gateway_options=options,
+                        schema_ttl=schema_ttl,
+                        mirror_max_staleness=mirror_max_staleness
+                    ),
+                    chat_ids=[int(chat_id) for chat_id in entry.get('chat_ids', [])]
+                )
+
+        logger.info(f"테넌트 {len(registry)}개 로드")
+        return registry
@@ -0,0 +1,277 @@
+"""Transaction DB 로컬 SQLite 미러
+
+Notion Transaction DB의 거래 내역을 로컬 SQLite에 복제해 두고
+/list, /월별통계 같은 조회 명령어가 Notion 왕복 없이 인덱스된 테이블에서 응답하도록 한다.
+
+- 증분 동기화: last_edited_time 필터로 마지막 동기화 이후 수정된 페이지만 가져온다
+- write-through: 봇이 생성한 페이지는 pages.create 응답으로 바로 반영한다
+- 최대 staleness: 마지막 동기화가 max_staleness초보다 오래되면 조회 전에 동기화한다
+- 전체 재동기화: Notion에서 삭제된 페이지까지 정리한다 (/동기화)
+- 월별 집계: 행을 쓰거나 지울 때마다 MonthlyRollups를 함께 갱신한다
+- 검색 색인: 행을 쓰거나 지울 때마다 SearchIndex(내용/카테고리 역색인)를 함께 갱신한다
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+
+from rollups import MonthlyRollups
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    page_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    date TEXT,
+    type TEXT,
+    amount NUMERIC,
+    category TEXT,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON transactions (type, date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _select_name(properties, prop_name):
+    """select 속성 값(옵션 이름) 추출"""
+    select = properties.get(prop_name, {}).get('select') if prop_name else None
+    return select.get('name') if select else None
+
+
+def _number(properties, prop_name):
+    """number 속성 값 추출"""
+    return properties.get(prop_name, {}).get('number') if prop_name else None
+
+
+def page_to_row(page, props):
+    """Notion 페이지를 transactions 행(dict)으로 변환
+
+    props는 get_db_properties()['props'] (역할 -> 실제 속성 이름) 매핑이다.
+    지출/수입에 따라 금액과 카테고리를 각각의 열에서 읽는다.
+    """
+    properties = page.get('properties', {})
+
+    title_items = properties.get(props.get('title'), {}).get('title') or []
+    title = ''.join(
+        item.get('plain_text') or item.get('text', {}).get('content', '')
+        for item in title_items
+    )
+
+    date_value = properties.get(props.get('date'), {}).get('date') or {}
+
+    trans_type = _select_name(properties, props.get('type'))
+    amount = None
+    category = None
+    if trans_type == '지출':
+        amount = _number(properties, props.get('expense_amount'))
+        category = _select_name(properties, props.get('expense_category'))
+    elif trans_type == '수입':
+        amount = _number(properties, props.get('income_amount'))
+        category = _select_name(properties, props.get('income_category'))
+
+    return {
+        'page_id': page['id'],
+        'title': title,
+        'date': date_value.get('start'),
+        'type': trans_type,
+        'amount': amount,
+        'category': category,
+        'last_edited_time': page.get('last_edited_time'),
+    }
+
+
+class TransactionMirror:
+    """Transaction DB의 로컬 SQLite 복제본"""
+
+    def __init__(self, path, max_staleness=300):
+        self.max_staleness = max_staleness
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self.rollups = MonthlyRollups(self._conn)
+        self.search_index = SearchIndex(self._conn)
+        self._sync_lock = asyncio.Lock()
+
+    # --- 메타 정보 ---
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    @property
+    def last_synced_at(self):
+        """마지막 동기화 완료 시각 (epoch 초), 동기화한 적이 없으면 None"""
+        value = self._get_meta('last_synced_at')
+        return float(value) if value else None
+
+    def is_stale(self):
+        """마지막 동기화가 staleness 한도를 넘었는지 여부"""
+        last = self.last_synced_at
+        return last is None or time.time() - last > self.max_staleness
+
+    # --- 쓰기 ---
+
+    def _get_row(self, page_id):
+        return self._conn.execute(
+            "SELECT * FROM transactions WHERE page_id = ?", (page_id,)
+        ).fetchone()
+
+    def _upsert_row(self, row):
+        old_row = self._get_row(row['page_id'])
+        self.rollups.apply(old_row, row)
+        self.search_index.apply(old_row, row)
+        self._conn.execute(
+            "INSERT INTO transactions (page_id, title, date, type, amount, category, last_edited_time) "
+            "VALUES (:page_id, :title, :date, :type, :amount, :category, :last_edited_time) "
+            "ON CONFLICT(page_id) DO UPDATE SET "
+            "title = excluded.title, date = excluded.date, type = excluded.type, "
+            "amount = excluded.amount, category = excluded.category, "
+            "last_edited_time = excluded.last_edited_time",
+            row
+        )
+
+    def _delete_row(self, page_id):
+        old_row = self._get_row(page_id)
+        if old_row:
+            self.rollups.apply(old_row, None)
+            self.search_index.apply(old_row, None)
+            self._conn.execute("DELETE FROM transactions WHERE page_id = ?", (page_id,))
+
+    def _apply_page(self, page, props):
+        if page.get('archived') or page.get('in_trash'):
+            self._delete_row(page['id'])
+        else:
+            self._upsert_row(page_to_row(page, props))
+
+    def upsert_page(self, page, props):
+        """페이지 한 건 반영 (write-through)"""
+        with self._conn:
+            self._apply_page(page, props)
+
+    def remove_page(self, page_id):
+        """페이지 한 건 삭제"""
+        with self._conn:
+            self._delete_row(page_id)
+
+    # --- 동기화 ---
+
+    async def sync(self, gateway, database_id, props, projection=None, full=False):
+        """Notion에서 변경분을 가져와 미러에 반영하고 반영한 페이지 수를 반환
+
+        full=False: 마지막으로 본 last_edited_time 이후 수정된 페이지만 가져온다.
+        full=True: 전체를 다시 읽고, Notion에 더 이상 없는 페이지는 삭제한다.
+        """
+        async with self._sync_lock:
+            return await self._sync_locked(gateway, database_id, props, projection, full)
+
+    async def _sync_locked(self, gateway, database_id, props, projection, full):
+        """sync() 본체 (호출 측에서 _sync_lock을 잡고 있어야 함)"""
+        cursor = None if full else self._get_meta('sync_cursor')
+        query = {
+            'sorts': [{"timestamp": "last_edited_time", "direction": "ascending"}],
+        }
+        if cursor:
+            # Notion의 last_edited_time은 분 단위라 경계의 페이지를 다시 받을 수 있지만 upsert라 무해하다
+            query['filter'] = {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": cursor}
+            }
+        if projection:
+            query['filter_properties'] = projection
+
+        started_at = time.time()
+        seen = set()
+        count = 0
+        async for batch in gateway.iter_query_pages(database_id, **query):
+            with self._conn:
+                for page in batch:
+                    self._apply_page(page, props)
+                    seen.add(page['id'])
+                    if page.get('last_edited_time'):
+                        cursor = max(cursor or '', page['last_edited_time'])
+                if cursor:
+                    self._set_meta('sync_cursor', cursor)
+            count += len(batch)
+
+        with self._conn:
+            if full:
+                existing = [r['page_id'] for r in self._conn.execute("SELECT page_id FROM transactions")]
+                for page_id in existing:
+                    if page_id not in seen:
+                        self._delete_row(page_id)
+            self._set_meta('last_synced_at', str(started_at))
+
+        logger.info(f"미러 동기화 완료 ({'전체' if full else '증분'}): {count}건")
+        return count
+
+    async def ensure_fresh(self, gateway, database_id, props, projection=None):
+        """staleness 한도를 넘었으면 증분 동기화"""
+        if not self.is_stale():
+            return
+        async with self._sync_lock:
+            # 잠금을 기다리는 동안 다른 핸들러가 이미 동기화했을 수 있다
+            if self.is_stale():
+                await self._sync_locked(gateway, database_id, props, projection, full=False)
+
+    # --- 조회 ---
+
+    def recent(self, limit=10):
+        """날짜 내림차순 최근 거래"""
+        return self.page(limit)
+
+    def page(self, limit=10, before=None):
+        """날짜 내림차순으로 before((날짜, rowid)) 다음부터 limit개 (키셋 페이지네이션)
+
+        행마다 다음 페이지 커서로 쓸 rowid가 함께 반환된다.
+        """
+        if before is None:
+            return self._conn.execute(
+                "SELECT rowid, * FROM transactions ORDER BY COALESCE(date, '') DESC, rowid DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        date, rowid = before
+        return self._conn.execute(
+            "SELECT rowid, * FROM transactions "
+            "WHERE COALESCE(date, '') < ? OR (COALESCE(date, '') = ? AND rowid < ?) "
+            "ORDER BY COALESCE(date, '') DESC, rowid DESC LIMIT ?",
+            (date, date, rowid, limit)
+        ).fetchall()
+
+    def summarize(self, start_date, end_date):
+        """[start_date, end_date) 기간의 종류/카테고리별 합계와 건수"""
+        return self._conn.execute(
+            "SELECT type, category, SUM(amount) AS total, COUNT(*) AS count "
+            "FROM transactions WHERE date >= ? AND date < ? "
+            "GROUP BY type, category",
+            (start_date, end_date)
+        ).fetchall()
+
+    def search(self, query, **filters):
+        """내용/카테고리 검색 (SearchIndex.search 참고)"""
+        return self.search_index.search(query, **filters)
+
+    def daily_totals(self, start_date, end_date, trans_type):
+        """[start_date, end_date) 기간의 종류별 일 합계 ((YYYY-MM-DD, 합계) 목록)"""
+        return self._conn.execute(
+            "SELECT substr(date, 1, 10) AS day, SUM(amount) AS total "
+            "FROM transactions WHERE date >= ? AND date < ? AND type = ? "
+            "GROUP BY day ORDER BY day",
+            (start_date, end_date, trans_type)
+        ).fetchall()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,140 @@
+"""채팅별 순서를 지키는 동시 업데이트 처리기
+
+Application 기본 설정은 업데이트를 하나씩 처리하므로 한 사용자의 느린 명령이
+다른 모든 사용자의 메시지를 막는다. 이 처리기는 서로 다른 채팅의 업데이트를
+최대 max_concurrent_updates개까지 동시에 처리하면서:
+
+- 같은 채팅의 업데이트는 도착한 순서대로 하나씩 처리한다 (! 항목 저장 순서 유지)
+- 채팅마다 처리 작업(슬롯)은 하나만 쓴다. 앞 업데이트가 처리 중이면 뒤 업데이트는
+  채팅별 대기열에 넣고 슬롯을 바로 돌려주며, 처리 중인 작업이 이어서 처리한다
+- 채팅별 대기열이 max_pending_per_chat에 차면 새 업데이트는 기다리지 않고 바로 결정한다.
+  거래를 기록하는 메시지(! 줄, /import 파일)는 버리지 않고 한도를 넘겨서라도 대기열에 넣고,
+  명령어 같은 나머지 업데이트만 버린 뒤 한 번 안내한다
+- 한도를 넘은 업데이트가 처리 슬롯을 잡고 기다리지 않으므로 한 채팅이 몰려도
+  다른 채팅의 처리 슬롯을 모두 차지하지 못한다
+
+채팅이 없는 업데이트는 순서 보장 없이 바로 처리한다.
+"""
+import asyncio
+import logging
+from collections import deque
+
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import UPDATES_DROPPED
+
+logger = logging.getLogger(__name__)
+
+
+def _chat_id(update):
+    chat = getattr(update, 'effective_chat', None)
+    return chat.id if chat else None
+
+
+def _creates_entries(update):
+    """거래를 기록하는 메시지인지 (! 줄이 있는 메시지, 파일) - 대기 한도를 넘어도 버리지 않음"""
+    message = getattr(update, 'message', None)
+    if not message:
+        return False
+    if getattr(message, 'document', None):
+        return True
+    text = getattr(message, 'text', None) or ''
+    return any(line.strip().startswith('!') for line in text.splitlines())
+
+
+class _ChatQueue:
+    """한 채팅의 처리 대기 업데이트"""
+
+    def __init__(self):
+        self.pending = deque()
+        self.dropped = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """전체 동시 처리 수 제한 + 채팅별 순차 처리 + 채팅별 대기 한도"""
+
+    def __init__(self, max_concurrent_updates, max_pending_per_chat=200):
+        super().__init__(max_concurrent_updates)
+        self.max_pending_per_chat = max_pending_per_chat
+        # 처리 중인 채팅 -> 대기열 (처리 중인 업데이트는 포함하지 않음)
+        self._chats = {}
+        # 전송 중인 대기 한도 안내 (처리 슬롯을 잡지 않도록 따로 실행)
+        self._notices = set()
+
+    def pending_count(self):
+        """처리 중이거나 대기 중인 업데이트 수"""
+        return sum(1 + len(queue.pending) for queue in self._chats.values())
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        # 종료 시점에 남은 대기 업데이트는 처리하지 않고 정리
+        for queue in self._chats.values():
+            while queue.pending:
+                queue.pending.popleft().close()
+        self._chats.clear()
+        for task in self._notices:
+            task.cancel()
+
+    async def do_process_update(self, update, coroutine):
+        chat_id = _chat_id(update)
+        if chat_id is None:
+            await coroutine
+            return
+
+        queue = self._chats.get(chat_id)
+        if queue is not None and len(queue.pending) >= self.max_pending_per_chat and not _creates_entries(update):
+            # 대기열이 가득 참: 기다리지 않고 버림 (거래 기록 메시지는 한도를 넘겨도 아래에서 줄 세움)
+            coroutine.close()
+            self._drop(chat_id, queue, update)
+            return
+
+        if queue is not None:
+            # 같은 채팅의 업데이트가 처리 중: 뒤에 줄 세우고 슬롯은 다른 채팅에 양보
+            queue.pending.append(coroutine)
+            return
+
+        queue = self._chats[chat_id] = _ChatQueue()
+        try:
+            await self._run(chat_id, coroutine)
+            while queue.pending:
+                next_coroutine = queue.pending.popleft()
+                await self._run(chat_id, next_coroutine)
+        finally:
+            while queue.pending:
+                queue.pending.popleft().close()
+            del self._chats[chat_id]
+
+    @staticmethod
+    async def _run(chat_id, coroutine):
+        # 한 업데이트의 오류가 같은 채팅의 다음 업데이트 처리를 막지 않도록 함
+        try:
+            await coroutine
+        except Exception as e:
+            logger.error(f"업데이트 처리 오류 (chat_id={chat_id}): {e}")
+
+    def _drop(self, chat_id, queue, update):
+        queue.dropped += 1
+        UPDATES_DROPPED.inc()
+        logger.warning(f"채팅 대기 업데이트 한도 초과로 버림 (chat_id={chat_id}, 누적 {queue.dropped}건)")
+
+        # 대기열이 비워질 때까지 한 번만 안내
+        if queue.dropped > 1:
+            return
+        message = getattr(update, 'effective_message', None)
+        if not message:
+            return
+        task = asyncio.get_running_loop().create_task(self._notify_dropped(chat_id, message))
+        self._notices.add(task)
+        task.add_done_callback(self._notices.discard)
+
+    @staticmethod
+    async def _notify_dropped(chat_id, message):
+        try:
+            await message.reply_text(
+                "⚠️ 처리 대기 중인 메시지가 너무 많아 일부 명령을 처리하지 못했습니다.\n"
+                "(! 기록은 모두 순서대로 처리됩니다) 잠시 후 처리되지 않은 명령을 다시 보내주세요."
+            )
+        except Exception as e:
+            logger.error(f"대기 한도 안내 전송 오류 (chat_id={chat_id}): {e}")
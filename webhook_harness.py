@@ -0,0 +1,105 @@
+"""웹훅 모드 로컬 테스트 도구
+
+로컬에서 실행 중인 웹훅 서버(BOT_MODE=webhook)에 가짜 Telegram 업데이트를 POST한다.
+
+사용 예:
+    python webhook_harness.py "! 커피 4500 지출 2-1.식비"
+    python webhook_harness.py --count 50 --concurrency 10 "/list"
+    python webhook_harness.py --bad-secret "! 커피 4500 지출 2-1.식비"   # 403 확인
+    python webhook_harness.py --health
+
+봇의 답장은 실제 Telegram API로 전송되므로, chat id가 가짜면 봇 로그에 전송 오류가 남는다.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+# UTF-8 출력 설정
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+
+load_dotenv()
+
+
+def make_update(update_id, chat_id, text):
+    """텍스트 메시지 업데이트 JSON 생성"""
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "harness"},
+        "text": text,
+    }
+    # 영문 명령어는 Telegram처럼 bot_command 엔티티를 붙인다
+    command = text.split()[0] if text.startswith('/') else ''
+    if command and command[1:].isascii():
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+async def send_updates(base_url, path, secret, chat_id, text, count, concurrency):
+    url = f"{base_url.rstrip('/')}/{path.strip('/')}"
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+    first_id = int(time.time() * 1000) % 1_000_000_000
+
+    async with httpx.AsyncClient() as client:
+        async def post(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, json=make_update(first_id + i, chat_id, text), headers=headers)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(count)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"POST {url} x {count} (동시 {concurrency})")
+    print(f"상태 코드: {statuses}")
+    print(f"총 소요: {elapsed:.3f}s, 처리량: {count / elapsed:.1f} req/s")
+    print(f"지연 p50: {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"최대: {latencies[-1] * 1000:.1f}ms")
+
+
+async def check_health(base_url):
+    async with httpx.AsyncClient() as client:
+        for path in ('healthz', 'readyz'):
+            response = await client.get(f"{base_url.rstrip('/')}/{path}")
+            print(f"GET /{path}: {response.status_code} {response.text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="웹훅 서버에 가짜 업데이트 전송")
+    parser.add_argument('text', nargs='?', default='/start', help="보낼 메시지 텍스트")
+    parser.add_argument('--url', default=f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', '8443')}",
+                        help="웹훅 서버 주소")
+    parser.add_argument('--path', default=os.getenv('WEBHOOK_PATH', 'telegram'))
+    parser.add_argument('--secret', default=os.getenv('WEBHOOK_SECRET', ''))
+    parser.add_argument('--bad-secret', action='store_true', help="틀린 secret token으로 전송")
+    parser.add_argument('--chat-id', type=int, default=1)
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--health', action='store_true', help="헬스 엔드포인트만 확인")
+    args = parser.parse_args()
+
+    if args.health:
+        asyncio.run(check_health(args.url))
+        return
+
+    secret = 'wrong-secret' if args.bad_secret else args.secret
+    asyncio.run(send_updates(args.url, args.path, secret, args.chat_id, args.text,
+                             args.count, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""웹훅 모드용 내장 HTTP 서버
+
+run_polling 대신 Telegram이 업데이트를 직접 POST하도록 할 때 사용한다.
+
+- POST /{path}: Telegram 업데이트 수신 (X-Telegram-Bot-Api-Secret-Token 검증)
+- GET /healthz: 프로세스 생존 확인
+- GET /readyz: 봇이 실행 중이고 Notion 서킷 브레이커가 닫혀 있는지 확인
+- GET /metrics: Prometheus 메트릭 (metrics.py)
+
+폴링 모드와 같은 Application/핸들러를 그대로 사용한다.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+import tornado.httpserver
+import tornado.web
+from telegram import Update
+
+from metrics import MetricsHandler
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class TelegramUpdateHandler(tornado.web.RequestHandler):
+    """Telegram 업데이트 수신"""
+
+    def initialize(self, bot_application, secret_token):
+        # tornado RequestHandler가 self.application을 쓰므로 다른 이름으로 보관
+        self.bot_application = bot_application
+        self.secret_token = secret_token
+
+    async def post(self):
+        if self.secret_token:
+            received = self.request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(received, self.secret_token):
+                logger.warning("웹훅 secret token 불일치, 요청 거부")
+                self.set_status(403)
+                return
+
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            self.set_status(400)
+            return
+
+        update = Update.de_json(data, self.bot_application.bot)
+        # 처리는 Application의 업데이트 큐에 맡기고 Telegram에는 바로 200 응답
+        await self.bot_application.update_queue.put(update)
+        self.set_status(200)
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """생존 확인"""
+
+    def get(self):
+        self.write({'status': 'ok'})
+
+
+class ReadinessHandler(tornado.web.RequestHandler):
+    """준비 상태 확인 (ready_check() -> (준비 여부, 상세 dict))"""
+
+    def initialize(self, ready_check):
+        self.ready_check = ready_check
+
+    def get(self):
+        ready, detail = self.ready_check()
+        self.set_status(200 if ready else 503)
+        self.write(dict(detail, status='ok' if ready else 'unavailable'))
+
+
+def make_app(application, url_path, secret_token, ready_check):
+    """웹훅/헬스/메트릭 엔드포인트를 가진 tornado 앱 생성"""
+    return tornado.web.Application([
+        (rf"/{url_path.strip('/')}", TelegramUpdateHandler,
+         {'bot_application': application, 'secret_token': secret_token}),
+        (r"/healthz", HealthHandler),
+        (r"/readyz", ReadinessHandler, {'ready_check': ready_check}),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+async def run_webhook(application, webhook_url, url_path, listen, port, secret_token,
+                      allowed_updates, ready_check):
+    """웹훅 모드로 봇 실행 (SIGINT/SIGTERM까지)
+
+    Application.run_webhook과 달리 직접 수명 주기를 관리하므로
+    post_init/post_stop/post_shutdown 훅도 여기서 호출한다.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: 시그널 핸들러 미지원, Ctrl+C는 KeyboardInterrupt로 처리
+            pass
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+
+    server = tornado.httpserver.HTTPServer(make_app(application, url_path, secret_token, ready_check))
+    try:
+        await application.bot.set_webhook(
+            url=f"{webhook_url.rstrip('/')}/{url_path.strip('/')}",
+            allowed_updates=allowed_updates,
+            secret_token=secret_token or None,
+        )
+        await application.start()
+        server.listen(port, address=listen)
+        logger.info(f"웹훅 서버 시작: {listen}:{port}/{url_path.strip('/')}")
+
+        try:
+            await stop_event.wait()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+    finally:
+        server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        logger.info("웹훅 서버 종료")